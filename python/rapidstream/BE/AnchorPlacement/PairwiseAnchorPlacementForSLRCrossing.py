@@ -6,15 +6,11 @@ import time
 
 from collections import defaultdict
 from typing import List, Tuple, Dict
-from mip import Model, minimize, CONTINUOUS, xsum, OptimizationStatus
 
 from rapidstream.BE.Utilities import isPairSLRCrossing
-from rapidstream.BE.Device.U250 import idx_of_left_side_slice_of_laguna_column
-from autobridge.Device.DeviceManager import DeviceU250
+from rapidstream.BE.Device.U250 import idx_of_left_side_slice_of_laguna_column, getU250
 from autobridge.Opt.Slot import Slot
 
-U250_inst = DeviceU250()
-
 slice_to_laguna = {idx_of_left_side_slice_of_laguna_column[i] : i \
   for i in range(len(idx_of_left_side_slice_of_laguna_column))}
 
@@ -158,8 +154,8 @@ def _get_anchor_2_sll_dir(hub, slot1_name, slot2_name, anchor_connections: Dict[
   each anchor will use one SLL connection.
   get which direction will the SLL will be used, upward or downward
   """
-  slot1 = Slot(U250_inst, slot1_name)
-  slot2 = Slot(U250_inst, slot2_name)
+  slot1 = Slot(getU250(), slot1_name)
+  slot2 = Slot(getU250(), slot2_name)
   up_slot = slot1 if slot1.down_left_y > slot2.down_left_y else slot2
 
   # get the downward IO of the upper slot
@@ -220,8 +216,8 @@ def getSLLChannels(slot1_name: str, slot2_name: str) -> List[SLLChannel]:
   each channel should have an input coor, an output coor, and 24 RX names
   first get the X coor of the 4 columns
   """
-  slot1 = Slot(U250_inst, slot1_name)
-  slot2 = Slot(U250_inst, slot2_name)
+  slot1 = Slot(getU250(), slot1_name)
+  slot2 = Slot(getU250(), slot2_name)
   i_th_column_range = range(slot1.down_left_x * 2, (slot1.up_right_x+1) * 2)
 
   pair_down_left_y = min(slot1.down_left_y, slot2.down_left_y)
@@ -248,6 +244,7 @@ def placeAnchorToSLLChannel(anchor_to_sll_to_cost, pair_name) -> Dict[str, SLLCh
   start_time = time.perf_counter()
   get_time_stamp = lambda : time.perf_counter() - start_time
 
+  from mip import Model, minimize, CONTINUOUS, xsum, OptimizationStatus
   m = Model()
 
   anchor_to_sll_to_var = {}
@@ -10,8 +10,6 @@ from rapidstream.BE.GenAnchorConstraints import createAnchorPlacementExtractScri
 from rapidstream.BE.Device import U250
 from rapidstream.BE.Utilities import loggingSetup
 
-loggingSetup()
-
 
 def getHeader(slot1_name, slot2_name):
   header = ['\n\n`timescale 1 ns / 1 ps',
@@ -263,6 +261,8 @@ def getParallelScript():
     open(f'{baseline_dir}/parallel_baseline_vivado_anchor_placement_iter{args.which_iteration}_{server}.txt', 'w').write('\n'.join(local_tasks))
 
 if __name__ == '__main__':
+  loggingSetup()
+
   parser = argparse.ArgumentParser()
   parser.add_argument("--hub_path", type=str, required=True)
   parser.add_argument("--base_dir", type=str, required=True)
@@ -4,9 +4,7 @@ import logging
 import os
 import re
 
-from rapidstream.BE.Utilities import loggingSetup
-
-loggingSetup()
+from rapidstream.BE.Utilities import loggingSetup, loadRTLArtifact
 
 
 def getVivadoFlowWithOrigRTL(
@@ -67,7 +65,9 @@ def createClockFromBUFGXDC(target_period=2.50):
 
 def createSlotWrappers():
   slot_name_to_rtl = hub['SlotWrapperRTL']
-  for slot_name, rtl in slot_name_to_rtl.items():
+  for slot_name, artifact in slot_name_to_rtl.items():
+    rtl = loadRTLArtifact(hub_path, artifact).split('\n')
+
     # remove all annotations because those are for the split compile flow
     rtl = [re.sub(r"\(\*.+\*\)", "", line) for line in rtl]
 
@@ -75,7 +75,7 @@ def createSlotWrappers():
 
 
 def getPipelinedTopWithBUFG():
-  top_rtl = hub['NewTopRTL']
+  top_rtl = loadRTLArtifact(hub_path, hub['NewTopRTL'])
   open(f'{wrapper_path}/new_top_pipelined_inverted.v', 'w').write(top_rtl)
 
   top_rtl_non_inverted = top_rtl.replace('negedge', 'posedge')
@@ -102,6 +102,8 @@ def getNonPipelinedTopWithBUFG():
 
 
 if __name__ == '__main__':
+  loggingSetup()
+
   parser = argparse.ArgumentParser()
   parser.add_argument("--hub_path", type=str, required=True)
   parser.add_argument("--base_dir", type=str, required=True)
@@ -114,7 +116,7 @@ if __name__ == '__main__':
   hub = json.loads(open(hub_path, 'r').read())
 
   NEW_TOP_MODULE_SUFFIX = '_hw_test'
-  top_rtl = hub['NewTopRTL']
+  top_rtl = loadRTLArtifact(hub_path, hub['NewTopRTL'])
 
   # top name for the original top + invert clock pipeline + bufg
   invert_pipeline_top_name = re.search(rf'[^ ]+{NEW_TOP_MODULE_SUFFIX}', top_rtl).group(0)
@@ -7,8 +7,6 @@ from typing import List
 
 from rapidstream.BE.Utilities import loggingSetup
 
-loggingSetup()
-
 
 def getSlotAnchorRoutingScript(anchor_initialization_scripts):
   """
@@ -116,6 +114,8 @@ def getParallelScript():
 
 
 if __name__ == '__main__':
+  loggingSetup()
+
   parser = argparse.ArgumentParser()
   parser.add_argument("--hub_path", type=str, required=True)
   parser.add_argument("--base_dir", type=str, required=True)
@@ -1,8 +1,16 @@
 import re
+from functools import lru_cache
 from autobridge.Opt.Slot import Slot
 from autobridge.Device.DeviceManager import DeviceU250
 
-U250_inst = DeviceU250()
+
+@lru_cache(maxsize=None)
+def getU250():
+  """
+  the device is created on first use instead of when the module is imported
+  """
+  return DeviceU250()
+
 
 def getAllLagunaRange():
   return 'LAGUNA_X0Y0:LAGUNA_X31Y839'
@@ -228,8 +236,8 @@ def getBufferRegionBetweenSlotPair(slot_name1, slot_name2, col_width_each_side,
   Slot_SLICE_height = 120 # 2x2 slot
   CR_SLICE_height = 60
   
-  slot1 = Slot(U250_inst, slot_name1)
-  slot2 = Slot(U250_inst, slot_name2)
+  slot1 = Slot(getU250(), slot_name1)
+  slot2 = Slot(getU250(), slot_name2)
 
   #******************************************
   # a hack to prevent routing conflicts between slots and anchors
@@ -456,7 +464,7 @@ def getAnchorPblock(slot: Slot):
 
 
 def getLagunaAnchorInclusivePblock(slot_name):
-  slot = Slot(U250_inst, slot_name)
+  slot = Slot(getU250(), slot_name)
 
   basic_pblock = getAnchorPblock(slot)
 
@@ -532,7 +540,7 @@ def constrainAnchorNetsAndSlot(slot_name, pblock_def):
   script.append(f'create_pblock anchor_pblock')
   script.append(f'resize_pblock [get_pblocks anchor_pblock] -add {{ {pblock_def} }}') # the clock regions for the slot
 
-  slot = Slot(U250_inst, slot_name)
+  slot = Slot(getU250(), slot_name)
   script.append(f'resize_pblock [get_pblocks anchor_pblock] -add {{ {getAnchorPblock(slot)} }}') 
 
   # constrain non-laguna anchors. No need to worry about the routing of laguna anchors
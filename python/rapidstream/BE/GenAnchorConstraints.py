@@ -4,9 +4,6 @@ import json
 import re
 
 from rapidstream.BE.Device import U250
-from rapidstream.BE.Utilities import loggingSetup
-
-loggingSetup()
 
 
 def createAnchorPlacementExtractScript(slot_name, io_list, output_dir):
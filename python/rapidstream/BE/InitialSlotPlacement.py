@@ -8,8 +8,6 @@ from rapidstream.BE.Utilities import getAnchorTimingReportScript
 from rapidstream.BE.GenAnchorConstraints import getSlotInitPlacementPblock
 from rapidstream.BE.Utilities import loggingSetup
 
-loggingSetup()
-
 
 def getPlacementScript(slot_name):
   script = []
@@ -86,6 +84,8 @@ def generateParallelScript(hub, user_name, server_list):
 
 
 if __name__ == '__main__':
+  loggingSetup()
+
   parser = argparse.ArgumentParser()
   parser.add_argument("--hub_path", type=str, required=True)
   parser.add_argument("--base_dir", type=str, required=True)
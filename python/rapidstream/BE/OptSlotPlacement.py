@@ -8,8 +8,6 @@ import math
 from rapidstream.BE.Utilities import getAnchorTimingReportScript
 from rapidstream.BE.Utilities import loggingSetup
 
-loggingSetup()
-
 
 def getSlotPlacementOptScript(hub, slot_name, dcp_path, anchor_placement_scripts):
   """ phys_opt_design the slot based on the dictated anchor locations """
@@ -138,6 +136,8 @@ def generateOptScript(hub):
     open(f'{opt_dir}/{slot_name}/{slot_name}_phys_opt_placement.tcl', 'w').write('\n'.join(opt_script))
   
 if __name__ == '__main__':
+  loggingSetup()
+
   parser = argparse.ArgumentParser()
   parser.add_argument("--hub_path", type=str, required=True)
   parser.add_argument("--base_dir", type=str, required=True)
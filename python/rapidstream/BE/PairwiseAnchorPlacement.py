@@ -12,19 +12,13 @@ import operator
 from typing import List, Dict, Any
 from collections import defaultdict
 
-from mip import Model, minimize, CONTINUOUS, xsum, OptimizationStatus
 from rapidstream.BE.GenAnchorConstraints import __getBufferRegionSize
 from rapidstream.BE.Utilities import loggingSetup, getPairingLagunaTXOfRX, getSLRIndexOfLaguna
 from rapidstream.BE.Device import U250
 from rapidstream.BE.Utilities import isPairSLRCrossing, getDirectionOfSlotname, loggingSetup
 from rapidstream.BE.AnchorPlacement.PairwiseAnchorPlacementForSLRCrossing import placeLagunaAnchors
-from autobridge.Device.DeviceManager import DeviceU250
 from autobridge.Opt.Slot import Slot
 
-U250_inst = DeviceU250()
-
-loggingSetup('ILP-placement.log')
-
 
 ######################### ILP placement ############################################
 
@@ -177,6 +171,7 @@ def __ILPSolving(anchor_connections, bins, allowed_usage_per_bin):
   start_time = time.perf_counter()
   get_time_stamp = lambda : time.perf_counter() - start_time
 
+  from mip import Model, minimize, CONTINUOUS, xsum, OptimizationStatus
   m = Model()
 
   logging.info(f'calculate bin cost... {get_time_stamp()}')
@@ -323,8 +318,8 @@ def moveAnchorsOntoLagunaSites(hub, anchor_2_slice_xy, slot1_name, slot2_name):
     each anchor will use one SLL connection.
     get which direction will the SLL will be used, upward or downward
     """
-    slot1 = Slot(U250_inst, slot1_name)
-    slot2 = Slot(U250_inst, slot2_name)
+    slot1 = Slot(U250.getU250(), slot1_name)
+    slot2 = Slot(U250.getU250(), slot2_name)
     up_slot = slot1 if slot1.down_left_y > slot2.down_left_y else slot2
 
     # get the downward IO of the upper slot
@@ -712,6 +707,8 @@ def getRandomAnchorPlacementAndWriteScript(pair_name, common_anchor_connections)
 
 
 if __name__ == '__main__':
+  loggingSetup('ILP-placement.log')
+
   parser = argparse.ArgumentParser()
   parser.add_argument("--hub_path", type=str, required=True)
   parser.add_argument("--base_dir", type=str, required=True)
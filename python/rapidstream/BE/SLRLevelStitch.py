@@ -8,8 +8,6 @@ import rapidstream.BE.Constants as Constants
 from rapidstream.BE.SlotRouting import addSomeAnchors, removePlaceholderAnchors
 from rapidstream.BE.Utilities import getSlotsInSLRIndex, loggingSetup
 
-loggingSetup()
-
 SLR_NUM = 4
 
 
@@ -131,6 +129,8 @@ def setupTopStitch():
 
 
 if __name__ == '__main__':
+  loggingSetup()
+
   parser = argparse.ArgumentParser()
   parser.add_argument("--hub_path", type=str, required=True)
   parser.add_argument("--base_dir", type=str, required=True)
@@ -16,8 +16,6 @@ from rapidstream.BE.Utilities import (
   getSLRCrossingNeighbor,
 )
 
-loggingSetup()
-
 
 def extractLagunaAnchorRoutes(slot_name):
   """
@@ -340,6 +338,8 @@ def getParallelTasks(hub, routing_dir, user_name, server_list, main_server_name)
 
 
 if __name__ == '__main__':
+  loggingSetup()
+
   parser = argparse.ArgumentParser()
   parser.add_argument("--hub_path", type=str, required=True)
   parser.add_argument("--base_dir", type=str, required=True)
@@ -5,9 +5,7 @@ import math
 import os
 
 from rapidstream.BE.UniversalWrapperCreater import addAnchorToNonTopIOs
-from rapidstream.BE.Utilities import loggingSetup
-
-loggingSetup()
+from rapidstream.BE.Utilities import loggingSetup, loadRTLArtifact
 
 
 def getAnchorWrapperOfSlot(hub, slot_name):
@@ -16,7 +14,7 @@ def getAnchorWrapperOfSlot(hub, slot_name):
   All other IOs will be registered
   """
   slot_to_io = hub['SlotIO']
-  slot_to_rtl = hub['SlotWrapperRTL']
+  slot_rtl = loadRTLArtifact(args.hub_path, hub['SlotWrapperRTL'][slot_name]).split('\n')
   io_list = slot_to_io[slot_name]
 
   if args.invert_non_laguna_anchor_clock:
@@ -27,10 +25,11 @@ def getAnchorWrapperOfSlot(hub, slot_name):
   wrapper = addAnchorToNonTopIOs(hub, f'{slot_name}_ctrl', io_list, clock_edge)
 
   # add the rtl for the inner module (the slot wrapper)
-  # discard the first line (time scale)
-  assert 'timescale' in slot_to_rtl[slot_name][0]
+  # discard the leading empty lines and the time scale
+  timescale_idx = next(i for i, line in enumerate(slot_rtl) if line)
+  assert 'timescale' in slot_rtl[timescale_idx]
   wrapper.append('\n\n')
-  wrapper += slot_to_rtl[slot_name][1:]
+  wrapper += slot_rtl[timescale_idx+1:]
 
   return wrapper
 
@@ -137,6 +136,8 @@ def generateParallelScript(hub, user_name, server_list):
 
 
 if __name__ == '__main__':
+  loggingSetup()
+
   parser = argparse.ArgumentParser()
   parser.add_argument("--hub_path", type=str, required=True)
   parser.add_argument("--base_dir", type=str, required=True)
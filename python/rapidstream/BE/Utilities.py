@@ -1,11 +1,12 @@
+import hashlib
 import logging
+import os
 import re
 import sys
 from typing import List, Optional
 
 from autobridge.Opt.Slot import Slot
-from autobridge.Device.DeviceManager import DeviceU250
-U250_inst = DeviceU250()
+from rapidstream.BE.Device.U250 import getU250
 
 
 LAGUNA_REG_Y_RANGE = [
@@ -82,8 +83,8 @@ def isPairSLRCrossing(slot1_name: str, slot2_name: str) -> bool:
   """
   check if two slots span two SLRs
   """
-  slot1 = Slot(U250_inst, slot1_name)
-  slot2 = Slot(U250_inst, slot2_name)
+  slot1 = Slot(getU250(), slot1_name)
+  slot2 = Slot(getU250(), slot2_name)
 
   if slot1.down_left_x != slot2.down_left_x:
     return False
@@ -154,6 +155,21 @@ def getNeighborSlots(hub, slot_name: str) -> List[str]:
   return neighbors
 
 
+def loadRTLArtifact(hub_path: str, artifact) -> str:
+  """
+  read the RTL referenced by the hub, e.g., hub['NewTopRTL'] or hub['SlotWrapperRTL'][slot_name].
+  The path is relative to the hub. Older hubs embed the RTL directly, as a string or a list of lines
+  """
+  if isinstance(artifact, str):
+    return artifact
+  elif isinstance(artifact, list):
+    return '\n'.join(artifact)
+
+  rtl = open(os.path.join(os.path.dirname(os.path.abspath(hub_path)), artifact['Path']), 'r').read()
+  assert hashlib.sha256(rtl.encode()).hexdigest() == artifact['SHA256'], f'{artifact["Path"]} has been modified'
+  return rtl
+
+
 def getAnchorTimingReportScript(report_prefix: str) -> List[str]:
   script = []
 
@@ -167,8 +183,8 @@ def getDirectionOfSlotname(slot_name1: str, slot_name2: str) -> str:
   """
   which direction slot_name2 is with reference to slot_name1 
   """
-  slot1 = Slot(U250_inst, slot_name1)
-  slot2 = Slot(U250_inst, slot_name2)
+  slot1 = Slot(getU250(), slot_name1)
+  slot2 = Slot(getU250(), slot_name2)
 
   if slot2.isAbove(slot1):
     return 'UP'
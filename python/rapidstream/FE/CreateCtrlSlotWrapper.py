@@ -2,6 +2,11 @@
 import logging
 import copy
 
+from rapidstream.FE.ParallelMap import forkMap
+from rapidstream.FE.PortRecord import Port, getANSIHeaderItems, getInstPortMap
+from rapidstream.FE.RTLEmitter import RTLWriter
+from rapidstream.FE.WireIndex import WireIndex
+
 class CreateCtrlSlotWrapper:
   def __init__(
       self,
@@ -9,13 +14,16 @@ class CreateCtrlSlotWrapper:
       floorplan,
       slot_manager):
     self.routing_wrapper_creater = routing_wrapper_creater
-    self.routing_slot_to_io = routing_wrapper_creater.getSlotToIOList()
+    self.routing_slot_to_ports = routing_wrapper_creater.getSlotToPorts()
     self.floorplan = floorplan
     self.s2v = self.floorplan.getSlotToVertices()
     self.all_active_slots = slot_manager.getActiveSlotsIncludeRouting()
     self.all_slot_names_list = [s.getName() for s in self.all_active_slots]
     self.s_axi_slot = None
     self.in_slot_pipeline_style = routing_wrapper_creater.in_slot_pipeline_style
+    self.rtl_dir = None
+    self.slot_to_digest = {} # sha256 of each wrapper file
+    self.wire_index = None # built once the wrappers are created
     
     self.__findSAxiSlot()
 
@@ -32,8 +40,8 @@ class CreateCtrlSlotWrapper:
     ctrl_io_list = []
 
     # connect to top-level port
-    ctrl_io_list.append(['input', 'ap_clk'])
-    ctrl_io_list.append(['input', 'ap_rst_n'])
+    ctrl_io_list.append(Port('input', '', 'ap_clk'))
+    ctrl_io_list.append(Port('input', '', 'ap_rst_n'))
     
     # broadcast the ap_start and ap_rst_n signals
     # collect the ap_done signals
@@ -47,9 +55,9 @@ class CreateCtrlSlotWrapper:
 
     for dir in ctrl_fanout_dir:
       boundary_name = s_axi_slot.getBoundarySegmentName(dir)
-      ctrl_io_list.append(['output', f'ap_start_{boundary_name}'])
-      ctrl_io_list.append(['output', f'ap_rst_n_{boundary_name}'])
-      ctrl_io_list.append(['input',  f'ap_done_{boundary_name}'])
+      ctrl_io_list.append(Port('output', '', f'ap_start_{boundary_name}'))
+      ctrl_io_list.append(Port('output', '', f'ap_rst_n_{boundary_name}'))
+      ctrl_io_list.append(Port('input', '', f'ap_done_{boundary_name}'))
 
     return ctrl_io_list
 
@@ -119,7 +127,7 @@ class CreateCtrlSlotWrapper:
     ctrl_io_list = []
 
     # no global ap_rst_n
-    ctrl_io_list.append(['input', 'ap_clk'])
+    ctrl_io_list.append(Port('input', '', 'ap_clk'))
 
     ctrl_source_dir, ctrl_fanout_dir = self.__getCtrlInboundAndOutboundDir(slot)
 
@@ -128,35 +136,35 @@ class CreateCtrlSlotWrapper:
     assert slot.getNeighborSlotName(ctrl_source_dir) in self.all_slot_names_list
 
     boundary_name = slot.getBoundarySegmentName(ctrl_source_dir)
-    ctrl_io_list.append(['input', f'ap_start_{boundary_name}'])
-    ctrl_io_list.append(['input', f'ap_rst_n_{boundary_name}'])
-    ctrl_io_list.append(['output',  f'ap_done_{boundary_name}'])
+    ctrl_io_list.append(Port('input', '', f'ap_start_{boundary_name}'))
+    ctrl_io_list.append(Port('input', '', f'ap_rst_n_{boundary_name}'))
+    ctrl_io_list.append(Port('output', '', f'ap_done_{boundary_name}'))
 
     # ctrl fan-out
     for dir in ctrl_fanout_dir:
       fanout_boundary_name = slot.getBoundarySegmentName(dir)
-      ctrl_io_list.append(['output', f'ap_start_{fanout_boundary_name}'])
-      ctrl_io_list.append(['output', f'ap_rst_n_{fanout_boundary_name}'])
-      ctrl_io_list.append(['input',  f'ap_done_{fanout_boundary_name}'])
+      ctrl_io_list.append(Port('output', '', f'ap_start_{fanout_boundary_name}'))
+      ctrl_io_list.append(Port('output', '', f'ap_rst_n_{fanout_boundary_name}'))
+      ctrl_io_list.append(Port('input', '', f'ap_done_{fanout_boundary_name}'))
 
     return ctrl_io_list
 
-  def __getIOSection(self, slot):
+  def __getIOPorts(self, slot):
 
     # filter out all ap signals from routing wrapper
-    routing_io_list = self.routing_slot_to_io[slot]
-    routing_io_list = [io for io in routing_io_list if not io[-1].startswith('ap_') ]     
+    routing_io_list = self.routing_slot_to_ports[slot]
+    routing_io_list = [io for io in routing_io_list if not io.name.startswith('ap_') ]     
 
     if slot == self.s_axi_slot:
       ctrl_io_list = self.__getSAxiSlotCtrlIO(slot)
     else:
       ctrl_io_list= self.__getOtherSlotCtrlIO(slot)
 
+    return routing_io_list + ctrl_io_list
+
+  def __getIOSection(self, slot):
     # the actual rtl code
-    io_section = ['  ' + ' '.join(io) + ',' for io in routing_io_list + ctrl_io_list]
-    io_section[-1] = io_section[-1].replace(',', '')
-    
-    return io_section
+    return getANSIHeaderItems(self.__getIOPorts(slot), indent='  ')
 
   def __connectCtrlSignalsForSAXISlot(self, s_axi_slot):
     ctrl_io_list = self.__getSAxiSlotCtrlIO(s_axi_slot)
@@ -172,7 +180,7 @@ class CreateCtrlSlotWrapper:
 
     # connect ap_start
     connect.append('wire ap_start_orig;')
-    out_bound_ap_start = [io[-1] for io in ctrl_io_list if 'ap_start' in io[-1] ]
+    out_bound_ap_start = [io.name for io in ctrl_io_list if 'ap_start' in io.name ]
     for sig in out_bound_ap_start:
       connect.append(f'(* keep = "true" *) reg {sig}_q;')
       connect.append(f'always @ (posedge ap_clk) {sig}_q <= ap_start_orig;')
@@ -180,14 +188,14 @@ class CreateCtrlSlotWrapper:
     connect.append(f'assign ap_start = ap_start_orig;') # connect to self
 
     # connect ap_rst_n
-    out_bound_ap_rst_n = [io[-1] for io in ctrl_io_list if 'ap_rst_n_' in io[-1] ]
+    out_bound_ap_rst_n = [io.name for io in ctrl_io_list if 'ap_rst_n_' in io.name ]
     for sig in out_bound_ap_rst_n:
       connect.append(f'(* keep = "true" *) reg {sig}_q;')
       connect.append(f'always @ (posedge ap_clk) {sig}_q <= ap_rst_n;') # ap_rst_n connect to top level port
       connect.append(f'assign {sig} = {sig}_q;')
 
     # connect ap_done
-    in_bound_ap_done = [io[-1] for io in ctrl_io_list if 'ap_done' in io[-1] ]
+    in_bound_ap_done = [io.name for io in ctrl_io_list if 'ap_done' in io.name ]
     for sig in in_bound_ap_done:
       connect.append(f'(* keep = "true" *) reg {sig}_q;')
 
@@ -275,62 +283,76 @@ class CreateCtrlSlotWrapper:
     # so that they can be replaced later by separately implemented DCPs
     slot_inst.append(f'\n\n  (* dont_touch = "yes" *) {slot.getRTLModuleName()}_routing {slot.getRTLModuleName()}_routing_U0 (')
 
-    routing_slot_io_list = self.routing_slot_to_io[slot]
-    for io in routing_slot_io_list:
-      slot_inst.append(f'    .{io[-1]}({io[-1]}),') 
-      
-    # handle the last io
-    slot_inst[-1] = slot_inst[-1].replace(',', '\n  );') 
+    slot_inst += getInstPortMap(self.routing_slot_to_ports[slot], indent='    ')
+    slot_inst.append('  );')
     
     return slot_inst
 
-  def getCtrlInclusiveWrapper(self, slot):
+  def getCtrlWrapperModule(self, slot):
+    """
+    yield the lines of the ctrl wrapper, excluding the inner wrappers
+    """
+    yield '\n\n`timescale 1 ns / 1 ps'
 
-    wrapper = ['\n\n`timescale 1 ns / 1 ps']
-
-    wrapper.append(f'\n\nmodule {slot.getRTLModuleName()}_ctrl (')
-    wrapper += self.__getIOSection(slot)
-    wrapper.append(f');')
+    yield f'\n\nmodule {slot.getRTLModuleName()}_ctrl ('
+    yield from self.__getIOSection(slot)
+    yield f');'
 
     if slot == self.s_axi_slot:
-      wrapper += self.__connectCtrlSignalsForSAXISlot(slot)
+      yield from self.__connectCtrlSignalsForSAXISlot(slot)
     else:
-      wrapper += self.__connectCtrlSignalsForOtherSlot(slot)
-
-    wrapper += self.__getInnerWrapperInst(slot)
+      yield from self.__connectCtrlSignalsForOtherSlot(slot)
 
-    wrapper.append(f'endmodule')
+    yield from self.__getInnerWrapperInst(slot)
 
-    # include the inner wrapper
-    wrapper += self.routing_wrapper_creater.getRoutingInclusiveWrapper(slot)
+    yield f'endmodule'
 
-    return wrapper
+  def writeCtrlInclusiveWrapper(self, slot):
+    """
+    stream the ctrl wrapper to the file, then include the inner wrappers from the routing wrapper file
+    """
+    with RTLWriter(self.getCtrlWrapperPath(slot)) as writer:
+      writer.writeLines(self.getCtrlWrapperModule(slot))
+      writer.appendFile(self.routing_wrapper_creater.getRoutingWrapperPath(slot))
+    return writer.getDigest()
   
-  def createCtrlInclusiveWrapperForAll(self, dir='ctrl_wrapper_rtl'):
-    for slot in self.all_active_slots:
-      wrapper = self.getCtrlInclusiveWrapper(slot)
-      f = open(dir + '/' + slot.getRTLModuleName()+'_ctrl.v', 'w')
-      f.write('\n'.join(wrapper))
+  def createCtrlInclusiveWrapperForAll(self, dir='ctrl_wrapper_rtl', jobs=1):
+    self.rtl_dir = dir
+    slots = list(self.all_active_slots)
+    digests = forkMap(lambda i: self.writeCtrlInclusiveWrapper(slots[i]), range(len(slots)), jobs)
+    self.slot_to_digest = dict(zip(slots, digests))
 
-  def getSlotToIOList(self):
-    """maintain the same interface as CreateSlotWrapper """
-    def processIODecl(io_decl):
-      io_decl = [io.replace(',', '') for io in io_decl]
-      io_decl = [io.split() for io in io_decl] # ensure that no space in width, e.g., [1+2:0]
-      return io_decl
+    # all wires between the ctrl wrappers, i.e., the IOs except the top-level IOs
+    top_rtl_parser = self.routing_wrapper_creater.top_rtl_parser
+    self.wire_index = WireIndex(self.getSlotToPorts(), lambda p: not top_rtl_parser.isIO(p.name))
 
-    slot_2_io = {}
-    for slot in self.all_active_slots:
-      io_section = self.__getIOSection(slot)
-      io_section = processIODecl(io_section)
-      slot_2_io[slot] = io_section
+  def getWireIndex(self) -> WireIndex:
+    assert self.wire_index, 'the wrappers have not been created'
+    return self.wire_index
 
-    return slot_2_io
+  def getWrapperDigest(self, slot):
+    return self.slot_to_digest[slot]
+
+  def getCtrlWrapperPath(self, slot):
+    assert self.rtl_dir, 'the wrappers have not been created'
+    return self.rtl_dir + '/' + slot.getRTLModuleName() + '_ctrl.v'
+
+  def getSlotToPorts(self):
+    """maintain the same interface as CreateSlotWrapper """
+    return {slot: self.__getIOPorts(slot) for slot in self.all_active_slots}
+
+  def getSlotToIOList(self):
+    """maintain the same interface as CreateSlotWrapper """
+    return {slot: [p.toList() for p in ports] for slot, ports in self.getSlotToPorts().items()}
 
   def getSlotNameToIOList(self):
     slot_2_io = self.getSlotToIOList()
     return {slot.getRTLModuleName() : io_list for slot, io_list in slot_2_io.items()}
 
+  def getSlotNameToPorts(self):
+    slot_2_ports = self.getSlotToPorts()
+    return {slot.getRTLModuleName() : ports for slot, ports in slot_2_ports.items()}
+
   # include all signals except top-level ports
   def getSlotToDirToWires(self):
 
@@ -354,20 +376,22 @@ class CreateCtrlSlotWrapper:
         if wires:
           dir_to_wires[dir] = wires
 
+    # the ctrl wires to the neighbors, the boundary of each wire is looked up from the wire index
+    wire_index = self.getWireIndex()
     for slot, dir_to_wires in ctrl_slot_to_dir_to_wires.items():
       if slot == self.s_axi_slot:
         ctrl_io_list = self.__getSAxiSlotCtrlIO(slot)
       else:
         ctrl_io_list= self.__getOtherSlotCtrlIO(slot)
 
+      dir_to_ctrl_wires = {}
+      for io in ctrl_io_list:
+        if wire_index.isConnectingWire(io.name):
+          dir_to_ctrl_wires.setdefault(wire_index.getBoundaryOfSlot(io.name, slot), []).append(io.toList())
+
       for dir in ['UP', 'DOWN', 'RIGHT', 'LEFT']:
-        boundary_name = slot.getBoundarySegmentName(dir)
-        for io in ctrl_io_list:
-          if boundary_name in io[-1]:
-            if dir in dir_to_wires:
-              dir_to_wires[dir].append(io)
-            else:
-              dir_to_wires[dir] = [io]
+        if dir in dir_to_ctrl_wires:
+          dir_to_wires.setdefault(dir, []).extend(dir_to_ctrl_wires[dir])
 
     return ctrl_slot_to_dir_to_wires
 
@@ -1,11 +1,11 @@
 #! /usr/bin/python3.6
 import logging
 import json
-import re
+import os
 from collections import defaultdict
 from autobridge.Opt.Slot import Slot
-from autobridge.Device.DeviceManager import DeviceU250
-U250_inst = DeviceU250()
+from rapidstream.FE.PortRecord import Port
+from rapidstream.FE.RTLEmitter import copyRTL
 
 
 class CreateResultJson:
@@ -18,7 +18,7 @@ class CreateResultJson:
       hls_prj_manager, 
       slot_manager, 
       top_rtl_parser, 
-      new_top_rtl):
+      new_top_rtl_path):
     self.floorplan = floorplan
     self.wrapper_creater = wrapper_creater
     self.global_router = global_router
@@ -26,7 +26,7 @@ class CreateResultJson:
     self.hls_prj_manager = hls_prj_manager
     self.slot_manager = slot_manager
     self.top_rtl_parser = top_rtl_parser
-    self.new_top_rtl = new_top_rtl
+    self.new_top_rtl_path = new_top_rtl_path
 
   def __getNeighborSection(self):
     neighbors = defaultdict(dict)
@@ -86,10 +86,24 @@ class CreateResultJson:
     
     return shared_anchors
 
-  def __getSlotWrapperRTLSection(self):
+  def __writeRTLArtifact(self, src_path: str, hub_dir: str, rel_path: str):
+    """
+    the RTL is copied as a separate file. The hub only records the path relative to the hub and the hash
+    """
+    os.makedirs(os.path.dirname(os.path.join(hub_dir, rel_path)), exist_ok=True)
+    digest = copyRTL(src_path, os.path.join(hub_dir, rel_path))
+    return {'Path': rel_path, 'SHA256': digest}
+
+  def __getSlotWrapperRTLSection(self, hub_dir):
     slot_to_rtl = {}
     for slot in self.slot_manager.getActiveSlotsIncludeRouting():
-      slot_to_rtl[slot.getRTLModuleName()] = self.wrapper_creater.getCtrlInclusiveWrapper(slot)
+      slot_to_rtl[slot.getRTLModuleName()] = self.__writeRTLArtifact(
+        self.wrapper_creater.getCtrlWrapperPath(slot), hub_dir, f'front_end_rtl/{slot.getRTLModuleName()}_ctrl.v'
+      )
+
+      # the copy must be the wrapper as generated
+      assert slot_to_rtl[slot.getRTLModuleName()]['SHA256'] == self.wrapper_creater.getWrapperDigest(slot), \
+        f'{self.wrapper_creater.getCtrlWrapperPath(slot)} has been modified'
     return slot_to_rtl
 
   def __getSlotToDirToWireNum(self, slot_to_dir_to_wires, all_slot_pairs):
@@ -97,27 +111,17 @@ class CreateResultJson:
     collect the total wire width at each boundary of slots
     """
     slot_to_dir_to_num = defaultdict(dict)
-    def __getWireWidth(wire):
-      if len(wire) == 2:
-        return 1
-      
-      assert len(wire) == 3
-      rtl_width = wire[1] # [X:0]
-      match = re.search(r'\[[ ]*(\d+)[ ]*:[ ]*(\d+)[ ]*\]', rtl_width)
-      int_width = int(match.group(1)) - int(match.group(2)) + 1
-      return int_width
-
     for slot, dir_to_wires in slot_to_dir_to_wires.items():
       for dir, wires in dir_to_wires.items():
-        all_wire_num = sum(__getWireWidth(wire) for wire in wires)
+        all_wire_num = sum(Port.fromList(wire).getIntegerWidth() for wire in wires)
         slot_to_dir_to_num[slot][dir] = all_wire_num
 
     # double check the results are consistent
     for pair in all_slot_pairs:
       slot0_name = pair[0]
       slot1_name = pair[1]
-      slot0 = Slot(U250_inst, slot0_name)
-      slot1 = Slot(U250_inst, slot1_name)
+      slot0 = Slot(self.board, slot0_name)
+      slot1 = Slot(self.board, slot1_name)
 
       if slot0.isToTheLeftOf(slot1):
         if 'RIGHT' in slot_to_dir_to_num[slot0_name]:
@@ -147,10 +151,12 @@ class CreateResultJson:
     # result['FloorplanEdge'] = self.floorplan.getSlotNameToEdgeNames()
     
     result['SlotIO'] = self.wrapper_creater.getSlotNameToIOList()
-    result['SlotWrapperRTL'] = self.__getSlotWrapperRTLSection()
+    # the RTL is not embedded. Use loadRTLArtifact in the BE to read them
+    hub_dir = os.path.dirname(os.path.abspath(file))
+    result['SlotWrapperRTL'] = self.__getSlotWrapperRTLSection(hub_dir)
     result['TopIO'] = self.top_rtl_parser.getDirWidthNameOfAllIO()
     
-    result['NewTopRTL'] = self.new_top_rtl
+    result['NewTopRTL'] = self.__writeRTLArtifact(self.new_top_rtl_path, hub_dir, 'front_end_rtl/new_top.v')
     
     result['PathPlanningWire'] = self.wrapper_creater.getSlotNameToDirToWires()
     
@@ -165,5 +171,7 @@ class CreateResultJson:
 
     result['SlotToDirToWireNum'] = self.__getSlotToDirToWireNum(result['PathPlanningWire'], result['AllSlotPairs'])
 
+    result['RoutingIndex'] = self.global_router.getRoutingIndex().toDict()
+
     f = open(file, 'w')
     f.write(json.dumps(result, indent=2))
\ No newline at end of file
@@ -3,11 +3,16 @@ import logging
 from typing import List
 import re
 
+from rapidstream.FE.ParallelMap import forkMap
+from rapidstream.FE.PortRecord import Port, getANSIHeaderItems, getInstPortMap
+from rapidstream.FE.WireIndex import WireIndex
+from rapidstream.FE.RTLEmitter import RTLWriter
+
 class CreateRoutingSlotWrapper:
 
   def __init__(self, compute_wrapper_creater, floorplan, global_router, top_rtl_parser, pipeline_style, anchor_plan: int):
     self.compute_wrapper_creater = compute_wrapper_creater
-    self.compute_slot_to_io = compute_wrapper_creater.getSlotToIOList()
+    self.compute_slot_to_ports = compute_wrapper_creater.getSlotToPorts()
     self.floorplan = floorplan
     self.global_router = global_router
     self.top_rtl_parser = top_rtl_parser
@@ -15,6 +20,9 @@ class CreateRoutingSlotWrapper:
     self.target = compute_wrapper_creater.target # maintain the same interface with CreateSlotWrapper
     self.in_slot_pipeline_style = pipeline_style
     self.anchor_plan = anchor_plan
+    self.rtl_dir = None
+    self.slot_to_digest = {} # sha256 of each wrapper file
+    self.wire_index = None # built once the wrappers are created
 
     self.edge_wire_to_suffix_index = {}
 
@@ -47,8 +55,8 @@ class CreateRoutingSlotWrapper:
         suffix = [key for key in ['_din', '_full_n', '_write'] if port_name.endswith(key)]
         if suffix:
           wire_width = self.top_rtl_parser.getWidthOfRegOrWire(wire_name)
-          passing_e_io.append(f'{self.inbound_dir[suffix[0]]} {wire_width} {wire_name}{in_tag};')
-          passing_e_io.append(f'{self.outbound_dir[suffix[0]]} {wire_width} {wire_name}{out_tag};')
+          passing_e_io.append(Port(self.inbound_dir[suffix[0]], wire_width, f'{wire_name}{in_tag}'))
+          passing_e_io.append(Port(self.outbound_dir[suffix[0]], wire_width, f'{wire_name}{out_tag}'))
 
     return passing_e_io
 
@@ -79,51 +87,43 @@ class CreateRoutingSlotWrapper:
           if is_inbound:
             # the current slot is the dst of the edge
             path_len = self.global_router.getPathLength(e.name)
-            inter_slot_e_io.append(f'{dir} {wire_width} {wire_name}_pass_{path_len};')
+            inter_slot_e_io.append(Port(dir, wire_width, f'{wire_name}_pass_{path_len}'))
           else: # outbound
-            inter_slot_e_io.append(f'{dir} {wire_width} {wire_name}_pass_0;')
+            inter_slot_e_io.append(Port(dir, wire_width, f'{wire_name}_pass_0'))
 
     return inter_slot_e_io
 
-  def getWrapperCtrlIO(self, slot, inter_slot_e_io : List[str]):
-    """ get the remaining IO besides the inter slot edge IO """
-    ctrl_io = []
-    compute_slot_io_list = self.compute_slot_to_io[slot]
-    for io in compute_slot_io_list:
-      if any(f'{io[-1]}_pass_' in e_io for e_io in inter_slot_e_io):
-        continue
-      else:
-        ctrl_io.append(' '.join(io) + ';')
-
-    return ctrl_io
+  def getWrapperCtrlIO(self, slot, edge_io : List[Port]):
+    """ get the remaining IO besides the edge IO, whose names are the compute wrapper IO + '_pass_<index>' """
+    edge_wire_names = set(io.name[:io.name.rindex('_pass_')] for io in edge_io)
+    return [io for io in self.compute_slot_to_ports[slot] if io.name not in edge_wire_names]
 
-  def getIOSection(self, slot, is_pure_routing = False):
+  def getIOPorts(self, slot, is_pure_routing = False):
     """
     Differentiate compute slots and pure routing slots
     Add ap signals for pure routing signals for compatibility
     """
-    inter_slot_e_io = self.getPassingEdgeIO(slot)
-    io_section = inter_slot_e_io
+    io_ports = self.getPassingEdgeIO(slot)
 
     if not is_pure_routing:
-      io_section += self.getInterSlotEdgeIO(slot)
-      io_section += self.getWrapperCtrlIO(slot, inter_slot_e_io)
+      io_ports += self.getInterSlotEdgeIO(slot)
+      io_ports += self.getWrapperCtrlIO(slot, io_ports)
     else:
       # add pseudo control signals to maintain the same interface format
-      io_section += [
-        'input ap_start,',
-        'output ap_done,',
-        'output ap_idle,',
-        'output ap_ready,',
-        'input ap_continue,',
-        'input ap_clk,',
-        'input ap_rst_n,'
+      io_ports += [
+        Port('input', '', 'ap_start'),
+        Port('output', '', 'ap_done'),
+        Port('output', '', 'ap_idle'),
+        Port('output', '', 'ap_ready'),
+        Port('input', '', 'ap_continue'),
+        Port('input', '', 'ap_clk'),
+        Port('input', '', 'ap_rst_n'),
       ]
 
-    io_section = [io.replace(';', ',') for io in io_section]
-    io_section[-1] = io_section[-1].replace(',', '')
+    return io_ports
 
-    return io_section
+  def getIOSection(self, slot, is_pure_routing = False):
+    return getANSIHeaderItems(self.getIOPorts(slot, is_pure_routing))
 
   def connectPassingWires(self, slot, pipeline_level = 1):
     """ 
@@ -267,76 +267,77 @@ class CreateRoutingSlotWrapper:
     # so that they can be replaced later by separately implemented DCPs
     slot_inst.append(f'\n\n  (* dont_touch = "yes" *) {slot.getRTLModuleName()} {slot.getRTLModuleName()}_U0 (')
 
-    compute_slot_io_list = self.compute_slot_to_io[slot]
-    for io in compute_slot_io_list:
-      slot_inst.append(f'    .{io[-1]}({io[-1]}),') 
-      
-    # handle the last io
-    slot_inst[-1] = slot_inst[-1].replace(',', '\n  );') 
+    slot_inst += getInstPortMap(self.compute_slot_to_ports[slot], indent='    ')
+    slot_inst.append('  );')
     
     return slot_inst
 
-  def getRoutingInclusiveWrapper(self, slot):
+  def getRoutingWrapperModule(self, slot):
+    """
+    yield the lines of the routing wrapper, excluding the inner wrapper
+    """
     is_pure_routing = self.global_router.isPureRoutingSlot(slot)
 
-    wrapper = ['\n\n`timescale 1 ns / 1 ps']
+    yield '\n\n`timescale 1 ns / 1 ps'
 
-    wrapper.append(f'\n\nmodule {slot.getRTLModuleName()}_routing (')
-    wrapper += self.getIOSection(slot, is_pure_routing)
-    wrapper.append(f');')
+    yield f'\n\nmodule {slot.getRTLModuleName()}_routing ('
+    yield from self.getIOSection(slot, is_pure_routing)
+    yield f');'
 
-    wrapper += self.connectPassingWires(slot)
+    yield from self.connectPassingWires(slot)
 
     if not is_pure_routing:
-      wrapper += self.connectInterSlotEdgeWiresToIO(slot)
-      wrapper += self.getInnerWrapperInst(slot)
+      yield from self.connectInterSlotEdgeWiresToIO(slot)
+      yield from self.getInnerWrapperInst(slot)
     else:
-      wrapper += [
+      yield from [
         'assign ap_done = 1;',
         'assign ap_idle = 1;',
         'assign ap_ready = 1;'
       ]
 
-    wrapper.append(f'endmodule')
+    yield f'endmodule'
 
-    # include the inner wrapper
-    if not is_pure_routing:
-      wrapper += self.compute_wrapper_creater.getSlotWrapper(slot)
+  def writeRoutingInclusiveWrapper(self, slot):
+    """
+    stream the routing wrapper to the file, then include the inner wrapper from its file
+    """
+    with RTLWriter(self.getRoutingWrapperPath(slot)) as writer:
+      writer.writeLines(self.getRoutingWrapperModule(slot))
+      if not self.global_router.isPureRoutingSlot(slot):
+        writer.appendFile(self.compute_wrapper_creater.getSlotWrapperPath(slot))
+    return writer.getDigest()
 
-    return wrapper
+  def createRoutingInclusiveWrapperForAll(self, dir='wrapper_rtl', jobs=1):
+    self.rtl_dir = dir
+    slots = list(self.compute_slot_to_ports.keys()) + list(self.pure_routing_slots)
+    digests = forkMap(lambda i: self.writeRoutingInclusiveWrapper(slots[i]), range(len(slots)), jobs)
+    self.slot_to_digest = dict(zip(slots, digests))
 
-  def createRoutingInclusiveWrapperForAll(self, dir='wrapper_rtl'):
-    def generateWrapper(wrapper, slot):
-      f = open(dir + '/' + slot.getRTLModuleName()+'_routing.v', 'w')
-      f.write('\n'.join(wrapper))
+    # the wire segments between slots, i.e., the passing edge IOs and the inter-slot edge IOs
+    self.wire_index = WireIndex(self.getSlotToPorts(), lambda p: '_pass_' in p.name)
 
-    for slot, wrapper_io_list in self.compute_slot_to_io.items():
-      routing_wrapper = self.getRoutingInclusiveWrapper(slot)
-      generateWrapper(routing_wrapper, slot)
+  def getWrapperDigest(self, slot):
+    return self.slot_to_digest[slot]
 
-    for slot in self.pure_routing_slots:
-      routing_wrapper = self.getRoutingInclusiveWrapper(slot)
-      generateWrapper(routing_wrapper, slot)    
+  def getRoutingWrapperPath(self, slot):
+    assert self.rtl_dir, 'the wrappers have not been created'
+    return self.rtl_dir + '/' + slot.getRTLModuleName() + '_routing.v'
 
-  def getSlotToIOList(self):
+  def getSlotToPorts(self):
     """maintain the same interface as CreateSlotWrapper """
-    def processIODecl(io_decl):
-      io_decl = [io.replace(',', '') for io in io_decl]
-      io_decl = [io.split() for io in io_decl] # ensure that no space in width, e.g., [1+2:0]
-      return io_decl
-
-    routing_slot_2_io = {}
-    for slot in self.compute_slot_to_io.keys():
-      io_decl = self.getIOSection(slot)
-      io_decl = processIODecl(io_decl)
-      routing_slot_2_io[slot] = io_decl
+    routing_slot_2_ports = {}
+    for slot in self.compute_slot_to_ports.keys():
+      routing_slot_2_ports[slot] = self.getIOPorts(slot)
 
     for slot in self.pure_routing_slots:
-      io_decl = self.getIOSection(slot, is_pure_routing=True)
-      io_decl = processIODecl(io_decl)
-      routing_slot_2_io[slot] = io_decl
+      routing_slot_2_ports[slot] = self.getIOPorts(slot, is_pure_routing=True)
+
+    return routing_slot_2_ports
 
-    return routing_slot_2_io
+  def getSlotToIOList(self):
+    """maintain the same interface as CreateSlotWrapper """
+    return {slot: [p.toList() for p in ports] for slot, ports in self.getSlotToPorts().items()}
 
   def getSlotNameToIOList(self):
     routing_slot_2_io = self.getSlotToIOList()
@@ -347,78 +348,50 @@ class CreateRoutingSlotWrapper:
     in vivado flow, to declare a module instance as black box, we must have an empty initilization
     """
     empty_wrappers = []
-    routing_slot_2_io = self.getSlotToIOList()
-    for slot, io_decl in routing_slot_2_io.items():
+    routing_slot_2_ports = self.getSlotToPorts()
+    for slot, io_ports in routing_slot_2_ports.items():
       empty_wrappers.append(f'\n\nmodule {slot.getRTLModuleName()}_routing (')
-      empty_wrappers += [' '.join(io) + ',' for io in io_decl]
-      empty_wrappers[-1] = empty_wrappers[-1].replace(',', '')
+      empty_wrappers += getANSIHeaderItems(io_ports)
       empty_wrappers.append(f');')
       empty_wrappers.append(f'endmodule')
     return empty_wrappers
 
+  def getWireIndex(self) -> WireIndex:
+    assert self.wire_index, 'the wrappers have not been created'
+    return self.wire_index
+
   def getDirectionOfPassingEdgeWiresUpdated(self):
     """
     Since the routing wrapper will rename the wires
     the mapping from boudary to wires from global routing will be outdated
     Here the mapping is updated by attaching suffixes to the wire name
     The problem is that the same wire will go in and out of the same slot, though through different boundary
-    To correctly set the index in their appendix, we start with the IN side
-    And we sort the list of modified IO
-    For each wire of inbound edges, we look for the first partial match in the list of modified IO
-    for a passing edge, the one with smaller index will be used.
-    Then we remove the used ones from the list of modified IO
-    After all inbound edges are processed, we go with outbound edges.
-    Example: a slot may have input "foobar_din_pass_0" on one edge
-    and output "foo_bar_din_pass_1" on the other edge
+    e.g., a slot may have input "foobar_din_pass_0" from the LEFT and output "foobar_din_pass_1" to the RIGHT.
     The original slot_to_wire mapping will have two "foobar_din" on two different directions
-    We need to change each of them accordingly to add the suffix
-    The wire at the IN side always has a smaller index 
+    We need to change each of them accordingly to add the suffix.
+    Each renamed wire connects the slot to exactly one neighbor, thus we look up the segment of the
+    original wire at each boundary of the slot from the wire index
 
     change 1: slot -> dir -> wires 
     change 2: routing inclusive wrapper causes the wires to have duplications, add suffix to differentiate them
     change 3: add the width information as well because of backend's need
     """
-
-    def partialMatchAndRemove():
-      updated_io_list = []
-      for orig_wire in orig_wire_list:
-        for updated_io in routing_wrapper_io_list[:] :
-          if f'{orig_wire}_pass_' in updated_io[-1]:
-            updated_io_list.append(updated_io)
-
-            # remove so that this io will not be matched again
-            routing_wrapper_io_list.remove(updated_io)
-
-            # break to prevent redundant matching
-            break
-
-      dir_to_wires[dir] = updated_io_list
-
     # at this point no width or i/o direction is appended
     slot_to_dir_to_wires = self.global_router.getDirectionOfPassingEdgeWires()
-    
-    routing_slot_2_io = self.getSlotToIOList() # the return has separated direction, width and wire name
-    
-    for slot, dir_to_wires in slot_to_dir_to_wires.items():
-      routing_wrapper_io_list = routing_slot_2_io[slot]
-      routing_wrapper_wire_list = [io[-1] for io in routing_wrapper_io_list]
 
-      # sort the updated io list so that small index comes first
-      routing_wrapper_io_list.sort(key=lambda io : io[-1])
+    wire_index = self.getWireIndex()
+    slot_to_boundary_to_wires = wire_index.getSlotToBoundaryToWires()
 
-      # first match the IN side because inbound edges have smaller indices
-      for dir, orig_wire_list in dir_to_wires.items():
-        if '_IN' in dir:
-          partialMatchAndRemove()
-        
-      # next match the OUT side. Previously matched IOs have been removed
-      for dir, orig_wire_list in dir_to_wires.items():
-        if '_OUT' in dir:
-          partialMatchAndRemove()
+    for slot, dir_to_wires in slot_to_dir_to_wires.items():
+      # boundary -> original wire name -> the renamed wire at this boundary
+      boundary_to_orig_to_wire = {}
+      for boundary, wires in slot_to_boundary_to_wires.get(slot, {}).items():
+        boundary_to_orig_to_wire[boundary] = {wire[:wire.rindex('_pass_')] : wire for wire in wires}
 
-      # only ctrl IOs should be left
-      assert all(io[-1].startswith('ap_') or '_axi' in io[-1] or 'interrupt' in io[-1] \
-        for io in routing_wrapper_io_list)
+      # e.g., UP_IN and UP_OUT both pass the UP boundary
+      for dir, orig_wire_list in dir_to_wires.items():
+        orig_to_wire = boundary_to_orig_to_wire[dir.split('_')[0]]
+        dir_to_wires[dir] = [wire_index.getPortOfSlot(orig_to_wire[orig_wire], slot).toList() for orig_wire in orig_wire_list]
 
     # the width and i/o direction is also attached
-    return slot_to_dir_to_wires
\ No newline at end of file
+    return slot_to_dir_to_wires
@@ -1,19 +1,73 @@
 #! /usr/bin/python3.6
 import logging
 import re
-import copy
 import os
 import shutil
+import sys
 from autobridge.Codegen.FIFOTemplate import fifo_template
+from rapidstream.FE.ParallelMap import forkMap
+from rapidstream.FE.PortRecord import Port, getHeaderNames
+from rapidstream.FE.RTLEmitter import writeRTL
+
+
+class WireDeclIndex:
+  """
+  the wire/reg declarations of the original top RTL, classified once and shared by all slot wrappers.
+  Each wrapper selects the declarations it uses by name instead of copying and filtering the entire list
+  """
+  AP_SIGNALS = ['ap_start', 'ap_done', 'ap_ready', 'ap_idle']
+
+  def __init__(self, all_decl):
+    self.all_decl = all_decl
+
+    # comments and parameters are kept in every wrapper
+    self.always_kept_pos = []
+
+    # wire/reg name -> positions of its declarations
+    self.name_to_pos = {}
+
+    for pos, d in enumerate(all_decl):
+      # the original ap signals are removed from every wrapper
+      if any(re.search(f' {signal}', d) for signal in self.AP_SIGNALS):
+        continue
+      elif re.search(r'^[ ]*//', d):
+        self.always_kept_pos.append(pos)
+      # do not filter parameters because parameters may be used to calculate other param, making things complicated
+      elif 'parameter' in d:
+        self.always_kept_pos.append(pos)
+      else:
+        # get the wire name
+        # case 1: wire x;
+        # case 2: wire [1:0] x;
+        # case 3: wire [1:0]x;
+        match = re.search(r' ([^ \]]*);', d); assert match
+        self.name_to_pos.setdefault(sys.intern(match.group(1)), []).append(pos)
+
+  def getUsedDecl(self, used_wires, io_names):
+    """
+    the declarations of the used wires that are not IOs, plus comments and parameters, in the original order
+    """
+    kept_pos = list(self.always_kept_pos)
+    for name in used_wires:
+      # we do not want redundant wire and IO declaration
+      if name in io_names:
+        if name in self.name_to_pos:
+          logging.debug(f'filter out {name} due to io redundancy')
+        continue
+      kept_pos += self.name_to_pos.get(name, [])
+
+    kept_pos.sort()
+    return [self.all_decl[pos] for pos in kept_pos]
 
 class CreateSlotWrapper:
-  def __init__(self, graph, top_rtl_parser, floorplan, global_router, rebalance, target='hw'):
+  def __init__(self, graph, top_rtl_parser, floorplan, global_router, rebalance, target='hw', jobs=1):
     self.graph = graph
     self.top_rtl_parser = top_rtl_parser
     self.floorplan = floorplan
     self.global_router = global_router
     self.rebalance = rebalance
     self.target = target
+    self.jobs = jobs # number of worker processes to create the wrappers
 
     # only contains the ap_done signals that are part of the final ap_done
     self.ap_done_v_name_to_wire = top_rtl_parser.getApDoneVNameToWire()
@@ -24,15 +78,12 @@ class CreateSlotWrapper:
     self.s2v = floorplan.getSlotToVertices()
     self.s2e = floorplan.getSlotToEdges()
 
-    self.slot2wrapper = {}
-    self.__initSlotWrapper()
-    
-  def __getWireDeclCopy(self, slot) -> str:
-    """
-    Different wrappers will filter out different wires
-    To avoid interference, we make a deep copy of the entire wire list from the original top RTL
-    """
-    return copy.deepcopy(self.top_rtl_parser.getAllDeclExceptIO())
+    # Different wrappers will filter out different wires. They share the same index of the original declarations
+    self.wire_decl_index = WireDeclIndex(top_rtl_parser.getAllDeclExceptIO())
+
+    # the wrappers are streamed to files in this directory, see getSlotWrapperForAll
+    self.rtl_dir = None
+    self.slot_to_digest = {} # sha256 of each wrapper file
 
   def __getVertexInstances(self, slot):
     v_list = self.s2v[slot]
@@ -63,26 +114,14 @@ class CreateSlotWrapper:
     
     return edge_insts
 
-  def __getHeader(self, slot):
+  def __getHeader(self, slot, io_ports):
     """
     note the difference between getHeader and getIOSec:
     getHeader -> module xxx (a, b, c, ...)
     getIOSec  -> input a; output [1:0] b, ...
     """
-    io_decl = self.__getIODecl(slot)
-    io_decl_with_comma = [io.replace(';', ',') for io in io_decl]
-
-    # need to consider if the IO name contains "input" or "output"
-    io_header = [re.sub(r'^[ ]*input[ ]*|^[ ]*output[ ]*', '', io) for io in io_decl_with_comma]
-    
-    io_header = [re.sub(r'[ ]*\[.*\][ ]*', '', io) for io in io_header]
-    io_header[-1] = io_header[-1].replace(',', '') # the last io does not have comma
-
-    # add indentation
-    io_header = ['  '+io for io in io_header]
-
     beg = ['\n\n`timescale 1 ns / 1 ps', f'module {slot.getRTLModuleName()} (']
-    io_header = beg + io_header
+    io_header = beg + getHeaderNames(io_ports, indent='  ')
     io_header.append(');')
 
     return io_header
@@ -90,7 +129,7 @@ class CreateSlotWrapper:
   def __getEnding(self):
     return ['endmodule']
 
-  def __getIODecl(self, slot):
+  def __getIOPorts(self, slot):
     """
     get the IO of each wrapper
     1. inter-slot edges
@@ -113,29 +152,29 @@ class CreateSlotWrapper:
         if suffix:
           dir = wire_dir[suffix[0]]
           wire_width = self.top_rtl_parser.getWidthOfRegOrWire(wire_name)
-          IO_section.append(f'{dir} {wire_width} {wire_name};')
+          IO_section.append(Port(dir, wire_width, wire_name))
 
     # if any vertex is an AXI module, it will contain top-level IO
     for v in self.s2v[slot]:
       if '_axi' in v.name:
         for wire in self.top_rtl_parser.getWiresOfVertexName(v.name):
           if self.top_rtl_parser.isIO(wire) and 'ap_' not in wire: # to avoid redundant ap ports
-            IO_section.append(f'{self.top_rtl_parser.getDirOfIO(wire)} {self.top_rtl_parser.getWidthOfIO(wire)} {wire};')
+            IO_section.append(Port(self.top_rtl_parser.getDirOfIO(wire), self.top_rtl_parser.getWidthOfIO(wire), wire))
 
     # control signals
-    IO_section.append('input  ap_start;')
-    IO_section.append('output ap_done;')
-    IO_section.append('output ap_idle;')
-    IO_section.append('output ap_ready;')
-    IO_section.append('input  ap_continue;')
-    IO_section.append('input ap_clk;')
-    IO_section.append('input ap_rst_n;')
+    IO_section.append(Port('input', '', 'ap_start'))
+    IO_section.append(Port('output', '', 'ap_done'))
+    IO_section.append(Port('output', '', 'ap_idle'))
+    IO_section.append(Port('output', '', 'ap_ready'))
+    IO_section.append(Port('input', '', 'ap_continue'))
+    IO_section.append(Port('input', '', 'ap_clk'))
+    IO_section.append(Port('input', '', 'ap_rst_n'))
 
     if any('s_axi' in v.name for v in self.s2v[slot]):
-      IO_section.append('output ap_start_orig;')
-      IO_section.append('input  ap_done_final;')
-      IO_section.append('input  ap_idle_final;')
-      IO_section.append('input  ap_ready_final;')
+      IO_section.append(Port('output', '', 'ap_start_orig'))
+      IO_section.append(Port('input', '', 'ap_done_final'))
+      IO_section.append(Port('input', '', 'ap_idle_final'))
+      IO_section.append(Port('input', '', 'ap_ready_final'))
 
     return IO_section
 
@@ -259,20 +298,17 @@ class CreateSlotWrapper:
   def __setApIdle(self, stmt):
     stmt.append('assign ap_idle = ap_done;')
 
-  # TODO: this one is too slow
-  def __filterUnusedDecl(self, decl, v_insts, e_insts, io_decl):
+  def __getUsedDecl(self, v_insts, e_insts, io_ports):
     """
-    we start with the complete wire/reg declaration from the original top file
-    for each wrapper, we only keep the ones that are used in this wrapper
+    from the complete wire/reg declaration of the original top file,
+    we only keep the ones that are used in this wrapper
     """
     insts = v_insts + e_insts
-    decl_filter = []
-    ap_signals = ['ap_start', 'ap_done', 'ap_ready', 'ap_idle']
 
-    # find out the io names
-    io_names = set([re.search(' ([^ ]+)[ ]*;', line).group(1) for line in io_decl])
+    io_names = set(p.name for p in io_ports)
 
     # find out which wires are used by the instances
+    # no exact match here as it is OK to add more wires
     used_wires_in_insts = set()
     for inst in insts:
       inst_list = inst.split('\n')
@@ -281,41 +317,7 @@ class CreateSlotWrapper:
         if match:
           used_wires_in_insts.add(match.group(1))
 
-    for d in decl:
-      # remove the original ap signals
-      if any(re.search(f' {signal}', d) for signal in ap_signals):
-        continue
-      # do not filter comments
-      elif re.search(r'^[ ]*//', d):
-        decl_filter.append(d)
-        continue
-      # do not filter parameters because parameters may be used to calculate other param, making things complicated
-      elif 'parameter' in d:
-        decl_filter.append(d)
-        continue
-
-      else:
-        # get the wire name
-        # case 1: wire x;
-        # case 2: wire [1:0] x;
-        # case 3: wire [1:0]x;
-        match = re.search(r' ([^ \]]*);', d); assert match
-        name = match.group(1)
-
-        # we do not want redundant wire and IO declaration
-        # add a space before name for exact match
-        # avoid filtering out a wire unexpectedly
-        if name in io_names:
-          logging.debug(f'filter out {name} due to io redundancy')
-          continue
-        # if a wire is used & it is not an IO
-        # no exact match here as it is OK to add more wires
-        elif name in used_wires_in_insts:
-          decl_filter.append(d)
-        else:
-          logging.debug(f'filter out {name} due to no match')
-
-    decl[:] = decl_filter
+    return self.wire_decl_index.getUsedDecl(used_wires_in_insts, io_names)
 
   def __addIndent(self, *sections):
     for sec in sections:
@@ -372,11 +374,6 @@ class CreateSlotWrapper:
     stmt.append('  ap_rst_n_pipe <= ap_rst_n_p2;')
     stmt.append('end')
 
-  def __initSlotWrapper(self):
-    for s in self.s2v.keys():
-      wrapper = self.createSlotWrapper(s)
-      self.slot2wrapper[s] = wrapper
-
   def __setKeepHier(self, insts):
     """
     Prevent unexpected behaviour from the synthesizer
@@ -386,9 +383,12 @@ class CreateSlotWrapper:
     return [get_tag(inst) + inst for inst in insts]
 
   def createSlotWrapper(self, slot):
-    header = self.__getHeader(slot)
-    decl = self.__getWireDeclCopy(slot)
-    io_decl = self.__getIODecl(slot)
+    """
+    yield the sections of the wrapper one after another
+    """
+    io_ports = self.__getIOPorts(slot)
+    header = self.__getHeader(slot, io_ports)
+    io_decl = [p.toDecl() for p in io_ports]
     v_insts = self.__getVertexInstances(slot)
     e_insts = self.__getEdgeInstances(slot)
     stmt = []
@@ -399,7 +399,7 @@ class CreateSlotWrapper:
     logging.debug(f'{slot.getRTLModuleName()}: e_insts contains:' + '\n'.join(e_insts))
     
     # must do the filtering at the beginning, otherwise it may mess up our added signals
-    self.__filterUnusedDecl(decl, v_insts, e_insts, io_decl)
+    decl = self.__getUsedDecl(v_insts, e_insts, io_ports)
 
     self.__setApStart(decl, v_insts, stmt)
     self.__setApContinue(v_insts)
@@ -414,36 +414,44 @@ class CreateSlotWrapper:
     # v_insts = self.__setKeepHier(v_insts)
     # e_insts = self.__setKeepHier(e_insts)
 
-    wrapper = header + decl + io_decl + v_insts + e_insts + stmt + ending
+    for section in (header, decl, io_decl, v_insts, e_insts, stmt, ending):
+      yield from section
     if self.target == 'hw':
-      wrapper += [fifo_template]
-    return wrapper
+      yield fifo_template
 
   def getSlotWrapperForAll(self, dir='wrapper_rtl'):
+    """
+    the wrappers are streamed directly to the files, by the worker processes if jobs > 1.
+    Only the sha256 of each file is returned to the parent
+    """
     if os.path.isdir(dir):
       shutil.rmtree(dir)
     os.mkdir(dir)
-    for s in self.s2v.keys():
-      wrapper = self.slot2wrapper[s]
-      f = open(dir + '/' + s.getRTLModuleName()+'.v', 'w')
-      f.write('\n'.join(wrapper))
+    self.rtl_dir = dir
+
+    slots = list(self.s2v.keys())
+    digests = forkMap(lambda i: writeRTL(self.getSlotWrapperPath(slots[i]), self.createSlotWrapper(slots[i])), range(len(slots)), self.jobs)
+    self.slot_to_digest = dict(zip(slots, digests))
 
-  def getSlotWrapper(self, slot):
-    return self.slot2wrapper[slot]
+  def getWrapperDigest(self, slot):
+    return self.slot_to_digest[slot]
+
+  def getSlotWrapperPath(self, slot):
+    assert self.rtl_dir, 'the wrappers have not been created'
+    return self.rtl_dir + '/' + slot.getRTLModuleName() + '.v'
 
   def getSlotNameToIOList(self):
     slot_2_io = self.getSlotToIOList()
     return {slot.getRTLModuleName() : io_list for slot, io_list in slot_2_io.items()}
 
+  def getSlotToPorts(self):
+    return {slot: self.__getIOPorts(slot) for slot in self.s2v.keys()}
+
   def getSlotToIOList(self):
-    slot_2_io = {}
-    for slot in self.s2v.keys():
-      io_decl = self.__getIODecl(slot)
-      io_decl = [io.replace(';', '') for io in io_decl]
-      io_decl = [io.split() for io in io_decl] # ensure that no space in width, e.g., [1+2:0]
-      
-      slot_2_io[slot] = io_decl
-    return slot_2_io
+    """
+    each IO is [dir, width, name], or [dir, name] if 1-bit
+    """
+    return {slot: [p.toList() for p in ports] for slot, ports in self.getSlotToPorts().items()}
 
   # to be used as black box
   def getEmptyWrappers(self):
@@ -452,7 +460,8 @@ class CreateSlotWrapper:
     """
     empty_wrappers = []
     for s in self.s2v.keys():
-      empty_wrappers += self.__getHeader(s)
-      empty_wrappers += self.__getIODecl(s)
+      io_ports = self.__getIOPorts(s)
+      empty_wrappers += self.__getHeader(s, io_ports)
+      empty_wrappers += [p.toDecl() for p in io_ports]
       empty_wrappers += self.__getEnding()
     return empty_wrappers
\ No newline at end of file
@@ -3,8 +3,8 @@ import logging
 from autobridge.HLSParser.vivado_hls.TopRTLParser import TopRTLParser
 from autobridge.Codegen.FIFOTemplate import fifo_template
 from rapidstream.FE.GlobalRouting import GlobalRouting
+from rapidstream.FE.PortRecord import Port, getANSIHeaderItems
 import re
-import collections
 
 
 def _addClockBuffer(io_rtl):
@@ -22,11 +22,11 @@ def _addClockBuffer(io_rtl):
 
 def getTopIO(top_rtl_parser, target):
   # get the IO section 
-  top_io_list = top_rtl_parser.getDirWidthNameOfAllIO()
-  assert any(re.search('ap_rst_n', io[-1]) for io in top_io_list)
+  top_io_list = [Port.fromList(io) for io in top_rtl_parser.getDirWidthNameOfAllIO()]
+  assert any('ap_rst_n' in io.name for io in top_io_list)
   
-  io_rtl = ['  ' + ' '.join(io) + ',' for io in top_io_list]
-  io_rtl[-1] = io_rtl[-1].replace(',', '\n);\n')
+  io_rtl = getANSIHeaderItems(top_io_list, indent='  ')
+  io_rtl[-1] += '\n);\n'
 
   # vitis requires the original parameters be kept
   param_to_value_str = top_rtl_parser.getParamToValueStr()
@@ -38,27 +38,15 @@ def getTopIO(top_rtl_parser, target):
 
   return io_rtl + param_sec
 
-def getWireDecl(slot_to_io, top_rtl_parser):
+def getWireDecl(wire_index):
   """
-  declare connecting wires
-  need to filter out the IOs
-  also filter out the ap signals (separately handled)
+  declare connecting wires, i.e., all IOs of the slots except the top-level IOs
+  each wire has an _out side at the driver slot and an _in side at the receiver slot
   """
-
   wire_decl = []
-  for slot, io_list in slot_to_io.items():
-    for io in io_list:
-      if top_rtl_parser.isIO(io[-1]):
-        continue
-  
-      # add the wire to declaration
-      if io[0] == 'output': 
-        wire_decl.append('  wire ' + ' '.join(io[1:]) + '_out;')
-      elif io[0] == 'input':
-        wire_decl.append('  wire ' + ' '.join(io[1:]) + '_in;')
-
-  dups = [item for item, count in collections.Counter(wire_decl).items() if count > 1]
-  assert len(dups) == 0, dups
+  for name in wire_index.getNames():
+    wire_decl.append('  ' + wire_index.getPortOfSlot(name, wire_index.getDriver(name)).toDecl('wire', '_out'))
+    wire_decl.append('  ' + wire_index.getPortOfSlot(name, wire_index.getReceiver(name)).toDecl('wire', '_in'))
 
   return wire_decl
 
@@ -67,10 +55,10 @@ def getTopApSignals(slot_to_io):
 
   # find which slot has the s_axi_control
   for slot, io_list in slot_to_io.items():
-    if any('s_axi' in io[-1] for io in io_list):
+    if any('s_axi' in io.name for io in io_list):
       # note the naming convention 
-      ap_done_source = [f'{io[-1]}_in' for io in io_list if 'ap_done' in io[-1]]
-      ap_start_source = [f'{io[-1]}_out' for io in io_list if 'ap_start' in io[-1]]
+      ap_done_source = [f'{io.name}_in' for io in io_list if 'ap_done' in io.name]
+      ap_start_source = [f'{io.name}_out' for io in io_list if 'ap_start' in io.name]
 
       top_ap_signals = []
       top_ap_signals.append(f'wire ap_done = ' + ' & '.join(ap_done_source) + ';')
@@ -94,10 +82,10 @@ def getPipelining(slot_to_io, top_rtl_parser, global_router, in_slot_pipeline_st
     for io in io_list:
 
       # choose to work on the output side
-      if io[0] != 'output': 
+      if io.dir != 'output': 
         continue # otherwise we do the same thing twice for each edge
 
-      if top_rtl_parser.isIO(io[-1]):
+      if top_rtl_parser.isIO(io.name):
         continue
       
       # check if the io belongs to a passing wire
@@ -122,7 +110,7 @@ def getPipelining(slot_to_io, top_rtl_parser, global_router, in_slot_pipeline_st
       # -------------------------------------------------
       # Do it in a easier way. Just check '_pass_0'
       if in_slot_pipeline_style == 'REG':
-        if re.search('_pass_0', io[-1]):
+        if re.search('_pass_0', io.name):
           pipeline_level = 1
         else:
           pipeline_level = 0
@@ -139,12 +127,11 @@ def getPipelining(slot_to_io, top_rtl_parser, global_router, in_slot_pipeline_st
 
       # assign the input wire equals the output wire
       if pipeline_level == 0:
-        pipeline.append(f'  assign {io[-1]}_in = {io[-1]}_out;')
+        pipeline.append(f'  assign {io.name}_in = {io.name}_out;')
       else:
         # add the pipeline registers
         for i in range(pipeline_level):
-          width = io[1] if len(io) == 3 else ''
-          pipeline.append(f'  (* dont_touch = "yes" *) reg {width} {io[-1]}_q{i};')
+          pipeline.append(f'  (* dont_touch = "yes" *) reg {io.width} {io.name}_q{i};')
       
         # connect the head and tail
         if in_slot_pipeline_style == 'INVERT_CLOCK':
@@ -152,11 +139,11 @@ def getPipelining(slot_to_io, top_rtl_parser, global_router, in_slot_pipeline_st
         else:
           pipeline.append(f'  always @ (posedge ap_clk) begin')
 
-        pipeline.append(f'    {io[-1]}_q0 <= {io[-1]}_out;')
+        pipeline.append(f'    {io.name}_q0 <= {io.name}_out;')
         for i in range(1, pipeline_level):
-          pipeline.append(f'    {io[-1]}_q{i} <= {io[-1]}_q{i-1};')
+          pipeline.append(f'    {io.name}_q{i} <= {io.name}_q{i-1};')
         pipeline.append(f'  end')
-        pipeline.append(f'  assign {io[-1]}_in = {io[-1]}_q{pipeline_level-1};')
+        pipeline.append(f'  assign {io.name}_in = {io.name}_q{pipeline_level-1};')
   
   return pipeline
 
@@ -168,24 +155,27 @@ def getSlotInst(slot_to_io, top_rtl_parser):
 
     slot_insts.append(f'\n\n  (* keep_hierarchy = "yes" *) {slot}_ctrl {slot}_ctrl_U0 (')
     for io in io_list:
-      if top_rtl_parser.isIO(io[-1]):
+      if top_rtl_parser.isIO(io.name):
         # directly connect to top-level IO
-        slot_insts.append(f'    .{io[-1]}({io[-1]}),')
+        slot_insts.append(f'    .{io.name}({io.name}),')
       else:
         # differentiate direction for pipelining purpose
-        if io[0] == 'input':
-          slot_insts.append(f'    .{io[-1]}({io[-1]}_in),')
-        elif io[0] == 'output':
-          slot_insts.append(f'    .{io[-1]}({io[-1]}_out),')
-        else: assert False, io[0]
+        if io.dir == 'input':
+          slot_insts.append(f'    .{io.name}({io.name}_in),')
+        elif io.dir == 'output':
+          slot_insts.append(f'    .{io.name}({io.name}_out),')
+        else: assert False, io.dir
 
     # handle the last io
     slot_insts[-1] = slot_insts[-1].replace(',', '\n  );') 
   
   return slot_insts
 
-def CreateTopRTLForCtrlWrappers(top_rtl_parser, wrapper_creater, top_module_name, global_router, target):
-  slot_to_io = wrapper_creater.getSlotNameToIOList()
+def emitTopRTLForCtrlWrappers(top_rtl_parser, wrapper_creater, top_module_name, global_router, target):
+  """
+  yield the sections of the new top one after another
+  """
+  slot_to_io = wrapper_creater.getSlotNameToPorts()
   
   # whether the pipeline regs are in slots or between slots
   in_slot_pipeline_style = wrapper_creater.in_slot_pipeline_style
@@ -194,17 +184,14 @@ def CreateTopRTLForCtrlWrappers(top_rtl_parser, wrapper_creater, top_module_name
   if target == 'hw':
     top_module_name += '_hw_test'
 
-  header = ['\n\n`timescale 1 ns / 1 ps',
-            f'module {top_module_name} (']
-  top_io = getTopIO(top_rtl_parser, target)
-  wire_decl = getWireDecl(slot_to_io, top_rtl_parser)
-  top_ap_signals = getTopApSignals(slot_to_io)
-  pipeline = getPipelining(slot_to_io, top_rtl_parser, global_router, in_slot_pipeline_style)
-  slot_insts = getSlotInst(slot_to_io, top_rtl_parser)
-  ending = ['endmodule']
+  yield '\n\n`timescale 1 ns / 1 ps'
+  yield f'module {top_module_name} ('
+  yield from getTopIO(top_rtl_parser, target)
+  yield from getWireDecl(wrapper_creater.getWireIndex())
+  yield from getPipelining(slot_to_io, top_rtl_parser, global_router, in_slot_pipeline_style)
+  yield from getTopApSignals(slot_to_io)
+  yield from getSlotInst(slot_to_io, top_rtl_parser)
+  yield 'endmodule'
 
   # append our fifo template at the end. Separate files may not be detected by HLS when packing into xo 
-  new_top = header + top_io + wire_decl + pipeline + top_ap_signals + slot_insts +  ending + [fifo_template]
-  # new_top = header + top_io + wire_decl + pipeline + slot_insts + ending
-
-  return '\n'.join(new_top)
+  yield fifo_template
@@ -1,13 +1,32 @@
 #! /usr/bin/python3.6
+import hashlib
+import json
 import logging
-from collections import defaultdict 
+import os
+from typing import Dict
 
 from autobridge.Opt.DataflowGraph import Vertex, Edge
-from rapidstream.FE.ILPGlobalRouting import ILPRouter
+from mip import SearchEmphasis
+
+from rapidstream.FE.ILPGlobalRouting import ILPRouter, RoutingDevice
+from rapidstream.FE.PathFinderGlobalRouting import PathFinderRouter
+from rapidstream.FE.RoutingIndex import RoutingIndex
+from rapidstream.FE.StageCheckpoint import StageCheckpoint
+
+# bump when a change of the routers could change the routing results, so that the saved results are not reused
+ROUTER_VERSION = 1
 
 
 class GlobalRouting:
-  def __init__(self, floorplan, top_rtl_parser, slot_manager, pipeline_style, anchor_plan: int):
+  def __init__(
+      self,
+      floorplan,
+      top_rtl_parser,
+      slot_manager,
+      pipeline_style,
+      anchor_plan: int,
+      routing_config: Dict = None,
+      checkpoint: StageCheckpoint = None):
     self.floorplan = floorplan
     self.top_rtl_parser = top_rtl_parser
     self.slot_manager = slot_manager
@@ -16,21 +35,39 @@ class GlobalRouting:
     self.s2e = floorplan.getSlotToEdges()
     self.e_name2lat = {}
     self.e_name2path = {} # from edge to all slots passed, exclude src and dst
-    self.slot2e_names = {} # from slot to all edges passed through
-    self.slot_to_dir_to_edges = defaultdict(lambda: defaultdict(list))
+    self.routing_index = None # lookup tables of the routing results, see RoutingIndex
+    self.routing_reports = [] # status, gap and model size of each ILP solve
     
     self.in_slot_pipeline_style = pipeline_style
     logging.info(f'Pipeline style: {pipeline_style}')
     self.anchor_plan = anchor_plan
 
+    # optional settings of the global router
+    self.routing_config = routing_config if routing_config else {}
+
+    # if provided, the routing results are saved as the checkpoint of the global_routing stage
+    # and reused when nothing that affects the routing has changed.
+    # Otherwise they are saved to the ResultCache file of the routing config, global_routing_cache.json by default
+    self.checkpoint = checkpoint
+
     logging.critical('current latency counting depends on 4-CR slot size')
     self.ILPRouting()
-    self.__initDirectionOfPassingEdges()
 
   def ILPRouting(self):
     all_edges = sum(self.s2e.values(), [])
-    ilp_router = ILPRouter(all_edges, self.v2s, self.floorplan.getUtilization())
-    self.e_name2path = ilp_router.ILPRouting()
+
+    # reuse the results of a previous run if nothing that affects the routing has changed
+    input_hash = self.__getRoutingInputHash(all_edges)
+    saved_e_name2slot_names = self.__loadSavedRoutingResults(input_hash)
+
+    if saved_e_name2slot_names is not None:
+      self.e_name2path = {
+        e_name: [self.slot_manager.createSlotForRouting(slot_name) for slot_name in slot_names]
+          for e_name, slot_names in saved_e_name2slot_names.items()
+      }
+    else:
+      self.__runGlobalRouter(all_edges)
+      self.__saveRoutingResults(input_hash)
 
     # register the passed slots as routing slots
     for path in self.e_name2path.values():
@@ -38,16 +75,118 @@ class GlobalRouting:
         self.slot_manager.createSlotForRouting(slot.getName())
 
     self.postProcessRoutingResults()
-    
-  def postProcessRoutingResults(self):
 
-    for e_name, slots in self.e_name2path.items():
-      for s in slots:
-        if s not in self.slot2e_names:
-          self.slot2e_names[s] = []
-        self.slot2e_names[s].append(e_name)
+  def __getRouterSettings(self) -> Dict:
+    """
+    the settings the global router actually uses, i.e., the routing config with the defaults filled in
+    """
+    emphasis = self.routing_config.get('Emphasis', None)
+    assert emphasis is None or emphasis in SearchEmphasis.__members__, \
+      f'unsupported Emphasis {emphasis} of the global router, choose from {list(SearchEmphasis.__members__)}'
+
+    return {
+      'Method': self.routing_config.get('Method', 'ILP'),
+      'RoutingUsageLimit': self.routing_config.get('RoutingUsageLimit', 0.7),
+      'DetourPathLimit': self.routing_config.get('DetourPathLimit', 4),
+      'PathFinderWarmStart': self.routing_config.get('PathFinderWarmStart', False),
+      'AggregateCommodities': self.routing_config.get('AggregateCommodities', False),
+      'ElasticCapacity': self.routing_config.get('ElasticCapacity', False),
+      'ColumnGeneration': self.routing_config.get('ColumnGeneration', False),
+      'MaxSeconds': self.routing_config.get('MaxSeconds', None),
+      'MaxMipGap': self.routing_config.get('MaxMipGap', None),
+      'Threads': self.routing_config.get('Threads', None),
+      'Emphasis': emphasis,
+    }
+
+  def __runGlobalRouter(self, all_edges):
+    settings = self.__getRouterSettings()
+    method = settings['Method']
+    routing_usage_limit = settings['RoutingUsageLimit']
+    detour_path_limit = settings['DetourPathLimit']
+    routing_device = RoutingDevice(self.slot_manager.board)
+
+    initial_e_name2path = None
+    if method == 'PathFinder' or settings['PathFinderWarmStart']:
+      path_finder_router = PathFinderRouter(all_edges, self.v2s, self.floorplan.getUtilization(), routing_device)
+      initial_e_name2path = path_finder_router.PathFinderRouting(routing_usage_limit, detour_path_limit)
+
+    if method == 'PathFinder':
+      self.e_name2path = initial_e_name2path
+    elif method == 'ILP':
+      ilp_router = ILPRouter(all_edges, self.v2s, self.floorplan.getUtilization(), routing_device)
+      self.e_name2path = ilp_router.ILPRouting(
+        routing_usage_limit=routing_usage_limit,
+        detour_path_limit=detour_path_limit,
+        aggregate_commodities=settings['AggregateCommodities'],
+        elastic_capacity=settings['ElasticCapacity'],
+        column_generation=settings['ColumnGeneration'],
+        initial_e_name_to_paths=initial_e_name2path,
+        max_seconds=settings['MaxSeconds'],
+        max_mip_gap=settings['MaxMipGap'],
+        threads=settings['Threads'],
+        emphasis=settings['Emphasis'],
+      )
+      self.routing_reports = ilp_router.attempt_reports
+      report_path = self.routing_config.get('Report', None)
+      if report_path:
+        open(report_path, 'w').write(json.dumps(self.routing_reports, indent=2))
+    else:
+      assert False, f'unsupported global routing method: {method}'
+
+  def __getRoutingInputHash(self, all_edges) -> str:
+    """
+    hash everything the routing results depend on: the device, the location and width of each bridge,
+    the utilization of each slot, and the effective settings of the router
+    """
+    inputs = {
+      'Board': self.slot_manager.board.NAME,
+      'Bridges': sorted(
+        [e.name, self.v2s[e.src].getName(), self.v2s[e.dst].getName(), e.width] for e in all_edges
+      ),
+      'Utilization': sorted(
+        [slot.getName(), sorted(util.items())] for slot, util in self.floorplan.getUtilization().items()
+      ),
+      'RouterSettings': self.__getRouterSettings(),
+      'RouterVersion': ROUTER_VERSION,
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+  def __loadSavedRoutingResults(self, input_hash: str):
+    """
+    the saved edge -> names of the passed slots, or None if the saved results are missing or outdated
+    """
+    if self.checkpoint:
+      outputs = self.checkpoint.load('global_routing', input_hash)
+      return outputs['EdgeToPath'] if outputs is not None else None
+
+    cache_path = self.routing_config.get('ResultCache', 'global_routing_cache.json')
+    if not cache_path or not os.path.isfile(cache_path):
+      return None
+
+    cache = json.loads(open(cache_path, 'r').read())
+    if cache.get('InputHash') != input_hash:
+      logging.info(f'the global routing results in {cache_path} are outdated')
+      return None
+
+    logging.info(f'reuse the global routing results in {cache_path}')
+    return cache['EdgeToPath']
+
+  def __saveRoutingResults(self, input_hash: str):
+    e_name2slot_names = {e_name: [slot.getName() for slot in path] for e_name, path in self.e_name2path.items()}
+    if self.checkpoint:
+      self.checkpoint.save('global_routing', input_hash, {'EdgeToPath': e_name2slot_names})
+      return
+
+    cache_path = self.routing_config.get('ResultCache', 'global_routing_cache.json')
+    if cache_path:
+      cache = {'InputHash': input_hash, 'EdgeToPath': e_name2slot_names}
+      open(cache_path, 'w').write(json.dumps(cache, indent=2))
 
-    for slot, e_names in self.slot2e_names.items():
+  def postProcessRoutingResults(self):
+    bridges = [(e.name, self.v2s[e.src], self.v2s[e.dst]) for e_list in self.s2e.values() for e in e_list]
+    self.routing_index = RoutingIndex.fromRoutingResults(self.e_name2path, bridges)
+
+    for slot, e_names in self.routing_index.slot_to_e_names.items():
         logging.info(f'{slot.getName()} will be passed by: \n\t' + '\n\t'.join(e_names))
 
     for e_list in self.s2e.values():
@@ -97,51 +236,6 @@ class GlobalRouting:
     self.postProcessRoutingResults()
 
 
-  def __initDirectionOfPassingEdges(self):
-    """
-    In which directions (UP, DOWN, LEFT, RIGHT) do the edges come and go
-    slot -> dir & in or out -> edges
-    """
-    for e_list in self.s2e.values():
-      for e in e_list:
-        src_slot = self.v2s[e.src]
-        dst_slot = self.v2s[e.dst]
-        
-        # ignore intra slot edges
-        if src_slot == dst_slot:
-          continue
-
-        logging.debug(f'from {src_slot.getRTLModuleName()} to {dst_slot.getRTLModuleName()}')
-        slot_path = self.e_name2path[e.name]
-
-        prev = src_slot
-        for slot in slot_path + [dst_slot]:
-          if slot.isAbove(prev):
-            logging.debug('Go up')
-            self.slot_to_dir_to_edges[slot]['DOWN_IN'].append(e.name)
-            self.slot_to_dir_to_edges[prev]['UP_OUT'].append(e.name)
-          elif slot.isBelow(prev):
-            logging.debug('Go down')
-            self.slot_to_dir_to_edges[slot]['UP_IN'].append(e.name)
-            self.slot_to_dir_to_edges[prev]['DOWN_OUT'].append(e.name)
-          elif slot.isToTheLeftOf(prev):
-            logging.debug('Go left')
-            self.slot_to_dir_to_edges[slot]['RIGHT_IN'].append(e.name)
-            self.slot_to_dir_to_edges[prev]['LEFT_OUT'].append(e.name)
-          elif slot.isToTheRightOf(prev):
-            logging.debug('Go right')
-            self.slot_to_dir_to_edges[slot]['LEFT_IN'].append(e.name)
-            self.slot_to_dir_to_edges[prev]['RIGHT_OUT'].append(e.name)
-          else:
-            assert False
-
-          prev = slot
-
-    # remove the defualt dict property to prevent unexpected contamination
-    # self.slot_to_dir_to_edges = json.loads(json.dumps(self.slot_to_dir_to_edges))
-
-    return self.slot_to_dir_to_edges
-
   def getDirectionOfPassingEdgeWires(self):
     """
     get the map: slot -> each direction -> all wires of all the edges that leave through this direction
@@ -149,7 +243,7 @@ class GlobalRouting:
     Thus the routing wrapper creater should take care of the renaming
     """
     slot_to_dir_to_wires = {}
-    for slot, dir_to_fifos in self.slot_to_dir_to_edges.items():
+    for slot, dir_to_fifos in self.routing_index.getSlotToDirToEdgeNames().items():
       dir_to_wires = {}
       for dir, fifos in dir_to_fifos.items():
         dir_to_wires[dir] = []
@@ -203,14 +297,13 @@ class GlobalRouting:
     return self.getPipelineLevelOfEdge(e) + 1
 
   def getPassingEdgeNamesOfSlot(self, slot):
-    if slot in self.slot2e_names:
-      return self.slot2e_names[slot]
-    else:
-      return []
+    return self.routing_index.getPassingEdgeNamesOfSlot(slot)
 
   def getIndexOfSlotInPath(self, e_name, slot):
-    assert slot in self.e_name2path[e_name]
-    return self.e_name2path[e_name].index(slot)
+    return self.routing_index.getIndexOfSlotInPath(e_name, slot)
+
+  def getRoutingIndex(self) -> RoutingIndex:
+    return self.routing_index
 
   def getPathLength(self, e_name):
     return len(self.e_name2path[e_name])
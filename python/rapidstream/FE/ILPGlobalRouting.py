@@ -1,27 +1,75 @@
 import logging
+import time
 from bisect import bisect
-from collections import defaultdict
-from mip import Model, minimize, BINARY, xsum, OptimizationStatus, Var
-from typing import List, Dict
+from collections import Counter, defaultdict, deque
+from mip import Model, minimize, BINARY, INTEGER, CONTINUOUS, xsum, OptimizationStatus, SearchEmphasis, Var, Column
+from typing import List, Dict, Tuple
 
 from autobridge.Opt.DataflowGraph import Edge, Vertex
 from autobridge.Opt.Slot import Slot
 from autobridge.Device.DeviceManager import DeviceU250
-U250_inst = DeviceU250()
-
-root = logging.getLogger()
-root.setLevel(logging.DEBUG)
 
 BEND_COUNT_LIMIT = 2
-VERTICAL_BOUNDARY_CAPACITY = 5280
-SLR_CROSSING_BOUNDARY_CAPACITY = 5760
-NON_SLR_CROSSING_HORIZONTAL_BOUNDARY = 9440
+
+# number of wires that could cross a boundary, per clock region along the boundary
+VERTICAL_BOUNDARY_CAPACITY_PER_CR = 2640
+SLR_CROSSING_BOUNDARY_CAPACITY_PER_CR = 2880
+NON_SLR_CROSSING_HORIZONTAL_BOUNDARY_PER_CR = 4720
+
+# how much to relax the routing usage limit if the routing fails
+ROUTING_USAGE_LIMIT_STEP = 0.03
+
+# column generation: the cost of one unit of overflow on a boundary, far above the cost of any path of width 1.
+# Overflow keeps the restricted LP feasible so that the duals are available
+OVERFLOW_PENALTY = 1000
+REDUCED_COST_TOLERANCE = 1e-6
+
+# a solve with an incumbent is accepted even if it is not proven optimal within the time budget
+ACCEPTED_STATUS = (OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE)
+
+
+class RoutingDevice:
+  """
+  the grid of slots used in global routing. All slots are of the same size
+  coordinates are in the unit of clock regions
+  """
+
+  def __init__(self, board, slot_len_x: int = 2, slot_len_y: int = 2) -> None:
+    self.board = board
+    self.cr_num_x = board.CR_NUM_HORIZONTAL
+    self.cr_num_y = board.CR_NUM_VERTICAL
+    self.cr_num_y_per_slr = board.CR_NUM_VERTICAL_PER_SLR
+    self.slot_len_x = slot_len_x
+    self.slot_len_y = slot_len_y
+
+    assert self.cr_num_x % slot_len_x == 0, f'slot width {slot_len_x} does not divide the device'
+    assert self.cr_num_y_per_slr % slot_len_y == 0, f'slot height {slot_len_y} does not divide an SLR'
+
+  def getSlotName(self, x: int, y: int) -> str:
+    """x, y is the down left clock region of the slot"""
+    return f'CR_X{x}Y{y}_To_CR_X{x + self.slot_len_x - 1}Y{y + self.slot_len_y - 1}'
+
+  def getSlotCoordinates(self) -> List[Tuple[int, int]]:
+    return [(x, y) for x in range(0, self.cr_num_x, self.slot_len_x)
+                   for y in range(0, self.cr_num_y, self.slot_len_y)]
+
+  def getVerticalBoundaryCapacity(self) -> int:
+    """the boundary between horizontally adjacent slots"""
+    return VERTICAL_BOUNDARY_CAPACITY_PER_CR * self.slot_len_y
+
+  def getHorizontalBoundaryCapacity(self, upper_y: int) -> int:
+    """the boundary between vertically adjacent slots. upper_y is the bottom row of the upper slot"""
+    if upper_y % self.cr_num_y_per_slr == 0:
+      return SLR_CROSSING_BOUNDARY_CAPACITY_PER_CR * self.slot_len_x
+    else:
+      return NON_SLR_CROSSING_HORIZONTAL_BOUNDARY_PER_CR * self.slot_len_x
 
 
 class RoutingVertex:
-  def __init__(self, slot_name):
+  def __init__(self, slot_name, vertex_id: int, board):
     self.slot_name = slot_name
-    self.slot = Slot(U250_inst, slot_name)
+    self.vertex_id = vertex_id
+    self.slot = Slot(board, slot_name)
     self.edges = []
     self.neighbors = set()
 
@@ -39,8 +87,9 @@ class RoutingVertex:
 
 
 class RoutingEdge:
-  def __init__(self, v1: RoutingVertex, v2: RoutingVertex, capacity):
+  def __init__(self, v1: RoutingVertex, v2: RoutingVertex, capacity, edge_id: int):
     self.vertices = [v1, v2]
+    self.edge_id = edge_id
     self.capacity = capacity
     v1.edges.append(self)
     v2.edges.append(self)
@@ -60,100 +109,40 @@ class RoutingEdge:
 class RoutingPath:
   """
   a path contains the vertcies it passed through
+  paths of different bridges between the same pair of slots share the same
+  vertex and edge tuples. Each RoutingPath is only a light-weight view with the bridge info
   """
 
   def __init__(
       self, 
-      vertices: List[RoutingVertex], 
+      vertices: Tuple[RoutingVertex, ...], 
+      edges: Tuple[RoutingEdge, ...],
       bend_count: int, 
-      length_limit: int, 
       data_width: int,
       bridge_name: str,
-      util: Dict[Slot, Dict[str, float]]
+      unit_cost: float
   ) -> None:
     """
     a bridge is an edge in the dataflow graph. To differentiate it 
     from the edge in the routing graph, we call it a bridge
     use bridge_name to make the path unique
+    unit_cost is the cost of the path for a bridge of width 1, shared by paths with the same vertices
     """
     self.vertices = vertices
+    self.edges = edges
     self.bend_count = bend_count
-    self.length_limit = length_limit
     self.data_width = data_width
     self.bridge_name = bridge_name
-    self.util = util
-    self.edges = []
+    self.unit_cost = unit_cost
 
-    # use bridge name to make the path name unique
-    self._name = self.bridge_name + '_' + '_'.join([v.slot_name for v in self.vertices])
+    # use bridge name to make the path unique
+    self._key = (self.bridge_name, tuple(v.vertex_id for v in self.vertices))
 
   def __hash__(self):
-    return hash(self._name)
+    return hash(self._key)
 
   def __eq__(self, other):
-    return self._name == other._name
-
-  def initEdges(self):
-    """
-    find all edges belong to this path based on the vertices
-    """
-    for i in range(len(self.vertices)-1):
-      curr = self.vertices[i]
-      next = self.vertices[i+1]
-      e_common = [bridge for bridge in curr.edges if bridge in next.edges]
-      assert len(e_common) == 1
-      self.edges.append(e_common[0])
-
-  def _isBend(self, prev, curr, next) -> bool:
-    """
-    check if three vertices are aligned either vertically or horizontally
-    """
-    if prev.getDownLeftX() == curr.getDownLeftX() and \
-       next.getDownLeftX() == curr.getDownLeftX():
-      return False
-    elif prev.getDownLeftY() == curr.getDownLeftY() and \
-         next.getDownLeftY() == curr.getDownLeftY():
-      return False
-    else:
-      return True
-
-  def getChildPaths(self) -> List['RoutingPath']:
-    """
-    extend the current path for one more vertex.
-    Filter out candidates if the bend count is over the limit
-    """
-    curr = self.vertices[-1]
-    # if the path only has one vertex, set prev to curr to be compatible with bend test
-    if len(self.vertices) == 1:
-      prev = curr
-    else:
-      prev = self.vertices[-2]
-
-    # if a path is too long, stop generating child paths
-    if len(self.vertices) > self.length_limit:
-      return []
-
-    # attempt to extend one more context from the current tail
-    child_paths = []
-    for next in curr.neighbors:
-      if next != prev: # disable u turn at the site
-        new_bend_count = self.bend_count + int(self._isBend(prev, curr, next))
-
-        # limit on bend count
-        if new_bend_count > BEND_COUNT_LIMIT:
-          continue
-        
-        child_paths.append(
-          RoutingPath(
-            self.vertices + [next], 
-            new_bend_count, 
-            self.length_limit, 
-            self.data_width,
-            self.bridge_name,
-            self.util
-          )
-        )
-    return child_paths
+    return self._key == other._key
 
   def getDest(self) -> RoutingVertex:
     """
@@ -185,8 +174,8 @@ class RoutingPath:
     """
     src = self.vertices[0]
     dst = self.vertices[-1]
-    dist_x = abs(src.getDownLeftX() - dst.getDownLeftX() ) / 2
-    dist_y = abs(src.getDownLeftY() - dst.getDownLeftY() ) / 2
+    dist_x = abs(src.getDownLeftX() - dst.getDownLeftX() ) / src.slot.getLenX()
+    dist_y = abs(src.getDownLeftY() - dst.getDownLeftY() ) / src.slot.getLenY()
     return dist_x + dist_y + 1
 
   def getCost(self) -> float:
@@ -195,18 +184,7 @@ class RoutingPath:
     We want to pass through less utilized slots as much as possible
     use the sum of DSP and BRAM percentage of each slot * wire_length
     """
-    try:
-      dsp_costs = [self.util[v.slot]['DSP'] if v.slot in self.util else 0 for v in self.vertices]
-      bram_costs = [self.util[v.slot]['BRAM'] if v.slot in self.util else 0  for v in self.vertices]
-      lut_costs = [self.util[v.slot]['LUT'] if v.slot in self.util else 0  for v in self.vertices]
-    except:
-      [v.slot.getRTLModuleName() if v.slot not in self.util else '' for v in self.vertices]
-      import pdb; pdb.set_trace()
-
-
-    cost = (sum(dsp_costs) + sum(bram_costs) + 0.7 * sum(lut_costs)) * self.data_width
-
-    return round(cost, 4)
+    return round(self.unit_cost * self.data_width, 4)
 
   def getSrcSlotName(self) -> str:
     return self.vertices[0].slot_name
@@ -221,106 +199,281 @@ class RoutingGraph:
       util: Dict[Slot, Dict[str, float]], 
       routing_usage_limit: int,
       detour_path_limit: int,
+      path_cache: Dict[Tuple[int, int, int, int], Tuple] = None,
+      routing_device: RoutingDevice = None,
   ) -> None:
+    """
+    path_cache stores the geometric paths between each pair of slots.
+    The paths only depend on the graph structure, thus the cache could be 
+    shared by multiple routing graphs of the same device with different capacities
+    """
     self.slot_name_to_vertex = {}
-    self.edges = []
+    self.vertices = [] # indexed by vertex_id
+    self.edges = [] # indexed by edge_id
+    self.v_ids_to_edge = {}
     self.util = util  # resource usage of each slot
     self.routing_usage_limit = routing_usage_limit
     self.detour_path_limit = detour_path_limit
-    self._getRoutingGraphForU250()
-
-  def _getRoutingGraphForU250(self):
+    self.path_cache = path_cache if path_cache is not None else {}
+    self.routing_device = routing_device if routing_device else RoutingDevice(DeviceU250())
+    self._buildRoutingGraph()
+
+    # per-vertex attributes indexed by vertex_id, to avoid going through the Slot objects
+    self.vertex_x = [v.getDownLeftX() for v in self.vertices]
+    self.vertex_y = [v.getDownLeftY() for v in self.vertices]
+    self.vertex_util = {
+      r: [self.util[v.slot][r] if v.slot in self.util else 0 for v in self.vertices]
+        for r in ('DSP', 'BRAM', 'LUT')
+    }
+
+    # neighbors in a fixed order so that the path enumeration is deterministic
+    self.neighbor_ids = [sorted(n.vertex_id for n in v.neighbors) for v in self.vertices]
+
+    # paths of the current graph between each pair of slots, with the edge objects resolved
+    self._slot_pair_to_paths = {}
+
+  def _addVertex(self, slot_name: str) -> None:
+    v = RoutingVertex(slot_name, len(self.vertices), self.routing_device.board)
+    self.vertices.append(v)
+    self.slot_name_to_vertex[slot_name] = v
+
+  def _addEdge(self, v1: RoutingVertex, v2: RoutingVertex, capacity: int) -> None:
+    e = RoutingEdge(v1, v2, capacity, len(self.edges))
+    self.edges.append(e)
+    self.v_ids_to_edge[v1.vertex_id, v2.vertex_id] = e
+    self.v_ids_to_edge[v2.vertex_id, v1.vertex_id] = e
+
+  def _buildRoutingGraph(self):
     """
-    hardcode the routing graph for U250
-    assume slots are 2x2
+    each slot is a vertex. Each boundary between two adjacent slots is an edge
     """
-    
+    device = self.routing_device
+    len_x, len_y = device.slot_len_x, device.slot_len_y
+
     # create all vertices
-    for x in range(0, 8, 2):
-      for y in range(0, 16, 2):
-        slot_name = f'CR_X{x}Y{y}_To_CR_X{x+1}Y{y+1}'
-        self.slot_name_to_vertex[slot_name] = RoutingVertex(slot_name)
+    for x, y in device.getSlotCoordinates():
+      self._addVertex(device.getSlotName(x, y))
 
     # create all edges for vertical boundaries
-    for y in range(0, 16, 2):
-      for x in range(0, 6, 2):
-        left_slot = f'CR_X{x}Y{y}_To_CR_X{x+1}Y{y+1}'
-        right_slot = f'CR_X{x+2}Y{y}_To_CR_X{x+3}Y{y+1}'
-        v1 = self.slot_name_to_vertex[left_slot]
-        v2 = self.slot_name_to_vertex[right_slot]
-
-        e = RoutingEdge(v1, v2, int(VERTICAL_BOUNDARY_CAPACITY*self.routing_usage_limit))
-        self.edges.append(e)
-
-    # create all edges for slr crossing boundaries
-    for x in range(0, 8, 2):
-      for y in range(2, 12, 4):
-        lower_slot = left_slot = f'CR_X{x}Y{y}_To_CR_X{x+1}Y{y+1}'
-        upper_slot = left_slot = f'CR_X{x}Y{y+2}_To_CR_X{x+1}Y{y+3}'
-        v_lower = self.slot_name_to_vertex[lower_slot]
-        v_upper = self.slot_name_to_vertex[upper_slot]
-
-        e = RoutingEdge(v_lower, v_upper, int(SLR_CROSSING_BOUNDARY_CAPACITY*self.routing_usage_limit))
-        self.edges.append(e)
-
-    # create all edges for non-slr-crossing horizontal boundaries
-    for x in range(0, 8, 2):
-      for y in range(0, 16, 4):
-        lower_slot = left_slot = f'CR_X{x}Y{y}_To_CR_X{x+1}Y{y+1}'
-        upper_slot = left_slot = f'CR_X{x}Y{y+2}_To_CR_X{x+1}Y{y+3}'
-        v_lower = self.slot_name_to_vertex[lower_slot]
-        v_upper = self.slot_name_to_vertex[upper_slot]
-
-        e = RoutingEdge(v_lower, v_upper, int(NON_SLR_CROSSING_HORIZONTAL_BOUNDARY*self.routing_usage_limit))
-        self.edges.append(e)
+    for y in range(0, device.cr_num_y, len_y):
+      for x in range(0, device.cr_num_x - len_x, len_x):
+        v_left = self.slot_name_to_vertex[device.getSlotName(x, y)]
+        v_right = self.slot_name_to_vertex[device.getSlotName(x + len_x, y)]
+        capacity = device.getVerticalBoundaryCapacity()
+        self._addEdge(v_left, v_right, int(capacity*self.routing_usage_limit))
+
+    # create all edges for horizontal boundaries, including the slr crossing ones
+    for x in range(0, device.cr_num_x, len_x):
+      for y in range(0, device.cr_num_y - len_y, len_y):
+        v_lower = self.slot_name_to_vertex[device.getSlotName(x, y)]
+        v_upper = self.slot_name_to_vertex[device.getSlotName(x, y + len_y)]
+        capacity = device.getHorizontalBoundaryCapacity(y + len_y)
+        self._addEdge(v_lower, v_upper, int(capacity*self.routing_usage_limit))
 
   def _getShortestDist(self, src: RoutingVertex, dst: RoutingVertex):
     """
     number of slots in the path. Include source and sink
-    assume 2x2 slots
     """
-    dist_x = abs(src.getDownLeftX() - dst.getDownLeftX() ) / 2
-    dist_y = abs(src.getDownLeftY() - dst.getDownLeftY() ) / 2
+    dist_x = abs(self.vertex_x[src.vertex_id] - self.vertex_x[dst.vertex_id]) / self.routing_device.slot_len_x
+    dist_y = abs(self.vertex_y[src.vertex_id] - self.vertex_y[dst.vertex_id]) / self.routing_device.slot_len_y
     return dist_x + dist_y + 1
 
+  def _isBend(self, prev_id: int, curr_id: int, next_id: int) -> bool:
+    """
+    check if three vertices are aligned either vertically or horizontally
+    """
+    x, y = self.vertex_x, self.vertex_y
+    if x[prev_id] == x[curr_id] == x[next_id]:
+      return False
+    elif y[prev_id] == y[curr_id] == y[next_id]:
+      return False
+    else:
+      return True
+
+  def _getUnitCost(self, v_ids: Tuple[int, ...]) -> float:
+    """
+    the cost of a path for a bridge of width 1, see RoutingPath.getCost
+    """
+    dsp, bram, lut = self.vertex_util['DSP'], self.vertex_util['BRAM'], self.vertex_util['LUT']
+    return sum(dsp[i] for i in v_ids) + sum(bram[i] for i in v_ids) + 0.7 * sum(lut[i] for i in v_ids)
+
+  def _enumerateGeometricPaths(
+      self, 
+      src: RoutingVertex, 
+      dst: RoutingVertex,
+      detour_path_limit: int
+  ) -> Tuple[Tuple[Tuple[int, ...], Tuple[int, ...], int], ...]:
+    """
+    run BFS to get all paths between two slots that satisfy the length and bend limit
+    Each path is recorded as (vertex ids, edge ids, bend count)
+    The results are memoized as they are shared by all bridges between the same slots
+    """
+    key = (src.vertex_id, dst.vertex_id, detour_path_limit, BEND_COUNT_LIMIT)
+    if key in self.path_cache:
+      return self.path_cache[key]
+
+    length_limit = self._getShortestDist(src, dst) + detour_path_limit
+
+    paths = []
+    queue = deque([((src.vertex_id,), 0)])
+    while queue:
+      v_ids, bend_count = queue.popleft()
+      curr_id = v_ids[-1]
+
+      if curr_id == dst.vertex_id:
+        e_ids = tuple(self.v_ids_to_edge[v_ids[i], v_ids[i+1]].edge_id for i in range(len(v_ids)-1))
+        paths.append((v_ids, e_ids, bend_count))
+        continue
+
+      # if a path is too long, stop extending it
+      if len(v_ids) > length_limit:
+        continue
+
+      # if the path only has one vertex, set prev to curr to be compatible with bend test
+      prev_id = v_ids[-2] if len(v_ids) > 1 else curr_id
+      for next_id in self.neighbor_ids[curr_id]:
+        if next_id == prev_id: # disable u turn at the site
+          continue
+
+        # limit on bend count
+        new_bend_count = bend_count + int(self._isBend(prev_id, curr_id, next_id))
+        if new_bend_count > BEND_COUNT_LIMIT:
+          continue
+
+        queue.append((v_ids + (next_id,), new_bend_count))
+
+    self.path_cache[key] = tuple(paths)
+    return self.path_cache[key]
+
   def findAllPaths(
       self,
       src_slot: str, 
       dst_slot: str, 
       data_width: int, 
-      bridge_name: str
+      bridge_name: str,
+      detour_path_limit: int = None
   ) -> List[RoutingPath]:
     """
-    run BFS to get all paths that satisfy the requirement
+    get all paths that satisfy the requirement
     The path include the source and destination
+    detour_path_limit overrides the limit of the graph, e.g., 0 for the shortest paths only
+    """
+    if detour_path_limit is None:
+      detour_path_limit = self.detour_path_limit
+
+    key = (src_slot, dst_slot, detour_path_limit)
+    if key not in self._slot_pair_to_paths:
+      src = self.slot_name_to_vertex[src_slot]
+      dst = self.slot_name_to_vertex[dst_slot]
+      self._slot_pair_to_paths[key] = [
+        (
+          tuple(self.vertices[i] for i in v_ids), 
+          tuple(self.edges[i] for i in e_ids), 
+          bend_count,
+          self._getUnitCost(v_ids)
+        ) for v_ids, e_ids, bend_count in self._enumerateGeometricPaths(src, dst, detour_path_limit)
+      ]
+
+    return [
+      RoutingPath(vertices, edges, bend_count, data_width, bridge_name, unit_cost)
+        for vertices, edges, bend_count, unit_cost in self._slot_pair_to_paths[key]
+    ]
+
+  def getPath(
+      self,
+      v_ids: Tuple[int, ...],
+      data_width: int,
+      bridge_name: str
+  ) -> RoutingPath:
+    """
+    build the path that goes through the given vertices of this graph
+    """
+    edges = tuple(self.v_ids_to_edge[v_ids[i], v_ids[i+1]] for i in range(len(v_ids)-1))
+    bend_count = sum(int(self._isBend(v_ids[i-1], v_ids[i], v_ids[i+1])) for i in range(1, len(v_ids)-1))
+    return RoutingPath(
+      tuple(self.vertices[i] for i in v_ids), edges, bend_count, data_width, bridge_name, self._getUnitCost(v_ids)
+    )
+
+  def findCheapestPath(
+      self,
+      src_slot: str,
+      dst_slot: str,
+      edge_weights: List[float]
+  ) -> Tuple[int, ...]:
+    """
+    the pricing oracle of column generation. Return the vertex ids of the path with the minimal
+    unit cost plus the weights of the passed edges, under the same length and bend limit as findAllPaths.
+    Paths are extended one vertex at a time; a state is (current vertex, previous vertex, bend count)
+    The weights must be non-negative
     """
     src = self.slot_name_to_vertex[src_slot]
     dst = self.slot_name_to_vertex[dst_slot]
-    shortest_dist = self._getShortestDist(src, dst)
-
-    init_path = RoutingPath(
-      vertices = [src],
-      bend_count = 0,
-      length_limit = shortest_dist + self.detour_path_limit,
-      data_width = data_width,
-      bridge_name = bridge_name,
-      util = self.util
-    )
+    length_limit = self._getShortestDist(src, dst) + self.detour_path_limit
+    dsp, bram, lut = self.vertex_util['DSP'], self.vertex_util['BRAM'], self.vertex_util['LUT']
+    vertex_cost = [dsp[i] + bram[i] + 0.7 * lut[i] for i in range(len(self.vertices))]
+
+    # state -> (cost, parent state) for the paths with the same number of vertices
+    layer = {(src.vertex_id, src.vertex_id, 0): (vertex_cost[src.vertex_id], None)}
+    layers = [layer]
+    best_cost, best_state, best_layer = None, None, None
+    while layer:
+      for state, (cost, _) in layer.items():
+        if state[0] == dst.vertex_id and (best_cost is None or cost < best_cost):
+          best_cost, best_state, best_layer = cost, state, len(layers) - 1
+
+      # if a path is too long, stop extending it
+      if len(layers) > length_limit:
+        break
 
-    queue = [init_path]
+      next_layer = {}
+      for state, (cost, _) in layer.items():
+        curr_id, prev_id, bend_count = state
+        if curr_id == dst.vertex_id:
+          continue
+        for next_id in self.neighbor_ids[curr_id]:
+          if next_id == prev_id: # disable u turn at the site
+            continue
+          new_bend_count = bend_count + int(self._isBend(prev_id, curr_id, next_id))
+          if new_bend_count > BEND_COUNT_LIMIT:
+            continue
 
-    paths = []
-    while queue:
-      curr_path = queue.pop(0)
+          new_cost = cost + edge_weights[self.v_ids_to_edge[curr_id, next_id].edge_id] + vertex_cost[next_id]
+          new_state = (next_id, curr_id, new_bend_count)
+          if new_state not in next_layer or new_cost < next_layer[new_state][0]:
+            next_layer[new_state] = (new_cost, state)
 
-      if curr_path.getDest() != dst:
-        queue += curr_path.getChildPaths()
-      else:
-        curr_path.initEdges()
-        paths.append(curr_path)
+      layers.append(next_layer)
+      layer = next_layer
 
-    assert len(set(paths)) == len(paths)
-    return paths
+    assert best_state is not None, f'no path from {src_slot} to {dst_slot}'
+
+    # trace back the vertices
+    v_ids = []
+    state = best_state
+    for i in range(best_layer, -1, -1):
+      v_ids.append(state[0])
+      state = layers[i][state][1]
+    return tuple(reversed(v_ids))
+
+
+class Commodity:
+  """
+  bridges with the same source slot, destination slot and width are interchangeable in routing.
+  In the aggregated formulation they are routed together as one commodity
+  """
+
+  def __init__(self, src_slot_name: str, dst_slot_name: str, width: int) -> None:
+    self.src_slot_name = src_slot_name
+    self.dst_slot_name = dst_slot_name
+    self.width = width
+    self.bridges: List[Edge] = []
+    self.name = f'{src_slot_name}_To_{dst_slot_name}_W{width}'
+
+  def __hash__(self):
+    return hash(self.name)
+
+  def __eq__(self, other):
+    return self.name == other.name
 
 
 class ILPRouter:
@@ -328,7 +481,8 @@ class ILPRouter:
       self, 
       bridge_list: List[Edge], 
       v2s: Dict[Vertex, Slot], 
-      util: Dict[Slot, Dict[str, float]]
+      util: Dict[Slot, Dict[str, float]],
+      routing_device: RoutingDevice = None
   ) -> None:
     """
     to avoid confusion, here we call the data transfer path betwee two slots a "bridge"
@@ -337,23 +491,123 @@ class ILPRouter:
     self.bridge_list = bridge_list
     self.v2s = v2s
     self.util = util
+    self.routing_device = routing_device
 
-  def _getBridgeToCandidatePaths(
-      self, 
-      routing_usage_limit: float, 
-      detour_path_limit: int
-  ) -> Dict[Edge, List[RoutingPath]]:
+    # the geometric paths between each pair of slots, shared by all routing attempts
+    self.path_cache = {}
+
+    # set by the presolve. The bridges left to the ILP, the bridges with a fixed path,
+    # and the width reserved by the fixed bridges on each boundary, indexed by edge_id
+    self.free_bridge_list = bridge_list
+    self.bridge_to_fixed_path = {}
+    self.reserved_width = None
+    self.full_capacity = None
+
+    # solver options, set in ILPRouting
+    self.max_seconds = None
+    self.max_mip_gap = None
+    self.threads = None
+    self.emphasis = None
+
+    # one record for each integer solve, see _solve
+    self.attempt_reports = []
+
+  def _solve(self, m: Model, method: str, phase: str, routing_usage_limit: float) -> OptimizationStatus:
     """
-    for each edge, generate the candidate paths to select from
+    solve the integer model with the solver options and record the status, gap, solve time and model size
+    """
+    if self.threads is not None:
+      m.threads = self.threads
+    if self.emphasis is not None:
+      m.emphasis = SearchEmphasis[self.emphasis]
+    if self.max_mip_gap is not None:
+      m.max_mip_gap = self.max_mip_gap
+
+    start = time.time()
+    if self.max_seconds is not None:
+      status = m.optimize(max_seconds=self.max_seconds)
+    else:
+      status = m.optimize()
+    solve_time = time.time() - start
+
+    has_solution = status in ACCEPTED_STATUS
+    report = {
+      'method': method,
+      'phase': phase,
+      'routing_usage_limit': round(routing_usage_limit, 4),
+      'status': status.name,
+      'objective': m.objective_value if has_solution else None,
+      'bound': m.objective_bound if has_solution else None,
+      'gap': m.gap if has_solution else None,
+      'solve_time': round(solve_time, 3),
+      'num_vars': m.num_cols,
+      'num_int_vars': m.num_int,
+      'num_constrs': m.num_rows,
+    }
+    self.attempt_reports.append(report)
+
+    if status == OptimizationStatus.FEASIBLE:
+      logging.warning(f'{method} {phase}: accept the solution with gap {report["gap"]} after {report["solve_time"]} seconds')
+    elif status == OptimizationStatus.NO_SOLUTION_FOUND:
+      logging.warning(f'{method} {phase}: no solution found within {self.max_seconds} seconds')
+
+    return status
+
+  def _dropInfeasiblePaths(self, paths: List[RoutingPath]) -> List[RoutingPath]:
+    """
+    remove the paths that pass a boundary with not enough capacity for the bridge even if the boundary is
+    fully available to the free bridges. If no path is left, keep all of them and let the solver decide
     """
-    routing_graph = RoutingGraph(self.util, routing_usage_limit, detour_path_limit)
+    feasible_paths = [
+      path for path in paths
+        if all(path.data_width <= self.full_capacity[e.edge_id] - self.reserved_width[e.edge_id] for e in path.edges)
+    ]
+    return feasible_paths if feasible_paths else paths
+
+  def _presolve(self, detour_path_limit: int) -> None:
+    """
+    fix the bridges with only one feasible candidate path, e.g., the intra-slot bridges,
+    and reserve their width on the passed boundaries. Only the other bridges go into the ILP
+    """
+    routing_graph = RoutingGraph(self.util, 1.0, detour_path_limit, self.path_cache, self.routing_device)
+    self.full_capacity = [routing_edge.capacity for routing_edge in routing_graph.edges]
+    self.reserved_width = [0] * len(routing_graph.edges)
 
     bridge_to_paths = {}
     for bridge in self.bridge_list:
       src_slot_name = self.v2s[bridge.src].getRTLModuleName()
       dst_slot_name = self.v2s[bridge.dst].getRTLModuleName()
-      path_candidates = routing_graph.findAllPaths(
-        src_slot_name, dst_slot_name, bridge.width, bridge.name
+      bridge_to_paths[bridge] = routing_graph.findAllPaths(src_slot_name, dst_slot_name, bridge.width, bridge.name)
+    path_num_before = sum(len(paths) for paths in bridge_to_paths.values())
+
+    self.bridge_to_fixed_path = {}
+    self.free_bridge_list = []
+    for bridge, paths in bridge_to_paths.items():
+      feasible_paths = self._dropInfeasiblePaths(paths)
+      if len(feasible_paths) == 1:
+        self.bridge_to_fixed_path[bridge] = feasible_paths[0]
+        for routing_edge in feasible_paths[0].edges:
+          self.reserved_width[routing_edge.edge_id] += bridge.width
+      else:
+        self.free_bridge_list.append(bridge)
+
+    path_num_after = sum(len(self._dropInfeasiblePaths(bridge_to_paths[bridge])) for bridge in self.free_bridge_list)
+
+    logging.info(f'presolve: {len(self.bridge_to_fixed_path)} bridges are fixed, '
+                 f'including {sum(len(p.vertices) == 1 for p in self.bridge_to_fixed_path.values())} intra-slot bridges')
+    logging.info(f'presolve: dataflow edges reduced from {len(self.bridge_list)} to {len(self.free_bridge_list)}')
+    logging.info(f'presolve: candidate paths reduced from {path_num_before} to {path_num_after}')
+
+  def _getBridgeToCandidatePaths(self, routing_graph: RoutingGraph) -> Dict[Edge, List[RoutingPath]]:
+    """
+    for each edge, generate the candidate paths to select from
+    """
+    bridge_to_paths = {}
+    for bridge in self.free_bridge_list:
+      src_slot_name = self.v2s[bridge.src].getRTLModuleName()
+      dst_slot_name = self.v2s[bridge.dst].getRTLModuleName()
+      path_candidates = self._dropInfeasiblePaths(
+        routing_graph.findAllPaths(src_slot_name, dst_slot_name, bridge.width, bridge.name)
       )
 
       logging.debug(f'bridge {bridge.name} has candidate paths:')
@@ -364,6 +618,41 @@ class ILPRouter:
 
     return bridge_to_paths
 
+  def _getCommodities(self) -> List[Commodity]:
+    """
+    group the bridges by the source slot, the destination slot and the width
+    """
+    key_to_commodity = {}
+    for bridge in self.free_bridge_list:
+      src_slot_name = self.v2s[bridge.src].getRTLModuleName()
+      dst_slot_name = self.v2s[bridge.dst].getRTLModuleName()
+      key = (src_slot_name, dst_slot_name, bridge.width)
+      if key not in key_to_commodity:
+        key_to_commodity[key] = Commodity(*key)
+      key_to_commodity[key].bridges.append(bridge)
+
+    # fixed order of bridges for deterministic disaggregation
+    for commodity in key_to_commodity.values():
+      commodity.bridges.sort(key=lambda bridge: bridge.name)
+
+    return list(key_to_commodity.values())
+
+  def _getCommodityToCandidatePaths(
+      self, 
+      commodities: List[Commodity],
+      routing_graph: RoutingGraph
+  ) -> Dict[Commodity, List[RoutingPath]]:
+    """
+    for each commodity, generate the candidate paths to select from
+    """
+    commodity_to_paths = {}
+    for commodity in commodities:
+      commodity_to_paths[commodity] = self._dropInfeasiblePaths(
+        routing_graph.findAllPaths(commodity.src_slot_name, commodity.dst_slot_name, commodity.width, commodity.name)
+      )
+
+    return commodity_to_paths
+
   def _getRoutingEdgeToPassingPaths(
       self, bridge_to_paths: Dict[Edge, List[RoutingPath]]
   ) -> Dict[RoutingEdge, List[RoutingPath]]:
@@ -392,6 +681,31 @@ class ILPRouter:
 
     return path_to_var
 
+  def _getPathToFlowVar(self, m: Model, commodity_to_paths: Dict[Commodity, List[RoutingPath]]):
+    """
+    for each commodity, for each candidate path, 
+    create an integer variable to represent how many bridges of the commodity take this path
+    """
+    path_to_var = {}
+    for commodity, path_list in commodity_to_paths.items():
+      for path in path_list:
+        assert path not in path_to_var
+        path_to_var[path] = m.add_var(var_type=INTEGER, lb=0, ub=len(commodity.bridges))
+
+    return path_to_var
+
+  def _constrAllBridgesOfCommodity(
+      self, 
+      m: Model, 
+      commodity_to_paths: Dict[Commodity, List[RoutingPath]], 
+      path_to_var: Dict[RoutingPath, Var]
+  ) -> None:
+    """
+    for each commodity, every bridge is routed through one of the candidate paths
+    """
+    for commodity, paths in commodity_to_paths.items():
+      m += xsum([path_to_var[path] for path in paths]) == len(commodity.bridges)
+
   def _constrOnePathForOneBridge(
       self, 
       m: Model, 
@@ -412,9 +726,34 @@ class ILPRouter:
   ) -> None:
     """
     for each routing edge, limit the paths that go through a routing edge
+    the width of the fixed bridges is reserved
     """
     for routing_edge, paths in routing_edge_to_paths.items():
-      m += xsum(path_to_var[path] * path.data_width for path in paths) <= routing_edge.capacity
+      m += xsum(path_to_var[path] * path.data_width for path in paths) <= \
+        routing_edge.capacity - self.reserved_width[routing_edge.edge_id]
+
+  def _constrElasticRoutingEdgeCapacity(
+      self, 
+      m: Model, 
+      path_to_var: Dict[RoutingPath, Var], 
+      routing_edge_to_paths: Dict[RoutingEdge, List[RoutingPath]],
+      routing_usage_limit: float,
+      relax_step_var: Var,
+      routing_graph: RoutingGraph
+  ) -> None:
+    """
+    same as _constrRoutingEdgeCapacity, but the usage limit is relaxed by relax_step_var steps.
+    The routing edges must be created with the full capacity.
+    Boundaries only passed by the fixed bridges also limit the relaxation
+    """
+    for routing_edge in routing_graph.edges:
+      paths = routing_edge_to_paths.get(routing_edge, [])
+      reserved_width = self.reserved_width[routing_edge.edge_id]
+      if not paths and not reserved_width:
+        continue
+      m += xsum(path_to_var[path] * path.data_width for path in paths) + reserved_width <= \
+        routing_edge.capacity * routing_usage_limit + \
+        routing_edge.capacity * ROUTING_USAGE_LIMIT_STEP * relax_step_var
 
   def _minimizeTotalPathArea(
       self, 
@@ -425,10 +764,8 @@ class ILPRouter:
     """
     minimize the total length * width of all selected paths
     """
-    # concatenate to get all paths
-    all_paths: List[RoutingPath] = sum(bridge_to_paths.values(), [])
     m.objective = minimize(
-      xsum(path_to_var[path] * path.getCost() for path in all_paths)
+      xsum(path_to_var[path] * path.getCost() for paths in bridge_to_paths.values() for path in paths)
     )
 
   def _analyzeILPResults(
@@ -491,6 +828,43 @@ class ILPRouter:
 
     return bridge_to_selected_path, routing_edge_to_selected_paths
 
+  def _disaggregateILPResults(
+    self,
+    commodity_to_paths,
+    path_to_var
+  ):
+    """
+    assign each bridge of a commodity a concrete path according to the path flow.
+    Bridges in a commodity are interchangeable, thus any assignment with the same flow is equivalent
+    """
+    bridge_to_paths = {}
+    bridge_to_selected_path = {}
+    for commodity, paths in commodity_to_paths.items():
+      bridges = iter(commodity.bridges)
+      for path in paths:
+        val = path_to_var[path].x
+        assert abs(val - round(val)) < 0.0001
+        for _ in range(round(val)):
+          bridge = next(bridges)
+          bridge_to_selected_path[bridge] = RoutingPath(
+            path.vertices, path.edges, path.bend_count, bridge.width, bridge.name, path.unit_cost
+          )
+          if path.getLength() > path.getTheoreticalShortestLength():
+            logging.warning(f'{bridge.name} is not routed with the shortest paths')
+
+      # the candidates of each bridge are the same as its commodity, used in analysis
+      for bridge in commodity.bridges:
+        assert bridge in bridge_to_selected_path
+        bridge_to_paths[bridge] = paths
+
+    # get which paths will pass through a boundary
+    routing_edge_to_selected_paths = defaultdict(list)
+    for selected_path in bridge_to_selected_path.values():
+      for routing_edge in selected_path.edges:
+        routing_edge_to_selected_paths[routing_edge].append(selected_path)
+
+    return bridge_to_paths, bridge_to_selected_path, routing_edge_to_selected_paths
+
   def _getENameToPathsExcludeSrcAndDst(self, bridge_to_selected_path):
     e_name_to_paths = {}
     # exclude the source and destination to feed back to the outside world   
@@ -499,42 +873,359 @@ class ILPRouter:
 
     return e_name_to_paths
 
-  def ILPRouting(
+  def _setWarmStart(
       self,
-      routing_usage_limit: float = 0.7,
-      detour_path_limit: int = 4
-  ) -> Dict[str, List[Slot]]:
+      m: Model,
+      bridge_to_paths,
+      path_to_var: Dict[RoutingPath, Var],
+      initial_e_name_to_paths: Dict[str, List[Slot]],
+      aggregate_commodities: bool
+  ) -> None:
+    """
+    use an existing routing result, e.g., from the PathFinder router, as the initial solution
+    the format of the routing result is the same as the output of ILPRouting
+    """
+    bridge_to_slot_names = {}
+    for bridge in self.free_bridge_list:
+      src_slot_name = self.v2s[bridge.src].getRTLModuleName()
+      dst_slot_name = self.v2s[bridge.dst].getRTLModuleName()
+      if src_slot_name == dst_slot_name:
+        bridge_to_slot_names[bridge] = (src_slot_name, )
+      else:
+        passed_slot_names = tuple(s.getRTLModuleName() for s in initial_e_name_to_paths[bridge.name])
+        bridge_to_slot_names[bridge] = (src_slot_name, ) + passed_slot_names + (dst_slot_name, )
 
-    while 1:
-      logging.info(f'Global routing attempt with routing usage limit {routing_usage_limit}')
+    start = []
+    for key, paths in bridge_to_paths.items():
+      bridges = key.bridges if aggregate_commodities else [key]
+      slot_names_to_count = Counter(bridge_to_slot_names[bridge] for bridge in bridges)
+      for path in paths:
+        path_slot_names = tuple(v.slot_name for v in path.vertices)
+        start.append((path_to_var[path], slot_names_to_count[path_slot_names]))
 
-      m = Model()
+    m.start = start
 
-      bridge_to_paths = self._getBridgeToCandidatePaths(routing_usage_limit, detour_path_limit)
+  def _buildRoutingModel(
+      self,
+      m: Model,
+      routing_graph: RoutingGraph,
+      commodities: List[Commodity],
+      aggregate_commodities: bool,
+      initial_e_name_to_paths: Dict[str, List[Slot]] = None
+  ):
+    """
+    generate the candidate paths and the corresponding variables.
+    Add the constraints that every bridge is routed
+    """
+    if aggregate_commodities:
+      bridge_to_paths = self._getCommodityToCandidatePaths(commodities, routing_graph)
+      path_to_var = self._getPathToFlowVar(m, bridge_to_paths)
+    else:
+      bridge_to_paths = self._getBridgeToCandidatePaths(routing_graph)
       path_to_var = self._getPathToVar(m, bridge_to_paths)
-      routing_edge_to_paths = self._getRoutingEdgeToPassingPaths(bridge_to_paths)
+    routing_edge_to_paths = self._getRoutingEdgeToPassingPaths(bridge_to_paths)
 
+    if aggregate_commodities:
+      logging.info(f'there are {len(bridge_to_paths)} commodities')
+    else:
       logging.info(f'there are {len(bridge_to_paths)} dataflow edges')
-      logging.info(f'there are {len(path_to_var)} potential paths to select from')
+    logging.info(f'there are {len(path_to_var)} potential paths to select from')
 
+    if aggregate_commodities:
+      self._constrAllBridgesOfCommodity(m, bridge_to_paths, path_to_var)
+    else:
       self._constrOnePathForOneBridge(m, bridge_to_paths, path_to_var)
 
+    if initial_e_name_to_paths:
+      self._setWarmStart(m, bridge_to_paths, path_to_var, initial_e_name_to_paths, aggregate_commodities)
+
+    return bridge_to_paths, path_to_var, routing_edge_to_paths
+
+  def _iterativeILPRouting(
+      self,
+      commodities: List[Commodity],
+      routing_usage_limit: float,
+      detour_path_limit: int,
+      aggregate_commodities: bool,
+      initial_e_name_to_paths: Dict[str, List[Slot]]
+  ):
+    """
+    solve the routing problem. If it fails, relax the usage limit and rebuild the model
+    """
+    while 1:
+      logging.info(f'Global routing attempt with routing usage limit {routing_usage_limit}')
+
+      m = Model()
+
+      routing_graph = RoutingGraph(self.util, routing_usage_limit, detour_path_limit, self.path_cache, self.routing_device)
+      bridge_to_paths, path_to_var, routing_edge_to_paths = self._buildRoutingModel(
+        m, routing_graph, commodities, aggregate_commodities, initial_e_name_to_paths
+      )
+
       self._constrRoutingEdgeCapacity(m, path_to_var, routing_edge_to_paths)
 
       self._minimizeTotalPathArea(m, bridge_to_paths, path_to_var)
 
-      status = m.optimize()
+      # the fixed bridges alone may overflow a boundary
+      if any(self.reserved_width[e.edge_id] > e.capacity for e in routing_graph.edges):
+        status = OptimizationStatus.INFEASIBLE
+      else:
+        status = self._solve(m, 'iterative', 'min_cost', routing_usage_limit)
 
-      if status == OptimizationStatus.OPTIMAL:
+      # if the solver times out without a solution, also relax the limit to get an easier problem
+      if status in ACCEPTED_STATUS:
         logging.warning(f'Succeeded: global routing attempt with routing usage limit {routing_usage_limit}')
         break
       else:
         logging.warning(f'Failed: global routing attempt with routing usage limit {routing_usage_limit}')
-        routing_usage_limit += 0.03
+        routing_usage_limit += ROUTING_USAGE_LIMIT_STEP
+
+    return bridge_to_paths, path_to_var, routing_edge_to_paths
+
+  def _elasticILPRouting(
+      self,
+      commodities: List[Commodity],
+      routing_usage_limit: float,
+      detour_path_limit: int,
+      aggregate_commodities: bool,
+      initial_e_name_to_paths: Dict[str, List[Slot]]
+  ):
+    """
+    build the model only once. The number of times the usage limit is relaxed is a variable.
+    First minimize the relaxation, then fix it and minimize the path cost
+    """
+    m = Model()
+
+    # create the routing edges with the full capacity. The usage limit is part of the constraints
+    routing_graph = RoutingGraph(self.util, 1.0, detour_path_limit, self.path_cache, self.routing_device)
+    bridge_to_paths, path_to_var, routing_edge_to_paths = self._buildRoutingModel(
+      m, routing_graph, commodities, aggregate_commodities, initial_e_name_to_paths
+    )
+
+    relax_step_var = m.add_var(var_type=INTEGER, lb=0)
+    self._constrElasticRoutingEdgeCapacity(
+      m, path_to_var, routing_edge_to_paths, routing_usage_limit, relax_step_var, routing_graph
+    )
+
+    # find the minimal feasible usage limit
+    m.objective = minimize(relax_step_var)
+    status = self._solve(m, 'elastic', 'min_usage_limit', routing_usage_limit)
+    assert status in ACCEPTED_STATUS, f'failed to find the minimal routing usage limit: {status}'
+
+    relax_step = round(relax_step_var.x)
+    routing_usage_limit += relax_step * ROUTING_USAGE_LIMIT_STEP
+    logging.warning(f'Succeeded: the minimal feasible routing usage limit is {routing_usage_limit}')
+
+    # minimize the path cost under the minimal usage limit. Start from the feasible solution we just found
+    m.start = [(var, var.x) for var in m.vars]
+    relax_step_var.lb = relax_step
+    relax_step_var.ub = relax_step
+    self._minimizeTotalPathArea(m, bridge_to_paths, path_to_var)
+
+    status = self._solve(m, 'elastic', 'min_cost', routing_usage_limit)
+    assert status in ACCEPTED_STATUS, f'failed to minimize the routing cost: {status}'
+
+    return bridge_to_paths, path_to_var, routing_edge_to_paths
+
+  def _getSlotPairOfTarget(self, target, aggregate_commodities: bool) -> Tuple[str, str]:
+    """
+    the source and destination slot of a bridge or a commodity
+    """
+    if aggregate_commodities:
+      return target.src_slot_name, target.dst_slot_name
+    else:
+      return self.v2s[target.src].getRTLModuleName(), self.v2s[target.dst].getRTLModuleName()
+
+  def _columnGenerationILPRouting(
+      self,
+      commodities: List[Commodity],
+      routing_usage_limit: float,
+      detour_path_limit: int,
+      aggregate_commodities: bool,
+      initial_column_num: int
+  ):
+    """
+    start from the cheapest shortest paths of each bridge (or commodity) instead of all candidate paths.
+    Solve the LP relaxation and add the paths with negative reduced cost found by the pricing oracle,
+    until no such path exists. Then solve the integer problem over the generated paths.
+    If the integer solution overflows any boundary, relax the usage limit and retry with the generated paths
+    """
+    targets = commodities if aggregate_commodities else self.free_bridge_list
+    target_to_slot_pair = {t: self._getSlotPairOfTarget(t, aggregate_commodities) for t in targets}
+    slot_pair_to_targets = defaultdict(list)
+    for target, slot_pair in target_to_slot_pair.items():
+      slot_pair_to_targets[slot_pair].append(target)
+
+    # the generated columns as vertex ids, kept when the usage limit is relaxed
+    target_to_columns = {}
+
+    while 1:
+      logging.info(f'Column generation global routing attempt with routing usage limit {routing_usage_limit}')
+
+      routing_graph = RoutingGraph(self.util, routing_usage_limit, detour_path_limit, self.path_cache, self.routing_device)
+
+      if not target_to_columns:
+        for target, (src_slot_name, dst_slot_name) in target_to_slot_pair.items():
+          shortest_paths = self._dropInfeasiblePaths(
+            routing_graph.findAllPaths(src_slot_name, dst_slot_name, target.width, target.name, 0)
+          )
+          shortest_paths.sort(key=lambda p: p.getCost())
+          target_to_columns[target] = [
+            tuple(v.vertex_id for v in p.vertices) for p in shortest_paths[:initial_column_num]
+          ]
+
+      m = Model()
+      var_type = INTEGER if aggregate_commodities else BINARY
+
+      bridge_to_paths = {}
+      path_to_var = {}
+      target_to_constr = {}
+      for target, columns in target_to_columns.items():
+        demand = len(target.bridges) if aggregate_commodities else 1
+        paths = [routing_graph.getPath(v_ids, target.width, target.name) for v_ids in columns]
+        for path in paths:
+          path_to_var[path] = m.add_var(var_type=var_type, lb=0, ub=demand)
+        bridge_to_paths[target] = paths
+        target_to_constr[target] = m.add_constr(xsum(path_to_var[path] for path in paths) == demand)
+
+      # every boundary gets a constraint so that new columns could be attached to it
+      routing_edge_to_paths = self._getRoutingEdgeToPassingPaths(bridge_to_paths)
+      overflow_vars = [m.add_var(var_type=CONTINUOUS, lb=0) for _ in routing_graph.edges]
+      edge_to_constr = [
+        m.add_constr(
+          xsum(path_to_var[path] * path.data_width for path in routing_edge_to_paths[routing_edge]) \
+            - overflow_vars[routing_edge.edge_id] <= routing_edge.capacity - self.reserved_width[routing_edge.edge_id]
+        ) for routing_edge in routing_graph.edges
+      ]
+
+      m.objective = minimize(
+        xsum(path_to_var[path] * path.getCost() for path in path_to_var) + OVERFLOW_PENALTY * xsum(overflow_vars)
+      )
+
+      # price new columns until the LP relaxation is optimal
+      while 1:
+        status = m.optimize(relax=True)
+        assert status == OptimizationStatus.OPTIMAL, f'failed to solve the LP relaxation: {status}'
+
+        # the duals of the capacity constraints are non-positive
+        edge_weights = [max(0.0, -constr.pi) for constr in edge_to_constr]
+
+        new_column_num = 0
+        for (src_slot_name, dst_slot_name), pair_targets in slot_pair_to_targets.items():
+          v_ids = routing_graph.findCheapestPath(src_slot_name, dst_slot_name, edge_weights)
+          for target in pair_targets:
+            if v_ids in target_to_columns[target]:
+              continue
+
+            path = routing_graph.getPath(v_ids, target.width, target.name)
+            reduced_cost = path.getCost() - target_to_constr[target].pi + \
+              target.width * sum(edge_weights[e.edge_id] for e in path.edges)
+            if reduced_cost > -REDUCED_COST_TOLERANCE:
+              continue
+
+            demand = len(target.bridges) if aggregate_commodities else 1
+            constrs = [target_to_constr[target]] + [edge_to_constr[e.edge_id] for e in path.edges]
+            coeffs = [1] + [target.width] * len(path.edges)
+            path_to_var[path] = m.add_var(
+              obj=path.getCost(), var_type=var_type, lb=0, ub=demand, column=Column(constrs, coeffs)
+            )
+            target_to_columns[target].append(v_ids)
+            bridge_to_paths[target].append(path)
+            for routing_edge in path.edges:
+              routing_edge_to_paths[routing_edge].append(path)
+            new_column_num += 1
+
+        logging.info(f'LP relaxation cost {m.objective_value}, {new_column_num} new paths are generated')
+        if not new_column_num:
+          break
+
+      logging.info(f'there are {len(path_to_var)} generated paths to select from')
+
+      status = self._solve(m, 'column_generation', 'min_cost', routing_usage_limit)
+      if status in ACCEPTED_STATUS and sum(v.x for v in overflow_vars) < 0.5:
+        logging.warning(f'Succeeded: column generation global routing with routing usage limit {routing_usage_limit}')
+        break
+      else:
+        logging.warning(f'Failed: column generation global routing with routing usage limit {routing_usage_limit}')
+        routing_usage_limit += ROUTING_USAGE_LIMIT_STEP
+
+    return bridge_to_paths, path_to_var, routing_edge_to_paths
+
+  def ILPRouting(
+      self,
+      routing_usage_limit: float = 0.7,
+      detour_path_limit: int = 4,
+      aggregate_commodities: bool = False,
+      elastic_capacity: bool = False,
+      initial_e_name_to_paths: Dict[str, List[Slot]] = None,
+      column_generation: bool = False,
+      initial_column_num: int = 3,
+      max_seconds: float = None,
+      max_mip_gap: float = None,
+      threads: int = None,
+      emphasis: str = None
+  ) -> Dict[str, List[Slot]]:
+    """
+    if aggregate_commodities is set, bridges with the same source, destination and width
+    are routed together with integer path flow variables. The model size then depends on 
+    the number of distinct commodities instead of the number of bridges
+
+    if elastic_capacity is set, the minimal feasible routing usage limit is found by the solver
+    instead of rebuilding and resolving the model with increasing limit
+
+    initial_e_name_to_paths is an optional routing result used to warm start the solver
+
+    if column_generation is set, the candidate paths are generated on demand from the
+    initial_column_num cheapest shortest paths, instead of enumerating all paths within the detour limit.
+    The warm start is not used in this mode
+
+    max_seconds and max_mip_gap bound each integer solve. The best solution found is accepted
+    even if it is not proven optimal. threads and emphasis (DEFAULT, FEASIBILITY or OPTIMALITY)
+    are passed to the solver. Each solve is recorded in self.attempt_reports
+    """
+    assert not (column_generation and elastic_capacity), 'column generation does not support elastic capacity'
+
+    self.max_seconds = max_seconds
+    self.max_mip_gap = max_mip_gap
+    self.threads = threads
+    self.emphasis = emphasis
+    self.attempt_reports = []
+
+    self._presolve(detour_path_limit)
+
+    commodities = []
+    if aggregate_commodities:
+      commodities = self._getCommodities()
+      logging.info(f'{len(self.free_bridge_list)} dataflow edges are aggregated into {len(commodities)} commodities')
+
+    if not self.free_bridge_list:
+      bridge_to_paths, path_to_var, routing_edge_to_paths = {}, {}, {}
+    elif column_generation:
+      bridge_to_paths, path_to_var, routing_edge_to_paths = self._columnGenerationILPRouting(
+        commodities, routing_usage_limit, detour_path_limit, aggregate_commodities, initial_column_num
+      )
+    elif elastic_capacity:
+      bridge_to_paths, path_to_var, routing_edge_to_paths = self._elasticILPRouting(
+        commodities, routing_usage_limit, detour_path_limit, aggregate_commodities, initial_e_name_to_paths
+      )
+    else:
+      bridge_to_paths, path_to_var, routing_edge_to_paths = self._iterativeILPRouting(
+        commodities, routing_usage_limit, detour_path_limit, aggregate_commodities, initial_e_name_to_paths
+      )
 
     # extract results
-    bridge_to_selected_path, routing_edge_to_selected_paths = \
-      self._getILPResults(bridge_to_paths, path_to_var, routing_edge_to_paths)
+    if aggregate_commodities:
+      bridge_to_paths, bridge_to_selected_path, routing_edge_to_selected_paths = \
+        self._disaggregateILPResults(bridge_to_paths, path_to_var)
+    else:
+      bridge_to_selected_path, routing_edge_to_selected_paths = \
+        self._getILPResults(bridge_to_paths, path_to_var, routing_edge_to_paths)
+
+    # add back the bridges fixed in presolve
+    for bridge, fixed_path in self.bridge_to_fixed_path.items():
+      bridge_to_selected_path[bridge] = fixed_path
+      for routing_edge in fixed_path.edges:
+        routing_edge_to_selected_paths[routing_edge].append(fixed_path)
 
     # logging and analysis
     self._analyzeILPResults(bridge_to_paths, bridge_to_selected_path, routing_edge_to_selected_paths)
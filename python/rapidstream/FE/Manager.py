@@ -1,3 +1,5 @@
+import argparse
+import hashlib
 import json
 import logging
 import os
@@ -17,80 +19,146 @@ from rapidstream.FE.CreateSlotWrapper import CreateSlotWrapper
 from rapidstream.FE.CreateRoutingSlotWrapper import CreateRoutingSlotWrapper
 from rapidstream.FE.CreateCtrlSlotWrapper import CreateCtrlSlotWrapper
 from rapidstream.FE.CreateResultJson import CreateResultJson
-from rapidstream.FE.CreateTopRTLForCtrlWrappers import CreateTopRTLForCtrlWrappers
+from rapidstream.FE.CreateTopRTLForCtrlWrappers import emitTopRTLForCtrlWrappers
 from rapidstream.FE.FIFOCalibration import FIFOCalibration
+from rapidstream.FE.ParallelMap import forkMapWithDeadline
+from rapidstream.FE.RTLEmitter import writeRTL
+from rapidstream.FE.StageCheckpoint import StageCheckpoint, FE_STAGES, FROM_STAGES
+from rapidstream.FE.StageProfiler import StageProfiler
 
 
 class Manager:
 
   def __init__(
       self,
-      config_file_path):
+      config_file_path,
+      from_stage = None,
+      to_stage = None,
+      profile = False,
+      cprofile_dir = None,
+      use_checkpoint = True):
+    """
+    the stages before from_stage are restored from the checkpoints. The flow stops after to_stage.
+    Without from_stage, a stage is restored if its inputs are the same as in its checkpoint.
+    If use_checkpoint is not set, no checkpoint is saved or restored.
+    If profile is set, the runtime, memory and problem size of each stage are saved to fe_profile.json
+    """
     assert os.path.isfile(config_file_path)
     self.config = json.loads(open(config_file_path, 'r').read())
     self.basicSetup()
     self.loggingSetup()
 
+    if not use_checkpoint:
+      self.checkpoint_dir = None
+
+    self.checkpoint = StageCheckpoint(self.checkpoint_dir, from_stage, to_stage)
+    self.profiler = StageProfiler(profile, cprofile_dir)
+
+    try:
+      self.runFlow()
+    finally:
+      self.profiler.save()
+
+  def runFlow(self):
     hls_prj_manager = HLSProjectManager(self.top_rtl_name, self.hls_prj_path, self.hls_solution_name)
 
     # first unify the module types in top RTL
     # unifyModuleTypesInTopRTL(hls_prj_manager.getRTLDir(), hls_prj_manager.getTopRTLPath())
 
-    top_rtl_parser = TopRTLParser(hls_prj_manager.getTopRTLPath())
-    graph = DataflowGraph(hls_prj_manager, top_rtl_parser)
+    with self.profiler.stage('floorplan'):
+      top_rtl_parser = TopRTLParser(hls_prj_manager.getTopRTLPath())
+      graph = DataflowGraph(hls_prj_manager, top_rtl_parser)
 
-    slot_manager = SlotManager(self.board)
+      slot_manager = SlotManager(self.board)
 
-    user_constraint_s2v = self.parseUserConstraints(graph, slot_manager)
-    grouping_constraints = top_rtl_parser.getStrictGroupingConstraints()
+      user_constraint_s2v = self.parseUserConstraints(graph, slot_manager)
+      grouping_constraints = top_rtl_parser.getStrictGroupingConstraints()
 
-    # extract patterns to facilitate floorplanning
-    # pattern_insts = getPatternBasedGrouping(graph, self.peregrine_home)
-    pattern_insts = []
-    floorplan = self.runFloorplanning(graph, user_constraint_s2v, slot_manager, hls_prj_manager,
-                                      max_search_time=180,
-                                      grouping_hints=pattern_insts, 
-                                      grouping_constraints=grouping_constraints)
-    open('floorplan_results.json', 'w').write(json.dumps({"FloorplanVertex":floorplan.getSlotNameToVertexNames()}, indent=2))
+      # extract patterns to facilitate floorplanning
+      # pattern_insts = getPatternBasedGrouping(graph, self.peregrine_home)
+      pattern_insts = []
+
+      # a restored floorplan is rebuilt from the saved slot of each vertex without solving it again
+      floorplan_input_hash = self.getFloorplanInputHash(hls_prj_manager, grouping_constraints)
+      saved_floorplan = self.checkpoint.load('floorplan', floorplan_input_hash)
+      if saved_floorplan is not None:
+        floorplan = self.createFloorplanFromSlotNames(graph, slot_manager, hls_prj_manager,
+                                                      saved_floorplan['SlotToVertices'], grouping_constraints)
+      else:
+        floorplan = self.runFloorplanning(graph, user_constraint_s2v, slot_manager, hls_prj_manager,
+                                          max_search_time=180,
+                                          grouping_hints=pattern_insts, 
+                                          grouping_constraints=grouping_constraints)
+        self.checkpoint.save('floorplan', floorplan_input_hash, {'SlotToVertices': self.getSlotNameToVertexNameList(floorplan)})
+      open('floorplan_results.json', 'w').write(json.dumps({"FloorplanVertex":floorplan.getSlotNameToVertexNames()}, indent=2))
+
+    self.profiler.addCounters('floorplan',
+      vertices=len(graph.getAllVertices()),
+      edges=len(graph.getAllEdges()),
+      slots=len(floorplan.getSlotToVertices()),
+      restored=saved_floorplan is not None)
+    if self.checkpoint.isLastStage('floorplan'):
+      return
 
     # grid routing of edges 
-    logging.info(f'Pipeline style is: {self.pipeline_style}')
-    global_router = GlobalRouting(floorplan, top_rtl_parser, slot_manager, self.pipeline_style, self.anchor_plan)
+    with self.profiler.stage('global_routing'):
+      logging.info(f'Pipeline style is: {self.pipeline_style}')
+      global_router = GlobalRouting(floorplan, top_rtl_parser, slot_manager, self.pipeline_style, self.anchor_plan, self.global_routing_config, self.checkpoint)
+
+    # the reports are empty if the routing results are restored
+    self.profiler.addCounters('global_routing',
+      ilp_solves=len(global_router.routing_reports),
+      max_ilp_vars=max([r['num_vars'] for r in global_router.routing_reports], default=0),
+      max_ilp_constrs=max([r['num_constrs'] for r in global_router.routing_reports], default=0))
+    if self.checkpoint.isLastStage('global_routing'):
+      return
 
     # latency balancing
-    rebalance = LatencyBalancing(graph, floorplan, global_router)
+    with self.profiler.stage('latency_balancing'):
+      rebalance = LatencyBalancing(graph, floorplan, global_router)
 
-    FIFOCalibration(floorplan)
+      FIFOCalibration(floorplan)
+    if self.checkpoint.isLastStage('latency_balancing'):
+      return
 
-    logging.info(f'Creating compute wrappers...')
-    compute_wrapper_creater = CreateSlotWrapper(graph, top_rtl_parser, floorplan, global_router, rebalance, self.target)
-    compute_wrapper_creater.getSlotWrapperForAll(dir='wrapper_rtl')
+    with self.profiler.stage('wrapper_generation'):
+      logging.info(f'Creating compute wrappers...')
+      compute_wrapper_creater = CreateSlotWrapper(graph, top_rtl_parser, floorplan, global_router, rebalance, self.target, self.wrapper_jobs)
+      compute_wrapper_creater.getSlotWrapperForAll(dir='wrapper_rtl')
 
-    logging.info(f'Creating routing inclusive wrappers...')
-    routing_wrapper_creater = CreateRoutingSlotWrapper(compute_wrapper_creater, floorplan, global_router, top_rtl_parser, self.pipeline_style, self.anchor_plan)
-    routing_wrapper_creater.createRoutingInclusiveWrapperForAll(dir='wrapper_rtl')
+      logging.info(f'Creating routing inclusive wrappers...')
+      routing_wrapper_creater = CreateRoutingSlotWrapper(compute_wrapper_creater, floorplan, global_router, top_rtl_parser, self.pipeline_style, self.anchor_plan)
+      routing_wrapper_creater.createRoutingInclusiveWrapperForAll(dir='wrapper_rtl', jobs=self.wrapper_jobs)
 
-    logging.info(f'Creating ctrl inclusive wrappers...')
-    ctrl_wrapper_creater = CreateCtrlSlotWrapper(routing_wrapper_creater, floorplan, slot_manager)
-    ctrl_wrapper_creater.createCtrlInclusiveWrapperForAll(dir='wrapper_rtl')
+      logging.info(f'Creating ctrl inclusive wrappers...')
+      ctrl_wrapper_creater = CreateCtrlSlotWrapper(routing_wrapper_creater, floorplan, slot_manager)
+      ctrl_wrapper_creater.createCtrlInclusiveWrapperForAll(dir='wrapper_rtl', jobs=self.wrapper_jobs)
 
 
-    logging.info(f'Creating the new top RTL file...')
-    new_top_rtl = CreateTopRTLForCtrlWrappers(top_rtl_parser, ctrl_wrapper_creater, hls_prj_manager.getTopModuleName(), global_router, self.target)
-    
-    open(f'wrapper_rtl/{hls_prj_manager.getTopModuleName()}.v', 'w').write(new_top_rtl)
+      logging.info(f'Creating the new top RTL file...')
+      new_top_rtl_path = f'wrapper_rtl/{hls_prj_manager.getTopModuleName()}.v'
+      writeRTL(new_top_rtl_path, emitTopRTLForCtrlWrappers(top_rtl_parser, ctrl_wrapper_creater, hls_prj_manager.getTopModuleName(), global_router, self.target))
+
+    self.profiler.addCounters('wrapper_generation',
+      rtl_files=len(os.listdir('wrapper_rtl')),
+      rtl_bytes=sum(os.path.getsize(os.path.join('wrapper_rtl', f)) for f in os.listdir('wrapper_rtl')))
+    if self.checkpoint.isLastStage('wrapper_generation'):
+      return
       
-    logging.info(f'generating front end results...')
-    json_creater = CreateResultJson(
-                    floorplan, 
-                    ctrl_wrapper_creater, 
-                    global_router, 
-                    self.board, 
-                    hls_prj_manager, 
-                    slot_manager, 
-                    top_rtl_parser,
-                    new_top_rtl)
-    json_creater.createResultJson()
+    with self.profiler.stage('result_json'):
+      logging.info(f'generating front end results...')
+      json_creater = CreateResultJson(
+                      floorplan, 
+                      ctrl_wrapper_creater, 
+                      global_router, 
+                      self.board, 
+                      hls_prj_manager, 
+                      slot_manager, 
+                      top_rtl_parser,
+                      new_top_rtl_path)
+      json_creater.createResultJson()
+
+    self.profiler.addCounters('result_json', hub_bytes=os.path.getsize('front_end_result.json'))
 
   def basicSetup(self):
     # for designs with lots of modules, pyverilog may go very deep
@@ -118,11 +186,28 @@ class Manager:
     else:
       self.logging_level = "INFO"
 
+    if "GlobalRouting" in self.config:
+      self.global_routing_config = self.config["GlobalRouting"]
+    else:
+      self.global_routing_config = {}
+
     if "Target" in self.config:
       self.target = self.config["Target"]
     else:
       self.target = "hw"
 
+    # checkpointing is disabled if CheckpointDir is null
+    if "CheckpointDir" in self.config:
+      self.checkpoint_dir = self.config["CheckpointDir"]
+    else:
+      self.checkpoint_dir = "fe_checkpoint"
+
+    # number of worker processes to create the wrappers of the slots
+    if "WrapperJobs" in self.config:
+      self.wrapper_jobs = int(self.config["WrapperJobs"])
+    else:
+      self.wrapper_jobs = 1
+
     self.peregrine_home = os.getenv('PEREGRINE_HOME')
 
   def loggingSetup(self):
@@ -162,8 +247,55 @@ class Manager:
 
     return user_constraint_s2v
 
-  def runFloorplanning(self, graph, user_constraint_s2v, slot_manager, hls_prj_manager, max_search_time, grouping_hints, grouping_constraints):
-    floorplan = Floorplanner(
+  def getFloorplanInputHash(self, hls_prj_manager, grouping_constraints):
+    """
+    the floorplan depends on the HLS design and the floorplan related settings
+    """
+    inputs = {
+      'TopRTL': hashlib.sha256(open(hls_prj_manager.getTopRTLPath(), 'rb').read()).hexdigest(),
+      'TotalArea': hls_prj_manager.getTotalArea(),
+      'GroupingConstraints': grouping_constraints,
+      'Config': {key: self.config.get(key) for key in \
+        ['Board', 'TopName', 'AreaUtilizationRatio', 'FloorplanMethod', 'FloorplanPortfolio', 'Floorplan', 'ResultReuse']},
+    }
+    if "ResultReuse" in self.config:
+      inputs['ResultReuseFile'] = hashlib.sha256(open(self.config["ResultReuse"], 'rb').read()).hexdigest()
+    return StageCheckpoint.getInputHash(inputs)
+
+  def getSlotNameToVertexNameList(self, floorplan):
+    return {slot.getName(): [v.name for v in v_list] for slot, v_list in floorplan.getSlotToVertices().items()}
+
+  def createFloorplanFromSlotNames(self, graph, slot_manager, hls_prj_manager, slot_to_v_names, grouping_constraints):
+    """
+    build the floorplan from the given slot of each vertex instead of running a floorplan method.
+    The slot manager keeps only the given slots as the compute slots, the same as after a floorplan method
+    """
+    floorplan = self.createFloorplanner(graph, {}, slot_manager, hls_prj_manager,
+                                        max_search_time=0, grouping_hints=[], grouping_constraints=grouping_constraints)
+
+    s2v = {}
+    for region, v_name_group in slot_to_v_names.items():
+      assert v_name_group, f'incorrect empty slot: {region}'
+      s2v[slot_manager.createSlot(region)] = [graph.getVertex(v_name) for v_name in v_name_group]
+    v2s = {v: slot for slot, v_list in s2v.items() for v in v_list}
+    assert len(v2s) == len(graph.getAllVertices()), 'the saved floorplan does not cover all vertices'
+
+    for slot in list(slot_manager.getComputeSlots()):
+      if slot not in s2v:
+        slot_manager.removeSlotNonBlocking(slot.getName())
+
+    # a FIFO between two slots belongs to the slot of its consumer, the same as in Floorplanner
+    s2e = {}
+    for slot, v_list in s2v.items():
+      intra_edges, inter_edges = floorplan.getIntraAndInterEdges(v_list)
+      s2e[slot] = intra_edges + [e for e in inter_edges if v2s[e.dst] == slot]
+
+    floorplan.s2v, floorplan.v2s, floorplan.s2e = s2v, v2s, s2e
+    floorplan.printFloorplan()
+    return floorplan
+
+  def createFloorplanner(self, graph, user_constraint_s2v, slot_manager, hls_prj_manager, max_search_time, grouping_hints, grouping_constraints):
+    return Floorplanner(
       graph, 
       user_constraint_s2v,
       max_search_time=max_search_time,
@@ -173,25 +305,94 @@ class Manager:
       user_max_usage_ratio=self.config['AreaUtilizationRatio'],
       grouping_hints=grouping_hints,
       grouping_constraints=grouping_constraints)
-    
+
+  def applyFloorplanMethod(self, floorplan, choice):
+    if choice == 'NaiveFineGrainedFloorplan':
+      floorplan.naiveFineGrainedFloorplan()
+    elif choice == 'IterativeDivisionToHalfSLR':
+      floorplan.coarseGrainedFloorplan()
+    elif choice == 'PatternBasedFineGrainedFloorplan':
+      floorplan.patternBasedFineGrainedFloorplan()
+    elif choice == 'EightWayDivisionToHalfSLR':
+      floorplan.eightWayPartition()
+    elif choice == 'hetero4CRFloorplan':
+      floorplan.hetero4CRFloorplan()
+    elif choice == 'floorplanVHHvh':
+      floorplan.floorplanVHHvh()
+    else:
+      assert False, f'unsupported floorplan method: {choice}'
+
+  def getFloorplanCost(self, graph, floorplan):
+    """
+    compare floorplans first by the total width x distance of the FIFOs crossing slots,
+    then by the utilization of the most crowded slot
+    """
+    v2s = floorplan.getVertexToSlot()
+    wire_length = 0
+    for e in graph.getAllEdges():
+      src_slot, dst_slot = v2s[e.src], v2s[e.dst]
+      if src_slot != dst_slot:
+        dist = abs(src_slot.getPositionX() - dst_slot.getPositionX()) + abs(src_slot.getPositionY() - dst_slot.getPositionY())
+        wire_length += e.width * dist
+
+    max_util = max(max(util.values(), default=0) for util in floorplan.getUtilization().values())
+    return (wire_length, round(max_util, 4))
+
+  def runFloorplanPortfolio(self, graph, user_constraint_s2v, slot_manager, hls_prj_manager, max_search_time, grouping_hints, grouping_constraints):
+    """
+    run several floorplan methods in parallel processes within one time budget and return the best method
+    together with its slot name -> vertex names. The failed and unfinished methods are skipped
+    """
+    portfolio = self.config['FloorplanPortfolio']
+    methods = portfolio['Methods']
+    jobs = portfolio.get('Jobs', len(methods))
+    time_budget = portfolio.get('TimeBudget', 1800)
+    report_path = portfolio.get('Report', None)
+
+    def _runMethod(method):
+      try:
+        floorplan = self.createFloorplanner(graph, user_constraint_s2v, slot_manager, hls_prj_manager,
+                                            max_search_time, grouping_hints, grouping_constraints)
+        self.applyFloorplanMethod(floorplan, method)
+        return self.getSlotNameToVertexNameList(floorplan), self.getFloorplanCost(graph, floorplan)
+      except (Exception, SystemExit) as e:
+        logging.warning(f'floorplan method {method} fails: {e}')
+        return None
+
+    results = forkMapWithDeadline(_runMethod, methods, jobs, time_budget)
+
+    report = {}
+    best_method = None
+    for method, result in zip(methods, results):
+      if result is None:
+        report[method] = None
+        continue
+      _, cost = result
+      report[method] = {'WireLength': cost[0], 'MaxUtilization': cost[1]}
+      if best_method is None or cost < results[methods.index(best_method)][1]:
+        best_method = method
+    if report_path:
+      open(report_path, 'w').write(json.dumps(report, indent=2))
+
+    assert best_method is not None, f'all floorplan methods fail or time out: {methods}'
+    logging.info(f'floorplan method {best_method} is selected from the portfolio: {report}')
+    return best_method, results[methods.index(best_method)][0]
+
+  def runFloorplanning(self, graph, user_constraint_s2v, slot_manager, hls_prj_manager, max_search_time, grouping_hints, grouping_constraints):
     if 'FloorplanMethod' in self.config:
       choice = self.config['FloorplanMethod']
-      if choice == 'NaiveFineGrainedFloorplan':
-        floorplan.naiveFineGrainedFloorplan()
-      elif choice == 'IterativeDivisionToHalfSLR':
-        floorplan.coarseGrainedFloorplan()
-      elif choice == 'PatternBasedFineGrainedFloorplan':
-        floorplan.patternBasedFineGrainedFloorplan()
-      elif choice == 'EightWayDivisionToHalfSLR':
-        floorplan.eightWayPartition()
-      elif choice == 'hetero4CRFloorplan':
-        floorplan.hetero4CRFloorplan()
-      elif choice == 'floorplanVHHvh':
-        floorplan.floorplanVHHvh()
-      else:
-        assert False, f'unsupported floorplan method: {choice}'
     else:
-      floorplan.coarseGrainedFloorplan() # by default
+      choice = 'IterativeDivisionToHalfSLR' # by default
+
+    # the portfolio runs in the worker processes, only the result of the best method is rebuilt here
+    if 'FloorplanPortfolio' in self.config:
+      _, slot_to_v_names = self.runFloorplanPortfolio(graph, user_constraint_s2v, slot_manager, hls_prj_manager,
+                                                      max_search_time, grouping_hints, grouping_constraints)
+      return self.createFloorplanFromSlotNames(graph, slot_manager, hls_prj_manager, slot_to_v_names, grouping_constraints)
+
+    floorplan = self.createFloorplanner(graph, user_constraint_s2v, slot_manager, hls_prj_manager,
+                                        max_search_time, grouping_hints, grouping_constraints)
+    self.applyFloorplanMethod(floorplan, choice)
 
     return floorplan
 
@@ -202,7 +403,15 @@ class Manager:
       "HLSProjectPath" : "Absolute path to the post-csynth HLS project",
       "HLSSolutionName" : "Name of the solution of the HLS project",
       "FloorplanMethod" : "Choose between IterativeDivisionToFourCRs and IterativeDivisionToHalfSLR",
+      "FloorplanPortfolio (optional)" : {
+        "Methods" : "List of FloorplanMethod to run in parallel. The result with the least FIFO width x distance between slots is selected, then the one with the lower peak slot utilization",
+        "Jobs" : "Number of worker processes, the number of methods by default",
+        "TimeBudget" : "Wall-clock budget in seconds shared by all methods, 1800 by default. Unfinished methods are dropped",
+        "Report" : "Optional path to save the cost of each method"
+      },
       "AreaUtilizationRatio" : "Allowed resource usage in each slot",
+      "CheckpointDir (optional)" : "Where to save the outputs of each stage, fe_checkpoint by default. A stage is skipped if its inputs do not change. Use --from-stage and --to-stage to choose the stages to run: " + ', '.join(FE_STAGES) + ". Only " + ', '.join(FROM_STAGES) + " could be the start. Set to null or use --no-checkpoint to disable the checkpoints",
+      "WrapperJobs (optional)" : "Number of worker processes to create the slot wrappers in parallel, 1 by default. The output is the same as the serial mode",
       "Floorplan (optional)" : {
         "This is a comment" : "User could dictate the final location of given modules",
         "Region" : [
@@ -210,13 +419,40 @@ class Manager:
           "RTL module 2"
         ]
       },
-      "LoggingLevel (optional)": "Choose between DEBUG, INFO, WARNING, CRITICAL, ERROR"
+      "LoggingLevel (optional)": "Choose between DEBUG, INFO, WARNING, CRITICAL, ERROR",
+      "GlobalRouting (optional)": {
+        "Method": "Choose between ILP (default) and PathFinder. PathFinder is a fast heuristic router",
+        "PathFinderWarmStart": "Use the PathFinder result as the initial solution of the ILP router",
+        "AggregateCommodities": "Route FIFOs with the same source slot, destination slot and width together to reduce the ILP size",
+        "ElasticCapacity": "Find the minimal feasible routing usage limit in one model instead of retrying with larger limits",
+        "ColumnGeneration": "Generate the candidate paths of the ILP router on demand instead of enumerating all of them. Not compatible with ElasticCapacity",
+        "DetourPathLimit": "How much longer than the shortest path a routing path could be, 4 by default",
+        "RoutingUsageLimit": "The initial ratio of the wires of a boundary that could be used, 0.7 by default",
+        "MaxSeconds": "Time budget of each ILP solve. The best solution found is accepted if the budget runs out",
+        "MaxMipGap": "Stop each ILP solve once the relative gap to the bound is below this value",
+        "Threads": "Number of threads of the ILP solver",
+        "Emphasis": "Search emphasis of the ILP solver: DEFAULT, FEASIBILITY or OPTIMALITY",
+        "Report": "Optional path to save the status, gap and solve time of each ILP solve"
+      }
     }
     print(json.dumps(manual, indent=2))
 
 if __name__ == "__main__":
-  assert len(sys.argv) == 2, 'input the path to the configuration file'
-  m = Manager(sys.argv[1])
+  parser = argparse.ArgumentParser()
+  parser.add_argument("config_file_path", type=str, help="the path to the configuration file")
+  parser.add_argument("--from-stage", type=str, choices=FROM_STAGES, default=None,
+                      help="restore the earlier stages from the checkpoints and start from this stage")
+  parser.add_argument("--to-stage", type=str, choices=FE_STAGES, default=None,
+                      help="stop after this stage")
+  parser.add_argument("--no-checkpoint", action="store_true",
+                      help="do not save or restore the outputs of the stages")
+  parser.add_argument("--profile", action="store_true",
+                      help="save the runtime, peak memory and problem size of each stage to fe_profile.json")
+  parser.add_argument("--cprofile-dir", type=str, default=None,
+                      help="with --profile, also dump the cProfile stats of each stage to this directory")
+  args = parser.parse_args()
+
+  m = Manager(args.config_file_path, args.from_stage, args.to_stage, args.profile, args.cprofile_dir, not args.no_checkpoint)
     
 
 
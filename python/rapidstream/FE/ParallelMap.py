@@ -0,0 +1,63 @@
+import logging
+import multiprocessing
+import time
+from typing import Callable, List
+
+
+# the function to run in the worker processes, inherited through fork
+_worker_func = None
+
+
+def _callWorkerFunc(arg):
+  return _worker_func(arg)
+
+
+def forkMap(func: Callable, args: List, jobs: int = 1) -> List:
+  """
+  apply func to each arg in a pool of forked workers and return the results in the order of args.
+  The workers inherit func together with the objects it is bound to, e.g., the wrapper creaters,
+  thus only the args and the results are pickled. Any side effect of func in a worker is lost.
+  Run serially if jobs <= 1
+  """
+  global _worker_func
+
+  args = list(args)
+  if jobs <= 1 or len(args) <= 1:
+    return [func(arg) for arg in args]
+
+  logging.info(f'running {len(args)} jobs with {jobs} worker processes')
+  _worker_func = func
+  try:
+    with multiprocessing.get_context('fork').Pool(min(jobs, len(args))) as pool:
+      return pool.map(_callWorkerFunc, args, chunksize=1)
+  finally:
+    _worker_func = None
+
+
+def forkMapWithDeadline(func: Callable, args: List, jobs: int, timeout: float) -> List:
+  """
+  same as forkMap but all workers share one wall-clock budget of timeout seconds.
+  The result of a job that does not finish in time is None, and the unfinished workers are terminated.
+  Always run in the worker processes so that the budget could be enforced
+  """
+  global _worker_func
+
+  args = list(args)
+  logging.info(f'running {len(args)} jobs with {jobs} worker processes within {timeout} seconds')
+  _worker_func = func
+  try:
+    with multiprocessing.get_context('fork').Pool(max(1, min(jobs, len(args)))) as pool:
+      async_results = [pool.apply_async(_callWorkerFunc, (arg,)) for arg in args]
+
+      deadline = time.time() + timeout
+      results = []
+      for async_result in async_results:
+        try:
+          results.append(async_result.get(max(0, deadline - time.time())))
+        except multiprocessing.TimeoutError:
+          results.append(None)
+
+      # leaving the with block terminates the remaining workers
+      return results
+  finally:
+    _worker_func = None
@@ -0,0 +1,188 @@
+import logging
+from typing import List, Dict
+
+from autobridge.Opt.DataflowGraph import Edge, Vertex
+from autobridge.Opt.Slot import Slot
+from rapidstream.FE.ILPGlobalRouting import RoutingDevice, RoutingGraph, RoutingPath, ROUTING_USAGE_LIMIT_STEP
+
+# initial weight of the present congestion and how fast it grows in each iteration
+PRESENT_CONGESTION_FACTOR = 0.5
+PRESENT_CONGESTION_GROWTH = 1.5
+
+# how much the overflow of an iteration is remembered in the following iterations
+HISTORY_CONGESTION_FACTOR = 1.0
+
+# if the routing does not converge within the limit, relax the routing usage limit
+MAX_ITERATION_PER_USAGE_LIMIT = 30
+
+
+class PathFinderRouter:
+  def __init__(
+      self,
+      bridge_list: List[Edge],
+      v2s: Dict[Vertex, Slot],
+      util: Dict[Slot, Dict[str, float]],
+      routing_device: RoutingDevice = None
+  ) -> None:
+    """
+    negotiated congestion routing. Each bridge selects the cheapest candidate path,
+    where the cost of a path is its area cost (same as the ILP router) plus the congestion penalty of the boundaries.
+    Bridges passing overflowed boundaries are ripped up and re-routed with increasing penalty until no overflow
+    """
+    self.bridge_list = bridge_list
+    self.v2s = v2s
+    self.util = util
+    self.routing_device = routing_device
+
+    # the geometric paths between each pair of slots, shared by all routing graphs
+    self.path_cache = {}
+
+  def _getBridgeToCandidatePaths(self, routing_graph: RoutingGraph) -> Dict[Edge, List[RoutingPath]]:
+    bridge_to_paths = {}
+    for bridge in self.bridge_list:
+      src_slot_name = self.v2s[bridge.src].getRTLModuleName()
+      dst_slot_name = self.v2s[bridge.dst].getRTLModuleName()
+      bridge_to_paths[bridge] = routing_graph.findAllPaths(
+        src_slot_name, dst_slot_name, bridge.width, bridge.name
+      )
+    return bridge_to_paths
+
+  def _getCongestionCost(
+      self,
+      path: RoutingPath,
+      usage: List[int],
+      capacity: List[int],
+      history: List[float],
+      present_factor: float
+  ) -> float:
+    """
+    the penalty for the boundaries of the path, assuming the path is not yet routed
+    a unit penalty is comparable to passing through a fully utilized slot
+    """
+    penalty = 0
+    for routing_edge in path.edges:
+      e_id = routing_edge.edge_id
+      overflow = max(0, usage[e_id] + path.data_width - capacity[e_id])
+      penalty += history[e_id] + present_factor * overflow / capacity[e_id]
+    return penalty * path.data_width
+
+  def _routeBridge(
+      self,
+      bridge: Edge,
+      paths: List[RoutingPath],
+      path_to_base_cost: Dict[RoutingPath, float],
+      usage: List[int],
+      capacity: List[int],
+      history: List[float],
+      present_factor: float
+  ) -> RoutingPath:
+    """
+    select the cheapest path for the bridge and update the usage of the boundaries
+    """
+    selected = min(
+      paths,
+      key=lambda p: path_to_base_cost[p] + self._getCongestionCost(p, usage, capacity, history, present_factor)
+    )
+    for routing_edge in selected.edges:
+      usage[routing_edge.edge_id] += bridge.width
+    return selected
+
+  def _ripUp(self, path: RoutingPath, usage: List[int]) -> None:
+    for routing_edge in path.edges:
+      usage[routing_edge.edge_id] -= path.data_width
+
+  def _getOverflowedEdgeIds(self, usage: List[int], capacity: List[int]) -> List[int]:
+    return [e_id for e_id in range(len(usage)) if usage[e_id] > capacity[e_id]]
+
+  def _negotiatedCongestionRouting(
+      self,
+      bridge_to_paths: Dict[Edge, List[RoutingPath]],
+      capacity: List[int],
+      history: List[float],
+      bridge_to_selected_path: Dict[Edge, RoutingPath]
+  ) -> bool:
+    """
+    iterate until there is no overflow or the iteration limit is reached
+    bridge_to_selected_path and history are updated in place so that they carry over
+    when the usage limit is relaxed
+    """
+    path_to_base_cost = {p: p.getCost() for paths in bridge_to_paths.values() for p in paths}
+
+    # route the wide bridges first as they are the hardest to fit
+    bridges = sorted(bridge_to_paths.keys(), key=lambda b: (-b.width, b.name))
+
+    usage = [0] * len(capacity)
+    for bridge, path in bridge_to_selected_path.items():
+      for routing_edge in path.edges:
+        usage[routing_edge.edge_id] += bridge.width
+
+    present_factor = PRESENT_CONGESTION_FACTOR
+    for iteration in range(MAX_ITERATION_PER_USAGE_LIMIT):
+      # in the first pass route everything; afterwards only re-route the bridges that pass overflowed boundaries
+      if not bridge_to_selected_path:
+        targets = bridges
+      else:
+        overflowed = set(self._getOverflowedEdgeIds(usage, capacity))
+        targets = [b for b in bridges if any(e.edge_id in overflowed for e in bridge_to_selected_path[b].edges)]
+
+      for bridge in targets:
+        if bridge in bridge_to_selected_path:
+          self._ripUp(bridge_to_selected_path[bridge], usage)
+        bridge_to_selected_path[bridge] = self._routeBridge(
+          bridge, bridge_to_paths[bridge], path_to_base_cost, usage, capacity, history, present_factor
+        )
+
+      overflowed = self._getOverflowedEdgeIds(usage, capacity)
+      logging.info(f'PathFinder iteration {iteration}: re-routed {len(targets)} bridges, {len(overflowed)} boundaries overflowed')
+      if not overflowed:
+        return True
+
+      for e_id in overflowed:
+        history[e_id] += HISTORY_CONGESTION_FACTOR * (usage[e_id] - capacity[e_id]) / capacity[e_id]
+      present_factor *= PRESENT_CONGESTION_GROWTH
+
+    return False
+
+  def _getENameToPathsExcludeSrcAndDst(self, bridge_to_selected_path):
+    e_name_to_paths = {}
+    # exclude the source and destination to feed back to the outside world
+    for bridge, selected_path in bridge_to_selected_path.items():
+      e_name_to_paths[bridge.name] = selected_path.getSlotsOfPath()[1:-1]
+
+    return e_name_to_paths
+
+  def PathFinderRouting(
+      self,
+      routing_usage_limit: float = 0.7,
+      detour_path_limit: int = 4
+  ) -> Dict[str, List[Slot]]:
+    history = None
+    bridge_to_selected_path = {}
+
+    while 1:
+      logging.info(f'PathFinder global routing with routing usage limit {routing_usage_limit}')
+
+      routing_graph = RoutingGraph(self.util, routing_usage_limit, detour_path_limit, self.path_cache, self.routing_device)
+      bridge_to_paths = self._getBridgeToCandidatePaths(routing_graph)
+      capacity = [routing_edge.capacity for routing_edge in routing_graph.edges]
+      if history is None:
+        history = [0.0] * len(capacity)
+
+      # the paths of the previous attempt are views of the old graph
+      bridge_to_selected_path = {
+        bridge: next(p for p in bridge_to_paths[bridge] if p == path)
+          for bridge, path in bridge_to_selected_path.items()
+      }
+
+      if self._negotiatedCongestionRouting(bridge_to_paths, capacity, history, bridge_to_selected_path):
+        logging.warning(f'Succeeded: PathFinder global routing with routing usage limit {routing_usage_limit}')
+        break
+      else:
+        logging.warning(f'Failed: PathFinder global routing with routing usage limit {routing_usage_limit}')
+        routing_usage_limit += ROUTING_USAGE_LIMIT_STEP
+
+    for bridge, selected_path in bridge_to_selected_path.items():
+      if selected_path.getLength() > selected_path.getTheoreticalShortestLength():
+        logging.debug(f'{bridge.name} is not routed with the shortest paths')
+
+    return self._getENameToPathsExcludeSrcAndDst(bridge_to_selected_path)
@@ -0,0 +1,86 @@
+import re
+from typing import List
+
+
+class Port:
+  """
+  one IO port of a wrapper, shared by all wrapper creaters so that the direction, width and name
+  never need to be parsed back from the generated RTL.
+  width is the original text, e.g. '[31:0]', or '' for a 1-bit port.
+  msb and lsb are the integer bounds if the width is a constant range, otherwise None
+  """
+  __slots__ = ('dir', 'width', 'name', 'msb', 'lsb')
+
+  def __init__(self, dir: str, width: str, name: str) -> None:
+    self.dir = dir
+    self.width = width
+    self.name = name
+
+    if not width:
+      self.msb, self.lsb = 0, 0
+    else:
+      match = re.fullmatch(r'\[(\d+):(\d+)\]', width)
+      self.msb, self.lsb = (int(match.group(1)), int(match.group(2))) if match else (None, None)
+
+  @classmethod
+  def fromList(cls, io: List[str]) -> 'Port':
+    """
+    from the list format of the result json, i.e., [dir, width, name] or [dir, name]
+    """
+    if len(io) == 3:
+      return cls(io[0], io[1], io[2])
+    else:
+      return cls(io[0], '', io[1])
+
+  def toList(self) -> List[str]:
+    return [self.dir, self.width, self.name] if self.width else [self.dir, self.name]
+
+  def getIntegerWidth(self) -> int:
+    assert self.msb is not None, f'non-constant width {self.width} of {self.name}'
+    return self.msb - self.lsb + 1
+
+  def rename(self, name: str) -> 'Port':
+    return Port(self.dir, self.width, name)
+
+  def toDecl(self, type: str = None, suffix: str = '') -> str:
+    """
+    e.g. 'input [31:0] foo;'. If type is given, e.g. 'wire', it replaces the direction
+    """
+    head = type if type else self.dir
+    return f'{head} {self.width} {self.name}{suffix};' if self.width else f'{head} {self.name}{suffix};'
+
+  def toANSIDecl(self) -> str:
+    """
+    e.g. 'input [31:0] foo' as an item in an ANSI style module header
+    """
+    return f'{self.dir} {self.width} {self.name}' if self.width else f'{self.dir} {self.name}'
+
+
+def getANSIHeaderItems(ports: List[Port], indent: str = '') -> List[str]:
+  """
+  the IO section of an ANSI style module header, separated by commas
+  """
+  items = [f'{indent}{p.toANSIDecl()},' for p in ports]
+  if items:
+    items[-1] = items[-1][:-1]
+  return items
+
+
+def getHeaderNames(ports: List[Port], indent: str = '') -> List[str]:
+  """
+  the port list of a non-ANSI style module header, e.g. module foo (a, b, c);
+  """
+  items = [f'{indent}{p.name},' for p in ports]
+  if items:
+    items[-1] = items[-1][:-1]
+  return items
+
+
+def getInstPortMap(ports: List[Port], indent: str = '') -> List[str]:
+  """
+  connect each port to the wire with the same name in an instantiation
+  """
+  items = [f'{indent}.{p.name}({p.name}),' for p in ports]
+  if items:
+    items[-1] = items[-1][:-1]
+  return items
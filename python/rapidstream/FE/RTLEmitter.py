@@ -0,0 +1,75 @@
+import hashlib
+from typing import Iterable
+
+
+# size of the write buffer and of the chunks when copying another RTL file
+BUFFER_SIZE = 1 << 20
+
+
+class RTLWriter:
+  """
+  write the RTL to a buffered file as it is produced instead of materializing the whole module.
+  Lines are separated by newlines as in '\n'.join(lines). The sha256 of the content is computed on the fly,
+  thus the caller only keeps the path and the digest
+  """
+
+  def __init__(self, path: str) -> None:
+    self.path = path
+    self.file = open(path, 'w', buffering=BUFFER_SIZE)
+    self.sha256 = hashlib.sha256()
+    self.is_empty = True
+
+  def __enter__(self) -> 'RTLWriter':
+    return self
+
+  def __exit__(self, *args) -> None:
+    self.close()
+
+  def _write(self, text: str) -> None:
+    self.file.write(text)
+    self.sha256.update(text.encode())
+
+  def writeLines(self, lines: Iterable[str]) -> None:
+    for line in lines:
+      if not self.is_empty:
+        self._write('\n')
+      self._write(line)
+      self.is_empty = False
+
+  def appendFile(self, path: str) -> None:
+    """
+    append the content of another RTL file as if its lines were passed to writeLines.
+    An empty file counts as one empty line
+    """
+    with open(path, 'r') as f:
+      if not self.is_empty:
+        self._write('\n')
+      for chunk in iter(lambda: f.read(BUFFER_SIZE), ''):
+        self._write(chunk)
+    self.is_empty = False
+
+  def getDigest(self) -> str:
+    return self.sha256.hexdigest()
+
+  def close(self) -> str:
+    if not self.file.closed:
+      self.file.close()
+    return self.getDigest()
+
+
+def writeRTL(path: str, lines: Iterable[str]) -> str:
+  """
+  stream the lines to the file and return the sha256 of the content
+  """
+  with RTLWriter(path) as writer:
+    writer.writeLines(lines)
+  return writer.getDigest()
+
+
+def copyRTL(src_path: str, dst_path: str) -> str:
+  """
+  copy an RTL file in chunks and return the sha256 of the content
+  """
+  with RTLWriter(dst_path) as writer:
+    writer.appendFile(src_path)
+  return writer.getDigest()
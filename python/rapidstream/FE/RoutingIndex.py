@@ -0,0 +1,100 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+OPPOSITE_DIRECTION = {'UP': 'DOWN', 'DOWN': 'UP', 'LEFT': 'RIGHT', 'RIGHT': 'LEFT'}
+
+
+class RoutingIndex:
+  """
+  lookup tables of the global routing results, built once after routing:
+    - edge -> slot -> index of the slot in the path. The path excludes the src and dst slots
+    - slot -> names of the edges passing through the slot
+    - slot -> direction and in or out (e.g., UP_OUT) -> names of the edges
+  In memory the slots are Slot objects. In JSON they are the RTL module names of the slots,
+  thus an index loaded from JSON should be queried with slot names
+  """
+
+  def __init__(self) -> None:
+    self.e_name_to_slot_to_index = {}
+    self.slot_to_e_names = {}
+    self.slot_to_dir_to_e_names = defaultdict(lambda: defaultdict(list))
+
+  @staticmethod
+  def getDirection(prev, curr) -> str:
+    """
+    the direction to go from prev to an adjacent slot curr
+    """
+    if curr.down_left_x == prev.down_left_x:
+      assert curr.down_left_y != prev.down_left_y
+      return 'UP' if curr.down_left_y > prev.down_left_y else 'DOWN'
+    else:
+      assert curr.down_left_y == prev.down_left_y
+      return 'RIGHT' if curr.down_left_x > prev.down_left_x else 'LEFT'
+
+  @classmethod
+  def fromRoutingResults(cls, e_name2path: Dict, bridges: List[Tuple]) -> 'RoutingIndex':
+    """
+    e_name2path maps each edge to the slots passed, excluding the src and dst slots
+    bridges are (edge name, src slot, dst slot) in the order to be indexed
+    """
+    index = cls()
+
+    for e_name, path in e_name2path.items():
+      index.e_name_to_slot_to_index[e_name] = {slot: i for i, slot in enumerate(path)}
+      for slot in path:
+        index.slot_to_e_names.setdefault(slot, []).append(e_name)
+
+    for e_name, src_slot, dst_slot in bridges:
+      # ignore intra slot edges
+      if src_slot == dst_slot:
+        continue
+
+      prev = src_slot
+      for slot in e_name2path[e_name] + [dst_slot]:
+        dir = cls.getDirection(prev, slot)
+        index.slot_to_dir_to_e_names[slot][f'{OPPOSITE_DIRECTION[dir]}_IN'].append(e_name)
+        index.slot_to_dir_to_e_names[prev][f'{dir}_OUT'].append(e_name)
+        prev = slot
+
+    return index
+
+  def getIndexOfSlotInPath(self, e_name: str, slot) -> int:
+    return self.e_name_to_slot_to_index[e_name][slot]
+
+  def getPassingEdgeNamesOfSlot(self, slot) -> List[str]:
+    return self.slot_to_e_names.get(slot, [])
+
+  def getSlotToDirToEdgeNames(self) -> Dict:
+    return self.slot_to_dir_to_e_names
+
+  def toDict(self) -> Dict:
+    """
+    the JSON format, slots are represented by the RTL module names
+    """
+    return {
+      'EdgeToSlotToIndex': {
+        e_name: {slot.getRTLModuleName(): i for slot, i in slot_to_index.items()}
+          for e_name, slot_to_index in self.e_name_to_slot_to_index.items()
+      },
+      'SlotToEdges': {
+        slot.getRTLModuleName(): e_names for slot, e_names in self.slot_to_e_names.items()
+      },
+      'SlotToDirToEdges': {
+        slot.getRTLModuleName(): dict(dir_to_e_names)
+          for slot, dir_to_e_names in self.slot_to_dir_to_e_names.items()
+      },
+    }
+
+  @classmethod
+  def fromDict(cls, index_dict: Dict) -> 'RoutingIndex':
+    """
+    load the index from the JSON format. The slots are represented by the RTL module names
+    """
+    index = cls()
+    index.e_name_to_slot_to_index = index_dict['EdgeToSlotToIndex']
+    index.slot_to_e_names = index_dict['SlotToEdges']
+    for slot_name, dir_to_e_names in index_dict['SlotToDirToEdges'].items():
+      for dir, e_names in dir_to_e_names.items():
+        index.slot_to_dir_to_e_names[slot_name][dir] = e_names
+    return index
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+
+# the stages of the front end in the order of execution
+FE_STAGES = ['floorplan', 'global_routing', 'latency_balancing', 'wrapper_generation', 'result_json']
+
+# only floorplan and global_routing save their outputs, thus the flow could only start from the stages after them
+FROM_STAGES = FE_STAGES[:3]
+
+
+class StageCheckpoint:
+  """
+  persist the outputs of a stage together with the hash of its inputs.
+  A stage is skipped if its checkpoint matches the current inputs.
+  With from_stage, the checkpoints of all earlier stages must be reused even if the inputs have changed.
+  With to_stage, the flow stops after that stage.
+  If checkpoint_dir is None, nothing is saved or restored
+  """
+
+  def __init__(self, checkpoint_dir: Optional[str] = 'fe_checkpoint', from_stage: str = None, to_stage: str = None) -> None:
+    assert from_stage is None or from_stage in FROM_STAGES, \
+      f'cannot start from stage {from_stage}, choose from {FROM_STAGES}'
+    assert to_stage is None or to_stage in FE_STAGES, f'unknown stage {to_stage}, choose from {FE_STAGES}'
+    assert checkpoint_dir or not from_stage, f'cannot start from stage {from_stage} without the checkpoints'
+
+    self.checkpoint_dir = checkpoint_dir
+    self.from_idx = FE_STAGES.index(from_stage) if from_stage else 0
+    self.to_idx = FE_STAGES.index(to_stage) if to_stage else len(FE_STAGES) - 1
+    assert self.from_idx <= self.to_idx, f'{from_stage} is after {to_stage}'
+
+    if self.isEnabled():
+      os.makedirs(checkpoint_dir, exist_ok=True)
+
+  def isEnabled(self) -> bool:
+    return bool(self.checkpoint_dir)
+
+  @staticmethod
+  def getInputHash(inputs: Dict) -> str:
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+  def _getPath(self, stage: str) -> str:
+    return os.path.join(self.checkpoint_dir, f'{stage}.json')
+
+  def mustReuse(self, stage: str) -> bool:
+    """
+    the stages before from_stage are not re-executed
+    """
+    return FE_STAGES.index(stage) < self.from_idx
+
+  def isLastStage(self, stage: str) -> bool:
+    return FE_STAGES.index(stage) == self.to_idx
+
+  def load(self, stage: str, input_hash: str) -> Optional[Dict]:
+    """
+    return the saved outputs if the inputs match, or if the stage must be reused. Otherwise return None
+    """
+    if not self.isEnabled():
+      return None
+
+    path = self._getPath(stage)
+    if not os.path.isfile(path):
+      assert not self.mustReuse(stage), f'no checkpoint of stage {stage} in {self.checkpoint_dir}'
+      return None
+
+    checkpoint = json.loads(open(path, 'r').read())
+    if checkpoint['InputHash'] == input_hash:
+      logging.info(f'stage {stage} is unchanged, reuse the checkpoint {path}')
+      return checkpoint['Outputs']
+    elif self.mustReuse(stage):
+      logging.warning(f'the inputs of stage {stage} have changed, still reuse the checkpoint {path}')
+      return checkpoint['Outputs']
+    else:
+      logging.info(f'the inputs of stage {stage} have changed, re-run the stage')
+      return None
+
+  def save(self, stage: str, input_hash: str, outputs: Dict) -> None:
+    if not self.isEnabled():
+      return
+
+    checkpoint = {'InputHash': input_hash, 'Outputs': outputs}
+    open(self._getPath(stage), 'w').write(json.dumps(checkpoint, indent=2))
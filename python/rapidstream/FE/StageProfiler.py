@@ -0,0 +1,89 @@
+import cProfile
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+def _getPeakRSSInMB(who: int = resource.RUSAGE_SELF) -> float:
+  """
+  ru_maxrss is in KB on Linux and in bytes on macOS
+  """
+  peak = resource.getrusage(who).ru_maxrss
+  if sys.platform == 'darwin':
+    return peak / 1024 / 1024
+  return peak / 1024
+
+
+def _getChildrenCPUTime() -> float:
+  """
+  the user + system time of all terminated and waited-for child processes
+  """
+  usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+  return usage.ru_utime + usage.ru_stime
+
+
+class StageProfiler:
+  """
+  record the wall time, the cpu time, the peak RSS and the problem size of each FE stage.
+  The peak RSS is of the whole process so far, thus it never decreases in later stages.
+  The cpu time includes the worker processes that finish within the stage, e.g., WrapperJobs and
+  the floorplan portfolio. The peak RSS of the largest worker so far is recorded separately.
+  If cprofile_dir is given, the cProfile stats of each stage are dumped to <cprofile_dir>/<stage>.prof
+  and could be viewed by pstats or snakeviz
+  """
+
+  def __init__(self, enabled: bool = True, cprofile_dir: str = None) -> None:
+    self.enabled = enabled
+    self.cprofile_dir = cprofile_dir
+    self.stage_to_record = {}
+
+    if enabled and cprofile_dir:
+      os.makedirs(cprofile_dir, exist_ok=True)
+
+  @contextmanager
+  def stage(self, stage: str):
+    if not self.enabled:
+      yield
+      return
+
+    profiler = cProfile.Profile() if self.cprofile_dir else None
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time() + _getChildrenCPUTime()
+    if profiler:
+      profiler.enable()
+
+    try:
+      yield
+    finally:
+      if profiler:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(self.cprofile_dir, f'{stage}.prof'))
+
+      record = self.stage_to_record.setdefault(stage, {'Counters': {}})
+      record['WallTime'] = round(time.perf_counter() - wall_start, 3)
+      record['CPUTime'] = round(time.process_time() + _getChildrenCPUTime() - cpu_start, 3)
+      record['PeakRSS(MB)'] = round(_getPeakRSSInMB(), 1)
+      record['ChildrenPeakRSS(MB)'] = round(_getPeakRSSInMB(resource.RUSAGE_CHILDREN), 1)
+      logging.info(f'stage {stage} takes {record["WallTime"]} seconds, peak RSS {record["PeakRSS(MB)"]} MB, '
+                   f'peak RSS of the workers {record["ChildrenPeakRSS(MB)"]} MB')
+
+  def addCounters(self, stage: str, **counters) -> None:
+    """
+    record the problem size of a stage, e.g., the number of vertices
+    """
+    if not self.enabled:
+      return
+    self.stage_to_record.setdefault(stage, {'Counters': {}})['Counters'].update(counters)
+
+  def getProfile(self) -> Dict:
+    return self.stage_to_record
+
+  def save(self, file: str = 'fe_profile.json') -> None:
+    if not self.enabled:
+      return
+    open(file, 'w').write(json.dumps(self.stage_to_record, indent=2))
@@ -0,0 +1,92 @@
+from typing import Callable, Dict, List
+
+from rapidstream.FE.PortRecord import Port
+from rapidstream.FE.RoutingIndex import RoutingIndex
+
+
+class WireIndex:
+  """
+  index of the wires connecting two adjacent slot wrappers, built once from the IOs of the wrappers:
+    wire -> the slot that drives it, the slot that receives it, the direction from the driver to the receiver, the width
+  A connecting wire has the same name on both sides, i.e., it is an output of exactly one slot and an input of exactly one slot.
+  is_connecting_wire filters out the ports that are not point to point, e.g., top-level IOs
+  """
+
+  def __init__(self, slot_to_ports: Dict, is_connecting_wire: Callable[[Port], bool]) -> None:
+    self.name_to_driver = {}
+    self.name_to_receiver = {}
+    self.name_to_width = {}
+
+    for slot, ports in slot_to_ports.items():
+      for p in ports:
+        if not is_connecting_wire(p):
+          continue
+
+        if p.dir == 'output':
+          assert p.name not in self.name_to_driver, f'{p.name} is driven by multiple slots'
+          self.name_to_driver[p.name] = slot
+        elif p.dir == 'input':
+          assert p.name not in self.name_to_receiver, f'{p.name} is received by multiple slots'
+          self.name_to_receiver[p.name] = slot
+        else:
+          assert False, f'unsupported direction {p.dir} of {p.name}'
+
+        self.name_to_width[p.name] = p.width
+
+    for name in self.name_to_width:
+      assert name in self.name_to_driver and name in self.name_to_receiver, f'{name} is not connected to two slots'
+
+  def getNames(self) -> List[str]:
+    return list(self.name_to_width.keys())
+
+  def getDriver(self, name: str):
+    return self.name_to_driver[name]
+
+  def getReceiver(self, name: str):
+    return self.name_to_receiver[name]
+
+  def getPeerSlot(self, name: str, slot):
+    """
+    the slot at the other end of the wire
+    """
+    if self.name_to_driver[name] == slot:
+      return self.name_to_receiver[name]
+    else:
+      assert self.name_to_receiver[name] == slot
+      return self.name_to_driver[name]
+
+  def getDirection(self, name: str) -> str:
+    """
+    the direction from the driver to the receiver
+    """
+    return RoutingIndex.getDirection(self.name_to_driver[name], self.name_to_receiver[name])
+
+  def getBoundaryOfSlot(self, name: str, slot) -> str:
+    """
+    the boundary of the given slot that the wire crosses, i.e., the direction from the slot to the peer slot
+    """
+    return RoutingIndex.getDirection(slot, self.getPeerSlot(name, slot))
+
+  def isConnectingWire(self, name: str) -> bool:
+    return name in self.name_to_width
+
+  def getPortOfSlot(self, name: str, slot) -> Port:
+    """
+    the wire as an IO of the given slot
+    """
+    dir = 'output' if self.name_to_driver[name] == slot else 'input'
+    return Port(dir, self.name_to_width[name], name)
+
+  def getSlotToBoundaryToWires(self) -> Dict:
+    """
+    slot -> direction of the neighbor -> names of the wires between the slot and the neighbor,
+    including both the inbound and the outbound wires
+    """
+    slot_to_dir_to_names = {}
+    for name, driver in self.name_to_driver.items():
+      receiver = self.name_to_receiver[name]
+      dir_from_driver = RoutingIndex.getDirection(driver, receiver)
+      dir_from_receiver = RoutingIndex.getDirection(receiver, driver)
+      slot_to_dir_to_names.setdefault(driver, {}).setdefault(dir_from_driver, []).append(name)
+      slot_to_dir_to_names.setdefault(receiver, {}).setdefault(dir_from_receiver, []).append(name)
+    return slot_to_dir_to_names
@@ -23,23 +23,29 @@ def get_group_inner_wire_name_to_width(
   return inner_wire_name_to_width
 
 
-def get_group_port_width_map(
+def get_group_port_maps(
   config: Dict,
   vertex_props: Dict,
-) -> Dict[str, str]:
-  """Must be executed before get_group_port_wire_map"""
+) -> Tuple[Dict[str, str], Dict]:
+  """The port-width map (text) and the port-range map (integers) in one pass
+     Must be executed before get_group_port_wire_map
+  """
   port_width_map = {}
+  port_range_map = {}
+
+  def _add(argname: str, portname: str) -> None:
+    port_width_map[argname] = vertex_props['port_width_map'][portname]
+    port_range_map[argname] = vertex_props['port_range_map'][portname]
 
   # axi ports
   for portname, argname in vertex_props['port_wire_map']['axi_ports'].items():
-    width = vertex_props['port_width_map'][portname]
-    port_width_map[argname] = width
+    _add(argname, portname)
 
   # outbound stream ports
   for stream in vertex_props['outbound_streams']:
     for portname, argname in vertex_props['port_wire_map']['stream_ports'][stream].items():
       if portname.endswith(('_dout', '_din')):
-        port_width_map[argname] = vertex_props['port_width_map'][portname]
+        _add(argname, portname)
 
   # inbound stream ports
   for stream in vertex_props['inbound_streams']:
@@ -49,13 +55,21 @@ def get_group_port_width_map(
     for portname, wirename in inbound_side_wires.items():
       if portname.endswith(('_dout', '_din')):
         port_width_map[wirename] = f'[{stream_width_int-1}:0]'
+        port_range_map[wirename] = [stream_width_int - 1, 0]
 
   # constant ports
   for portname, argname in vertex_props['port_wire_map']['constant_ports'].items():
-    width =  vertex_props['port_width_map'][portname]
-    port_width_map[argname] = width
+    _add(argname, portname)
+
+  return port_width_map, port_range_map
+
 
-  return port_width_map
+def get_group_port_width_map(
+  config: Dict,
+  vertex_props: Dict,
+) -> Dict[str, str]:
+  """Must be executed before get_group_port_wire_map"""
+  return get_group_port_maps(config, vertex_props)[0]
 
 
 def get_group_port_wire_map(
@@ -120,9 +134,12 @@ def get_group_vertex_props(
 
   # get inner wires, i.e., the interface wires of all inner streams
   group_props['wire_decl'] = get_group_inner_wire_name_to_width(group_props['sub_streams'], config)
+  group_props['wire_range'] = {name: config['wire_range'][name] for name in group_props['wire_decl']}
 
   # get the new port/wire map for the group vertex
-  group_props['port_width_map'] = get_group_port_width_map(config, config['vertices'][target_vertex])
+  group_props['port_width_map'], group_props['port_range_map'] = get_group_port_maps(
+    config, config['vertices'][target_vertex]
+  )
   group_props['port_wire_map'] = get_group_port_wire_map(config, config['vertices'][target_vertex])
 
   return group_props
@@ -157,5 +174,6 @@ def group_inbound_streams(
     for wire in props['port_wire_map']['outbound'].values():
       target_wires[wire] = config['wire_decl'][wire]
       config['wire_decl'].pop(wire)
+      config['wire_range'].pop(wire)
 
   return
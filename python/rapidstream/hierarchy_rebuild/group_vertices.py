@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from itertools import chain
 
 from rapidstream.const import RESOURCE_TYPES
@@ -41,6 +41,37 @@ def get_group_internal_and_external_streams(
   return internal_streams, external_streams
 
 
+def get_batch_internal_and_external_streams(
+  config: Dict, group_name_to_instances: Dict[str, List[str]]
+) -> Dict[str, Tuple[List[str], List[str]]]:
+  """The internal & external streams of each grouped vertex in one pass over the edges
+     The groups must be disjoint. The streams of each group are in the same order
+     as get_group_internal_and_external_streams
+  """
+  inst_to_group = {
+    inst: group_name
+      for group_name, instances in group_name_to_instances.items()
+        for inst in instances
+  }
+  group_to_streams = {
+    group_name: ([], []) for group_name in group_name_to_instances
+  }
+
+  for e, props in config['edges'].items():
+    src_group = inst_to_group.get(props['produced_by'])
+    dst_group = inst_to_group.get(props['consumed_by'])
+
+    if src_group is not None and src_group == dst_group:
+      group_to_streams[src_group][0].append(e)
+    else:
+      if src_group is not None:
+        group_to_streams[src_group][1].append(e)
+      if dst_group is not None:
+        group_to_streams[dst_group][1].append(e)
+
+  return group_to_streams
+
+
 def get_group_io_streams(
   external_streams: List[str],
   inst_name_to_props: Dict,
@@ -79,42 +110,59 @@ def get_group_inner_wire_name_to_width(
   return inner_wire_name_to_width
 
 
-def get_group_port_width_map(
+def get_group_port_maps(
   inst_name_to_props: Dict,
   external_streams: List[str],
-) -> Dict[str, str]:
-  """When we create a wrapper around some vertices
-     We need to update the port-width map
-     New ports will be created and named after the wires on the wrapper module
-     This function must runs before get_group_port_wire_map
+) -> Tuple[Dict[str, str], Dict]:
+  """The port-width map (text) and the port-range map (integers) in one pass
+     The widths are compared by the integer ranges, or by the text if not constant
   """
   port_width_map = {}
+  port_range_map = {}
+
+  def _add(argname: str, props: Dict, portname: str) -> None:
+    port_width_map[argname] = props['port_width_map'][portname]
+    port_range_map[argname] = props['port_range_map'][portname]
+
+  def _get_width_key(width: str, range: Optional[List[int]]):
+    return range if range is not None else width
 
   for inst, props in inst_name_to_props.items():
     for portname, argname in props['port_wire_map']['axi_ports'].items():
-      width = props['port_width_map'][portname]
+      width_key = _get_width_key(props['port_width_map'][portname], props['port_range_map'][portname])
 
       # safety check
-      if argname in port_width_map and port_width_map[argname] != width:
+      if argname in port_width_map and \
+          _get_width_key(port_width_map[argname], port_range_map[argname]) != width_key:
         _logger.error('overriding the width for the new port %s', argname)
         exit(1)
 
-      port_width_map[argname] = width
+      _add(argname, props, portname)
 
   for inst, props in inst_name_to_props.items():
     for stream, ports in props['port_wire_map']['stream_ports'].items():
       if stream in external_streams:
         for portname, argname in ports.items():
           if portname.endswith(('_dout', '_din')):
-            width = props['port_width_map'][portname]
-            port_width_map[argname] = width
+            _add(argname, props, portname)
 
   for inst, props in inst_name_to_props.items():
     for portname, argname in props['port_wire_map']['constant_ports'].items():
-      width = props['port_width_map'][portname]
-      port_width_map[argname] = width
+      _add(argname, props, portname)
+
+  return port_width_map, port_range_map
 
-  return port_width_map
+
+def get_group_port_width_map(
+  inst_name_to_props: Dict,
+  external_streams: List[str],
+) -> Dict[str, str]:
+  """When we create a wrapper around some vertices
+     We need to update the port-width map
+     New ports will be created and named after the wires on the wrapper module
+     This function must runs before get_group_port_wire_map
+  """
+  return get_group_port_maps(inst_name_to_props, external_streams)[0]
 
 
 def get_group_port_wire_map(
@@ -202,9 +250,12 @@ def get_group_vertex_props(
 
   # get inner wires, i.e., the interface wires of all inner streams
   group_props['wire_decl'] = get_group_inner_wire_name_to_width(internal_streams, config)
+  group_props['wire_range'] = {name: config['wire_range'][name] for name in group_props['wire_decl']}
 
   # get the new port/wire map for the group vertex
-  group_props['port_width_map'] = get_group_port_width_map(inst_name_to_props, external_streams)
+  group_props['port_width_map'], group_props['port_range_map'] = get_group_port_maps(
+    inst_name_to_props, external_streams
+  )
   group_props['port_wire_map'] = get_group_port_wire_map(inst_name_to_props, external_streams)
 
   return group_props
@@ -238,6 +289,7 @@ def group_vertices(
   inner_wires = get_group_inner_wire_name_to_width(internal_streams, config)
   for w in inner_wires.keys():
     config['wire_decl'].pop(w)
+    config['wire_range'].pop(w)
 
   # remove the vertices to be grouped
   config['vertices'] = {
@@ -251,3 +303,79 @@ def group_vertices(
   }
 
   return
+
+
+def can_be_batched(
+  config: Dict,
+  group_name_to_instances: Dict[str, List[str]],
+) -> bool:
+  """Groups can be created at once only if they do not depend on each other,
+     i.e., every instance is an existing vertex that belongs to only one group,
+     and no group name clashes with an existing vertex
+  """
+  all_instances = list(chain(*group_name_to_instances.values()))
+  if len(all_instances) != len(set(all_instances)):
+    return False
+  if any(inst not in config['vertices'] for inst in all_instances):
+    return False
+  return not any(name in config['vertices'] for name in group_name_to_instances)
+
+
+def group_vertices_batch(
+  config: Dict,
+  group_name_to_instances: Dict[str, List[str]],
+) -> None:
+  """Update the config to group each list of vertices into one vertex
+     The result is the same as calling group_vertices for each group in order,
+     but the edges are scanned once and the config is rebuilt once
+  """
+  if not can_be_batched(config, group_name_to_instances):
+    _logger.info('the groups depend on each other, group them one by one')
+    for group_name, instances in group_name_to_instances.items():
+      group_vertices(config, instances, group_name)
+    return
+
+  group_name_to_inst_props = {}
+  for group_name, instances in group_name_to_instances.items():
+    if not instances:
+      _logger.warning('No instances to group')
+      continue
+
+    # get the properties of the vertices to be grouped
+    inst_name_to_props = {name: config['vertices'][name] for name in instances}
+    check_can_be_grouped(inst_name_to_props)
+    group_name_to_inst_props[group_name] = inst_name_to_props
+
+  group_to_streams = get_batch_internal_and_external_streams(
+    config, {group_name: list(props) for group_name, props in group_name_to_inst_props.items()}
+  )
+
+  # build all group vertices before the config is updated
+  group_name_to_group_props = {}
+  all_inner_wires = []
+  all_internal_streams = set()
+  for group_name, inst_name_to_props in group_name_to_inst_props.items():
+    internal_streams, external_streams = group_to_streams[group_name]
+    group_name_to_group_props[group_name] = get_group_vertex_props(
+      config, inst_name_to_props, internal_streams, external_streams
+    )
+    all_inner_wires += group_name_to_group_props[group_name]['wire_decl'].keys()
+    all_internal_streams.update(internal_streams)
+
+  # remove the inner wires from the external wire list, each wire only once
+  for w in dict.fromkeys(all_inner_wires):
+    config['wire_decl'].pop(w)
+    config['wire_range'].pop(w)
+
+  # remove the grouped vertices and append the group vertices in order
+  all_instances = set(chain(*group_name_to_inst_props.values()))
+  config['vertices'] = {
+    name: props for name, props in config['vertices'].items()
+      if name not in all_instances
+  }
+  config['vertices'].update(group_name_to_group_props)
+
+  # remove the internal streams of all groups
+  config['edges'] = {e: props for e, props in config['edges'].items()
+    if e not in all_internal_streams
+  }
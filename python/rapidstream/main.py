@@ -1,10 +1,10 @@
 import click
 import json
-from pyverilog.vparser.parser import parse
 
 from rapidstream.hierarchy_rebuild.group_vertices import group_vertices
 from rapidstream.hierarchy_rebuild.group_inbound_streams import group_inbound_streams
-from rapidstream.parser.tapa_parser import parse_tapa_output_rtl
+from rapidstream.parser import parse_cache
+from rapidstream.parser.tapa_parser import parse_tapa_output_rtl_file
 from rapidstream.util import setup_logging
 
 @click.command()
@@ -18,18 +18,41 @@ from rapidstream.util import setup_logging
   required=True,
   help='Path to the configuration file generated by AutoBridge.'
 )
+@click.option(
+  '--parse-cache-dir',
+  default='.rapidstream_parse_cache',
+  help='Directory to cache the info extracted from the top RTL across runs.'
+)
+@click.option(
+  '--no-parse-cache',
+  is_flag=True,
+  help='Always parse the top RTL, without reading or writing the cache.'
+)
+@click.option(
+  '--clear-parse-cache',
+  is_flag=True,
+  help='Remove all cached parse results before running.'
+)
 def main(
   top_rtl_path: str,
   post_floorplan_config_path: str,
+  parse_cache_dir: str,
+  no_parse_cache: bool,
+  clear_parse_cache: bool,
 ):
   """Entry point for RapidStream that targets TAPA"""
 
   setup_logging()
 
-  config = json.load(open(post_floorplan_config_path, 'r'))
-  ast_root, directives = parse([top_rtl_path])
+  if clear_parse_cache:
+    parse_cache.clear_parse_cache(parse_cache_dir)
 
-  parse_tapa_output_rtl(config, ast_root)
+  config = json.load(open(post_floorplan_config_path, 'r'))
+  parse_tapa_output_rtl_file(
+    config,
+    top_rtl_path,
+    cache_dir=None if no_parse_cache else parse_cache_dir,
+  )
 
   group_vertices(config, ['TASK_VERTEX_Add_0', 'TASK_VERTEX_Mmap2Stream_1'], 'CR_X4Y4_To_CR_X7Y7')
 
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+import pyverilog.vparser.ast as ast
+
+_logger = logging.getLogger().getChild(__name__)
+
+# An on-disk cache of the info extracted from a top RTL, i.e., the declarations
+# and the port connections of each instance. The file name is made of the
+# content hash of the RTL and the parser version, thus a changed RTL or a
+# changed parser never hits a stale entry.
+
+_CHUNK_SIZE = 1 << 20
+
+
+def get_cache_key(rtl_path: str, parser_version: int) -> str:
+  sha256 = hashlib.sha256()
+  with open(rtl_path, 'rb') as f:
+    for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+      sha256.update(chunk)
+  return f'{sha256.hexdigest()}_v{parser_version}'
+
+
+def _get_cache_path(cache_dir: str, key: str) -> str:
+  return os.path.join(cache_dir, f'{key}.json')
+
+
+def _serialize_instance_list(node: ast.InstanceList) -> List:
+  instance = node.instances[0]
+  portlist = [
+    [str(port_arg.portname), None if port_arg.argname is None else str(port_arg.argname)]
+    for port_arg in instance.portlist
+  ]
+  return [node.module, instance.name, portlist]
+
+
+def _deserialize_instance_list(item: List) -> ast.InstanceList:
+  """The argnames are strings, the same as str() of the original nodes"""
+  module, name, portlist = item
+  portlist = [ast.PortArg(portname, argname) for portname, argname in portlist]
+  instance = ast.Instance(module, name, portlist, ())
+  return ast.InstanceList(module, (), (instance,))
+
+
+def load_parse_result(
+  cache_dir: str, key: str
+) -> Optional[Tuple[Dict, List[ast.InstanceList]]]:
+  """Return the declarations and the instances, or None if not cached"""
+  path = _get_cache_path(cache_dir, key)
+  if not os.path.isfile(path):
+    return None
+
+  _logger.info('reuse the parse result in %s', path)
+  cached = json.load(open(path, 'r'))
+  instance_lists = [_deserialize_instance_list(item) for item in cached['instances']]
+  return cached['decls'], instance_lists
+
+
+def save_parse_result(
+  cache_dir: str,
+  key: str,
+  decl_info: Dict,
+  instance_lists: List[ast.InstanceList],
+) -> None:
+  """Only flat RTL is cached, i.e., one instance in each InstanceList"""
+  if any(len(node.instances) != 1 for node in instance_lists):
+    return
+
+  os.makedirs(cache_dir, exist_ok=True)
+  cached = {
+    'decls': decl_info,
+    'instances': [_serialize_instance_list(node) for node in instance_lists],
+  }
+
+  # write to a temp file first so that an interrupted run never leaves a broken entry
+  path = _get_cache_path(cache_dir, key)
+  open(f'{path}.tmp', 'w').write(json.dumps(cached, separators=(',', ':')))
+  os.replace(f'{path}.tmp', path)
+  _logger.info('save the parse result to %s', path)
+
+
+def clear_parse_cache(cache_dir: str) -> None:
+  if os.path.isdir(cache_dir):
+    _logger.info('remove the parse cache %s', cache_dir)
+    shutil.rmtree(cache_dir)
@@ -0,0 +1,338 @@
+import logging
+import re
+from typing import Iterator, List, Optional, Tuple
+
+import pyverilog.vparser.ast as ast
+
+from rapidstream.parser.width_eval import get_range
+
+_logger = logging.getLogger().getChild(__name__)
+
+# A fast path to extract the declarations and instances from the flat top RTL
+# generated by TAPA, without building the full AST by the PLY-based pyverilog.
+# The file is tokenized line by line. Any construct that is not understood here
+# raises UnsupportedRTLError so that the caller falls back to pyverilog.
+
+_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<line_comment>//.*)
+  | (?P<block_comment>/\*)
+  | (?P<string>"(?:\\.|[^"\\])*")
+  | (?P<number>\d+'[sS]?[bBoOdDhH][0-9a-fA-FxXzZ?]+|\d+)
+  | (?P<name>[a-zA-Z_$][a-zA-Z0-9_$]*)
+  | (?P<directive>`[a-zA-Z_][a-zA-Z0-9_]*)
+  | (?P<symbol>[()\[\]{}.,;:#=~!@?+\-*/%&|^<>])
+''', re.VERBOSE)
+
+# directives that do not change the content, the rest of the line is skipped
+_IGNORED_DIRECTIVES = ('`timescale', '`default_nettype')
+
+# module items that never contain any declaration or instance that we collect
+_SKIPPED_ITEMS = ('reg', 'integer', 'genvar', 'parameter', 'localparam', 'assign', 'real', 'time')
+
+_DIRECTIONS = ('input', 'output', 'inout')
+
+# module items that may contain what we collect, or that look like an instance
+_UNSUPPORTED_ITEMS = (
+  'generate', 'function', 'task', 'specify', 'defparam', 'event',
+  'tri', 'wand', 'wor', 'supply0', 'supply1',
+  'and', 'or', 'nand', 'nor', 'xor', 'xnor', 'buf', 'not',
+  'bufif0', 'bufif1', 'notif0', 'notif1',
+)
+
+# the str() of the pyverilog AST node of a unary operator on an identifier
+_UNARY_OPERATORS = {
+  '~': 'Unot',
+  '!': 'Ulnot',
+}
+
+
+class UnsupportedRTLError(Exception):
+  """The RTL contains a construct that the fast path does not handle"""
+
+
+def _tokenize(lines: Iterator[str]) -> Iterator[str]:
+  in_block_comment = False
+  for lineno, line in enumerate(lines, start=1):
+    pos = 0
+    while pos < len(line):
+      if in_block_comment:
+        end = line.find('*/', pos)
+        if end == -1:
+          break
+        pos = end + 2
+        in_block_comment = False
+        continue
+
+      match = _TOKEN.match(line, pos)
+      if match is None:
+        raise UnsupportedRTLError(f'line {lineno}: unsupported character {line[pos]!r}')
+      pos = match.end()
+
+      kind = match.lastgroup
+      if kind in ('space', 'line_comment'):
+        continue
+      elif kind == 'block_comment':
+        in_block_comment = True
+      elif kind == 'directive':
+        if match.group() not in _IGNORED_DIRECTIVES:
+          raise UnsupportedRTLError(f'line {lineno}: unsupported directive {match.group()}')
+        break
+      else:
+        yield match.group()
+
+
+class _TokenStream:
+  def __init__(self, tokens: Iterator[str]) -> None:
+    self.tokens = tokens
+    self.lookahead = next(tokens, None)
+
+  def peek(self) -> Optional[str]:
+    return self.lookahead
+
+  def next(self) -> str:
+    token = self.lookahead
+    if token is None:
+      raise UnsupportedRTLError('unexpected end of file')
+    self.lookahead = next(self.tokens, None)
+    return token
+
+  def expect(self, expected: str) -> None:
+    token = self.next()
+    if token != expected:
+      raise UnsupportedRTLError(f'expect {expected} but get {token}')
+
+  def accept(self, expected: str) -> bool:
+    if self.lookahead == expected:
+      self.next()
+      return True
+    return False
+
+  def name(self) -> str:
+    token = self.next()
+    if not _is_name(token):
+      raise UnsupportedRTLError(f'expect an identifier but get {token}')
+    return token
+
+  def skip_balanced(self) -> List[str]:
+    """Skip a pair of parentheses/brackets/braces, return the tokens inside"""
+    opening = self.next()
+    if opening not in ('(', '[', '{'):
+      raise UnsupportedRTLError(f'expect a parenthesis but get {opening}')
+    depth = 1
+    inside = []
+    while True:
+      token = self.next()
+      if token in ('(', '[', '{'):
+        depth += 1
+      elif token in (')', ']', '}'):
+        depth -= 1
+        if depth == 0:
+          return inside
+      inside.append(token)
+
+  def skip_until(self, stop: Tuple[str, ...]) -> str:
+    """Skip an expression until one of the stop tokens at the top level"""
+    while self.peek() not in stop:
+      if self.peek() in ('(', '[', '{'):
+        self.skip_balanced()
+      else:
+        self.next()
+    return self.next()
+
+
+def _is_name(token: str) -> bool:
+  return token[0].isalpha() or token[0] == '_'
+
+
+def _is_number(token: str) -> bool:
+  return token[0].isdigit()
+
+
+def _get_width(stream: _TokenStream) -> Tuple[str, Optional[List[int]]]:
+  """The width in the same format as the pyverilog codegen and as integers,
+     only constant ranges are supported
+  """
+  if stream.peek() != '[':
+    return '', [0, 0]
+  inside = stream.skip_balanced()
+  if len(inside) != 3 or inside[1] != ':' or not _is_number(inside[0]) or not _is_number(inside[2]):
+    raise UnsupportedRTLError(f'non-constant width [{" ".join(inside)}]')
+  return f'[{inside[0]}:{inside[2]}]', get_range(inside[0], inside[2])
+
+
+def _copy(range: Optional[List[int]]) -> Optional[List[int]]:
+  """The names in one declaration do not share the same list"""
+  return list(range) if range is not None else None
+
+
+def _get_arg_name(tokens: List[str]) -> Optional[str]:
+  """The str() of the argname of the pyverilog PortArg"""
+  if not tokens:
+    return None
+  if len(tokens) == 1 and (_is_name(tokens[0]) or _is_number(tokens[0])):
+    return tokens[0]
+  if len(tokens) == 2 and tokens[0] in _UNARY_OPERATORS and _is_name(tokens[1]):
+    return f'({_UNARY_OPERATORS[tokens[0]]} {tokens[1]})'
+  raise UnsupportedRTLError(f'unsupported port argument {" ".join(tokens)}')
+
+
+class _FlatRTLExtractor:
+  """Collect the declarations (kind, name, width, range) and the instances in the order of the source"""
+
+  def __init__(self, stream: _TokenStream) -> None:
+    self.stream = stream
+    self.decls = []
+    self.instance_lists = []
+
+  def run(self) -> None:
+    while self.stream.peek() is not None:
+      self.stream.expect('module')
+      self.module()
+
+  def module(self) -> None:
+    stream = self.stream
+    stream.name()
+    if stream.accept('#'):
+      stream.skip_balanced()
+    if stream.peek() == '(':
+      self.header()
+    stream.expect(';')
+
+    while not stream.accept('endmodule'):
+      token = stream.peek()
+      if token in _DIRECTIONS:
+        self.io_decl()
+      elif token == 'wire':
+        self.wire_decl()
+      elif token in _SKIPPED_ITEMS:
+        stream.skip_until((';',))
+      elif token in ('always', 'initial'):
+        self.procedural_block()
+      elif token is not None and _is_name(token) and token not in _UNSUPPORTED_ITEMS:
+        self.instance()
+      else:
+        raise UnsupportedRTLError(f'unsupported module item {token}')
+
+  def header(self) -> None:
+    """Both the non-ANSI style and the ANSI style are supported"""
+    stream = self.stream
+    stream.expect('(')
+    if stream.accept(')'):
+      return
+
+    dir, net_type, width, range = None, None, '', [0, 0]
+    while True:
+      if stream.peek() in _DIRECTIONS:
+        dir, net_type, width, range = self.decl_head()
+      name = stream.name()
+      # in the ANSI style, a name without a direction follows the previous declaration
+      if dir:
+        self.add_decl(dir, net_type, name, width, range)
+      if stream.accept(')'):
+        return
+      stream.expect(',')
+
+  def decl_head(self) -> Tuple[str, Optional[str], str, Optional[List[int]]]:
+    stream = self.stream
+    dir = stream.next()
+    net_type = stream.next() if stream.peek() in ('wire', 'reg') else None
+    stream.accept('signed')
+    width, range = _get_width(stream)
+    return dir, net_type, width, range
+
+  def add_decl(
+    self, dir: str, net_type: Optional[str], name: str, width: str, range: Optional[List[int]]
+  ) -> None:
+    # pyverilog keeps an input/output with an explicit net type as two nodes, e.g., Input and Wire
+    if dir != 'inout':
+      self.decls.append((dir, name, width, _copy(range)))
+    if net_type == 'wire':
+      self.decls.append(('wire', name, width, _copy(range)))
+
+  def io_decl(self) -> None:
+    stream = self.stream
+    dir, net_type, width, range = self.decl_head()
+    while True:
+      self.add_decl(dir, net_type, stream.name(), width, range)
+      if stream.accept(';'):
+        return
+      stream.expect(',')
+
+  def wire_decl(self) -> None:
+    stream = self.stream
+    stream.expect('wire')
+    stream.accept('signed')
+    width, range = _get_width(stream)
+    while True:
+      self.decls.append(('wire', stream.name(), width, _copy(range)))
+      if stream.accept('='):
+        last = stream.skip_until((',', ';'))
+      else:
+        last = stream.next()
+      if last == ';':
+        return
+      if last != ',':
+        raise UnsupportedRTLError(f'unsupported wire declaration near {last}')
+
+  def procedural_block(self) -> None:
+    """Skip an always/initial block, only the form with a begin-end body is supported"""
+    stream = self.stream
+    stream.next()
+    if stream.accept('@'):
+      if not stream.accept('*'):
+        stream.skip_balanced()
+    stream.expect('begin')
+    depth = 1
+    while depth:
+      token = stream.next()
+      if token == 'begin':
+        depth += 1
+      elif token == 'end':
+        depth -= 1
+
+  def instance(self) -> None:
+    stream = self.stream
+    module = stream.name()
+    if stream.accept('#'):
+      stream.skip_balanced()
+    name = stream.name()
+
+    stream.expect('(')
+    portlist = []
+    if not stream.accept(')'):
+      while True:
+        if not stream.accept('.'):
+          raise UnsupportedRTLError(f'{name}: only named port connections are supported')
+        portname = stream.name()
+        if stream.peek() != '(':
+          raise UnsupportedRTLError(f'{name}: unsupported connection of port {portname}')
+        argname = _get_arg_name(stream.skip_balanced())
+        portlist.append(ast.PortArg(portname, argname))
+        if stream.accept(')'):
+          break
+        stream.expect(',')
+
+    if not stream.accept(';'):
+      raise UnsupportedRTLError(f'{name}: only one instance per instantiation is supported')
+
+    instance = ast.Instance(module, name, portlist, ())
+    self.instance_lists.append(ast.InstanceList(module, (), (instance,)))
+
+
+def extract_flat_rtl(
+  rtl_path: str,
+) -> Tuple[List[Tuple], List[ast.InstanceList]]:
+  """Extract from a flat RTL without pyverilog
+     Return the declarations as (kind, name, width, range) and the instances,
+     both in the same order as the pyverilog AST. The argnames of the ports
+     are strings in the same format as str() of the pyverilog nodes.
+     Raise UnsupportedRTLError if the RTL is beyond a flat netlist
+  """
+  with open(rtl_path, 'r') as f:
+    extractor = _FlatRTLExtractor(_TokenStream(_tokenize(f)))
+    extractor.run()
+
+  _logger.info('extracted %d declarations and %d instances from %s',
+               len(extractor.decls), len(extractor.instance_lists), rtl_path)
+  return extractor.decls, extractor.instance_lists
@@ -1,60 +1,125 @@
 import logging
-from typing import Callable, Dict
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
 
 import pyverilog.vparser.ast as ast
 from pyverilog.ast_code_generator import codegen
 
 from rapidstream.const import *
+from rapidstream.parser.parse_cache import get_cache_key, load_parse_result, save_parse_result
+from rapidstream.parser.tapa_fast_parser import UnsupportedRTLError, extract_flat_rtl
+from rapidstream.parser.width_eval import get_range
 
 _logger = logging.getLogger().getChild(__name__)
 
+# bump it whenever the info extracted from the top RTL changes, to invalidate the parse cache
+PARSER_VERSION = 2
+
 
 def visitor(node: ast.Node, action: Callable, *args) -> None:
-  action(node, *args)
-  for c in node.children():
-    visitor(c, action, *args)
+  """Apply the action to every node in pre-order, with an explicit stack
+     so that a deep AST does not hit the recursion limit
+  """
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    action(node, *args)
+    stack.extend(reversed(node.children()))
+
+
+def walk(root: ast.Node, handlers: Dict[type, Callable]) -> None:
+  """Visit the AST once in the same order as the visitor and dispatch each
+     node to the handler of its type. The subtree of a handled node is not
+     visited, thus only use it for node types that never nest, e.g.,
+     declarations and instances
+  """
+  stack = [root]
+  while stack:
+    node = stack.pop()
+    handler = handlers.get(type(node))
+    if handler is not None:
+      handler(node)
+    else:
+      stack.extend(reversed(node.children()))
+
+
+@lru_cache(maxsize=None)
+def _get_codegen() -> codegen.ASTCodeGenerator:
+  """The code generator is only needed for non-constant widths, thus created on first use and then shared"""
+  return codegen.ASTCodeGenerator()
 
 
 def _get_width(node: ast.Node) -> str:
   """Extract the width as a string in the format of [msb:lsb]"""
   if node.width is None:
     width = ''
+  elif isinstance(node.width.msb, ast.IntConst) and isinstance(node.width.lsb, ast.IntConst):
+    # the same as the codegen of constant bounds
+    width = f'[{node.width.msb.value}:{node.width.lsb.value}]'
   else:
-    width = str(codegen.ASTCodeGenerator().visit(node.width))
+    width = str(_get_codegen().visit(node.width))
   return width
 
 
+def _get_range(node: ast.Node) -> Optional[List[int]]:
+  """Extract the width as integers [msb, lsb], or None if the width is not constant"""
+  if node.width is None:
+    return [0, 0]
+  if isinstance(node.width.msb, ast.IntConst) and isinstance(node.width.lsb, ast.IntConst):
+    return get_range(node.width.msb.value, node.width.lsb.value)
+  return None
+
+
+def is_collected_wire(name: str) -> bool:
+  """collect two types of wires
+     1. the data wires connecting to all streams
+     2. the wires connecting to the s_axi_control
+     since tapa duplicates the s_axi_control to each SLR
+     we only collect one ctrl instance by checking the '_slr_0' suffix
+  """
+  return any(name.endswith(suffix) for suffix in STREAM_SUFFIX) or \
+         name.endswith('_slr_0')
+
+
 def get_wire_info(node: ast.Node, config: Dict):
   """Collect all Wire declarations"""
   if isinstance(node, ast.Wire):
-    # collect two types of wires
-    # 1. the data wires connecting to all streams
-    # 2. the wires connecting to the s_axi_control
-    # since tapa duplicates the s_axi_control to each SLR
-    # we only collect one ctrl instance by checking the '_slr_0' suffix
-    if any(node.name.endswith(suffix) for suffix in STREAM_SUFFIX) or \
-       node.name.endswith('_slr_0'):
+    if is_collected_wire(node.name):
       config['wire_decl'][node.name] = _get_width(node)
+      config['wire_range'][node.name] = _get_range(node)
 
 
 def get_input_info(node: ast.Node, config: Dict):
   """Collect all Input declarations"""
   if isinstance(node, ast.Input):
     config['input_decl'][node.name] = _get_width(node)
+    config['input_range'][node.name] = _get_range(node)
 
 
 def get_output_info(node: ast.Node, config: Dict):
   """Collect all Output declarations"""
   if isinstance(node, ast.Output):
     config['output_decl'][node.name] = _get_width(node)
+    config['output_range'][node.name] = _get_range(node)
 
 
-def get_decl_info(root: ast.Source, config: Dict):
+def get_decl_info(root: ast.Source, config: Dict) -> List[ast.InstanceList]:
+  """Collect all declarations (wire, input, output) in a single pass,
+     and return the instances for the later steps
+     Each width is kept as the text in {target}_decl and as integers in {target}_range
+  """
   for target in ('wire', 'input', 'output'):
     config[f'{target}_decl'] = {}
-  visitor(root, get_wire_info, config)
-  visitor(root, get_input_info, config)
-  visitor(root, get_output_info, config)
+    config[f'{target}_range'] = {}
+
+  instance_lists = []
+  walk(root, {
+    ast.Wire: lambda node: get_wire_info(node, config),
+    ast.Input: lambda node: get_input_info(node, config),
+    ast.Output: lambda node: get_output_info(node, config),
+    ast.InstanceList: instance_lists.append,
+  })
+  return instance_lists
 
 
 def get_stream_info(node: ast.Node, config: Dict, wire_to_stream: Dict):
@@ -224,6 +289,8 @@ def collect_in_out_streams(config: Dict) -> None:
 
 def annotate_width_to_port_wire_map(config: Dict) -> None:
   """Annotate the width info to the port-wire map of every vertex
+     Each width is kept as the text in port_width_map and as integers [msb, lsb]
+     in port_range_map, None if the width is not constant
      Assume non-existing ports are of width 1
   """
   for v_name, props in config['vertices'].items():
@@ -232,19 +299,23 @@ def annotate_width_to_port_wire_map(config: Dict) -> None:
 
     port_wire_map = props['port_wire_map']
     port_width_map = {}
+    port_range_map = {}
 
     # axi ports
     for axi_port_name, axi_arg_name in port_wire_map['axi_ports'].items():
       port_width_map[axi_port_name] = config['input_decl'][f'm_axi_{axi_arg_name}_RDATA']
+      port_range_map[axi_port_name] = config['input_range'][f'm_axi_{axi_arg_name}_RDATA']
 
     # constant scalar ports
     for scalar_name, scalar_wire_name in port_wire_map['constant_ports'].items():
       # assume the axi address space is 64-bit
       if scalar_name.endswith('_offset'):
         port_width_map[scalar_name] = '[63:0]'
+        port_range_map[scalar_name] = [63, 0]
       else:
         # the wire passing constants will be named in f'{scalar_name}_slr_0'
         port_width_map[scalar_name] = config['wire_decl'][f'{scalar_name}_slr_0']
+        port_range_map[scalar_name] = config['wire_range'][f'{scalar_name}_slr_0']
 
     # stream ports
     for stream_name, _port_wire_map in port_wire_map['stream_ports'].items():
@@ -252,36 +323,109 @@ def annotate_width_to_port_wire_map(config: Dict) -> None:
       for portname, wirename in _port_wire_map.items():
         if portname.endswith('_din') or portname.endswith('_dout'):
           port_width_map[portname] = f'[{data_width_int-1}:0]'
+          port_range_map[portname] = [data_width_int - 1, 0]
 
     # all ctrl ports have the width 1
 
     props['port_width_map'] = port_width_map
+    props['port_range_map'] = port_range_map
 
 
-def parse_tapa_output_rtl(
+def get_instance_info(
   config: Dict,
-  root: ast.Source,
+  instance_lists: List[ast.InstanceList],
 ) -> Dict:
-  """Extract all info needed from the top RTL generated by TAPA"""
+  """The steps after the declarations are collected, they only go through the instances"""
 
   # check if format is correct
-  visitor(root, check_rtl_format)
-
-  # get all declarations (wire, input, output)
-  get_decl_info(root, config)
+  for node in instance_lists:
+    check_rtl_format(node)
 
   # get the info related to streams
   # get the mapping from wire to a stream that it connects to
+  # the vertices depend on the streams, thus the streams must be done first
   wire_to_stream = {}
-  visitor(root, get_stream_info, config, wire_to_stream)
+  for node in instance_lists:
+    get_stream_info(node, config, wire_to_stream)
 
   # get the inbound streams and outbound streams for each vertex
   collect_in_out_streams(config)
 
   # get the info related to vertices
-  visitor(root, get_vertex_info, config, wire_to_stream)
+  for node in instance_lists:
+    get_vertex_info(node, config, wire_to_stream)
 
   # add width info into the properties of each vertex
   annotate_width_to_port_wire_map(config)
 
   return config
+
+
+def parse_tapa_output_rtl(
+  config: Dict,
+  root: ast.Source,
+) -> Dict:
+  """Extract all info needed from the top RTL generated by TAPA"""
+
+  # get all declarations (wire, input, output) and all instances in one pass
+  instance_lists = get_decl_info(root, config)
+
+  return get_instance_info(config, instance_lists)
+
+
+def extract_tapa_output_rtl(
+  top_rtl_path: str,
+  use_fast_path: bool = True,
+) -> Tuple[Dict, List[ast.InstanceList]]:
+  """Extract the declarations (wire, input, output) and the instances from the top RTL file
+     The flat top is extracted by the fast path without pyverilog. If the RTL
+     contains any construct beyond that, fall back to the pyverilog parser.
+  """
+  if use_fast_path:
+    try:
+      decls, instance_lists = extract_flat_rtl(top_rtl_path)
+    except UnsupportedRTLError as e:
+      _logger.warning('fall back to pyverilog: %s', e)
+    else:
+      decl_info = {}
+      for target in ('wire', 'input', 'output'):
+        decl_info[f'{target}_decl'] = {}
+        decl_info[f'{target}_range'] = {}
+      for kind, name, width, range in decls:
+        if kind != 'wire' or is_collected_wire(name):
+          decl_info[f'{kind}_decl'][name] = width
+          decl_info[f'{kind}_range'][name] = range
+      return decl_info, instance_lists
+
+  # the parser tables of pyverilog are only loaded when needed
+  from pyverilog.vparser.parser import parse
+  ast_root, directives = parse([top_rtl_path])
+  decl_info = {}
+  instance_lists = get_decl_info(ast_root, decl_info)
+  return decl_info, instance_lists
+
+
+def parse_tapa_output_rtl_file(
+  config: Dict,
+  top_rtl_path: str,
+  use_fast_path: bool = True,
+  cache_dir: Optional[str] = None,
+) -> Dict:
+  """Extract all info needed from the top RTL file generated by TAPA
+     If cache_dir is given, the extracted declarations and instances are
+     reused as long as the RTL and the parser version are unchanged
+  """
+  cached = None
+  if cache_dir:
+    key = get_cache_key(top_rtl_path, PARSER_VERSION)
+    cached = load_parse_result(cache_dir, key)
+
+  if cached is not None:
+    decl_info, instance_lists = cached
+  else:
+    decl_info, instance_lists = extract_tapa_output_rtl(top_rtl_path, use_fast_path)
+    if cache_dir:
+      save_parse_result(cache_dir, key, decl_info, instance_lists)
+
+  config.update(decl_info)
+  return get_instance_info(config, instance_lists)
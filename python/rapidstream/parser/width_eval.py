@@ -0,0 +1,36 @@
+import re
+from typing import List, Optional
+
+# the integer form of a width is [msb, lsb], e.g., [31, 0] for [31:0] and [0, 0] for a single bit.
+# A width that is not made of constants, e.g., [W-1:0], has no integer form and is None
+
+_SIZED_INT_CONST = re.compile(r"\d*'[sS]?([bBoOdDhH])([0-9a-fA-F_]+)")
+
+_BASES = {
+  'b': 2,
+  'o': 8,
+  'd': 10,
+  'h': 16,
+}
+
+
+def eval_int_const(value: str) -> Optional[int]:
+  """The value of an integer constant in Verilog, e.g., 31 or 8'hff
+     None if it is not a constant or has x/z bits
+  """
+  if value.isdigit():
+    return int(value)
+
+  match = _SIZED_INT_CONST.fullmatch(value)
+  if match is None:
+    return None
+  return int(match.group(2).replace('_', ''), _BASES[match.group(1).lower()])
+
+
+def get_range(msb: str, lsb: str) -> Optional[List[int]]:
+  """The integer form of [msb:lsb]"""
+  msb_int = eval_int_const(msb)
+  lsb_int = eval_int_const(lsb)
+  if msb_int is None or lsb_int is None:
+    return None
+  return [msb_int, lsb_int]
@@ -0,0 +1,151 @@
+"""group_vertices_batch must give the same config as calling group_vertices for each group in order"""
+import copy
+import json
+import random
+
+import pytest
+
+from rapidstream.const import RESOURCE_TYPES
+from rapidstream.hierarchy_rebuild.group_vertices import (
+  can_be_batched,
+  group_vertices,
+  group_vertices_batch,
+)
+
+NUM_TASKS = 12
+
+INBOUND_PORTS = ('if_din', 'if_full_n', 'if_write')
+OUTBOUND_PORTS = ('if_dout', 'if_empty_n', 'if_read')
+WIRE_SUFFIX = {
+  'if_din': '_din', 'if_full_n': '_full_n', 'if_write': '_write',
+  'if_dout': '_dout', 'if_empty_n': '_empty_n', 'if_read': '_read',
+}
+
+
+def _get_task_name(i: int) -> str:
+  return f'TASK_VERTEX_Task_{i}'
+
+
+def _make_config(seed: int = 0):
+  """A config in the format of parse_tapa_output_rtl with random streams between the tasks"""
+  rng = random.Random(seed)
+  config = {'vertices': {}, 'edges': {}, 'wire_decl': {}, 'wire_range': {}}
+
+  for i in range(NUM_TASKS):
+    config['vertices'][_get_task_name(i)] = {
+      'category': 'TASK_VERTEX',
+      'module': 'Task',
+      'floorplan_region': 'CR_X0Y0_To_CR_X3Y3',
+      'SLR': 0,
+      'area': {r: rng.randint(0, 100) for r in RESOURCE_TYPES},
+      'inbound_streams': [],
+      'outbound_streams': [],
+      'port_wire_map': {
+        'axi_ports': {'mmap': 'gmem'} if i % 4 == 0 else {},
+        'ctrl_ports': {'ap_clk': 'ap_clk', 'ap_rst_n': 'ap_rst_n'},
+        'constant_ports': {'n': 'n_slr_0'},
+        'stream_ports': {},
+      },
+      'port_width_map': {'mmap': '[511:0]', 'n': '[31:0]'},
+      'port_range_map': {'mmap': [511, 0], 'n': [31, 0]},
+    }
+
+  for e in range(NUM_TASKS * 3):
+    src, dst = rng.sample(range(NUM_TASKS), 2)
+    width = rng.choice([1, 8, 32, 64])
+    edge_name = f'FIFO_EDGE_q_{e}'
+    port_wire_map = {
+      'inbound': {port: f'q_{e}{WIRE_SUFFIX[port]}' for port in INBOUND_PORTS},
+      'outbound': {port: f'q_{e}{WIRE_SUFFIX[port]}' for port in OUTBOUND_PORTS},
+      'others': {},
+    }
+    config['edges'][edge_name] = {
+      'category': 'FIFO_EDGE',
+      'produced_by': _get_task_name(src),
+      'consumed_by': _get_task_name(dst),
+      'width': width,
+      'port_wire_map': port_wire_map,
+    }
+
+    for side in ('inbound', 'outbound'):
+      for port, wire in port_wire_map[side].items():
+        is_data = port in ('if_din', 'if_dout')
+        config['wire_decl'][wire] = f'[{width-1}:0]' if is_data else ''
+        config['wire_range'][wire] = [width - 1, 0] if is_data else [0, 0]
+
+    for v, side, ports in ((src, 'outbound_streams', INBOUND_PORTS), (dst, 'inbound_streams', OUTBOUND_PORTS)):
+      props = config['vertices'][_get_task_name(v)]
+      props[side].append(edge_name)
+      stream_ports = props['port_wire_map']['stream_ports'].setdefault(edge_name, {})
+      for port in ports:
+        portname = f'q{WIRE_SUFFIX[port]}_{e}'
+        stream_ports[portname] = port_wire_map['inbound' if port in INBOUND_PORTS else 'outbound'][port]
+        is_data = port in ('if_din', 'if_dout')
+        props['port_width_map'][portname] = f'[{width-1}:0]' if is_data else ''
+        props['port_range_map'][portname] = [width - 1, 0] if is_data else [0, 0]
+
+  return config
+
+
+def _group_sequentially(config, group_name_to_instances):
+  for group_name, instances in group_name_to_instances.items():
+    group_vertices(config, instances, group_name)
+
+
+def _assert_same_as_sequential(group_name_to_instances):
+  batch_config = _make_config()
+  sequential_config = copy.deepcopy(batch_config)
+
+  group_vertices_batch(batch_config, group_name_to_instances)
+  _group_sequentially(sequential_config, group_name_to_instances)
+
+  # compare the serialized configs so that the order of the keys also counts
+  assert json.dumps(batch_config) == json.dumps(sequential_config)
+  return batch_config
+
+
+def test_disjoint_groups():
+  tasks = [_get_task_name(i) for i in range(NUM_TASKS)]
+  groups = {
+    'GROUP_0': tasks[0:3],
+    'GROUP_1': tasks[3:7],
+    'GROUP_2': tasks[8:10],
+  }
+  assert can_be_batched(_make_config(), groups)
+
+  config = _assert_same_as_sequential(groups)
+  assert list(config['vertices'])[-3:] == list(groups)
+  assert all(task not in config['vertices'] for task in tasks[0:7] + tasks[8:10])
+
+
+def test_empty_group_is_skipped():
+  tasks = [_get_task_name(i) for i in range(NUM_TASKS)]
+  config = _assert_same_as_sequential({'GROUP_0': tasks[0:2], 'EMPTY': [], 'GROUP_1': tasks[2:5]})
+  assert 'EMPTY' not in config['vertices']
+
+
+@pytest.mark.parametrize('groups', [
+  # nested, a group includes the group created before it
+  {'GROUP_0': [_get_task_name(0), _get_task_name(1)], 'GROUP_1': ['GROUP_0', _get_task_name(2)]},
+  # the same instance in two groups
+  {'GROUP_0': [_get_task_name(0), _get_task_name(1)], 'GROUP_1': [_get_task_name(1), _get_task_name(2)]},
+  # the group name clashes with an existing vertex
+  {_get_task_name(0): [_get_task_name(0), _get_task_name(1)], 'GROUP_1': [_get_task_name(2)]},
+], ids=['nested', 'shared_instance', 'name_clash'])
+def test_dependent_groups_fall_back(groups):
+  assert not can_be_batched(_make_config(), groups)
+
+  batch_config = _make_config()
+  sequential_config = copy.deepcopy(batch_config)
+
+  # the errors of the sequential calls, if any, must also be the same
+  results = []
+  for run, config in ((group_vertices_batch, batch_config), (_group_sequentially, sequential_config)):
+    try:
+      run(config, groups)
+      results.append(None)
+    except Exception as e:
+      results.append(type(e))
+
+  assert results[0] == results[1]
+  assert json.dumps(batch_config) == json.dumps(sequential_config)
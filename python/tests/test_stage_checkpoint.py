@@ -0,0 +1,34 @@
+"""the checkpoints could be disabled, and the flow could only start from a stage whose inputs are saved"""
+import os
+
+import pytest
+
+from rapidstream.FE.StageCheckpoint import FE_STAGES, FROM_STAGES, StageCheckpoint
+
+
+def test_save_and_load(tmp_path):
+  checkpoint = StageCheckpoint(str(tmp_path / 'ckpt'))
+  checkpoint.save('floorplan', 'hash', {'SlotToVertices': {}})
+
+  assert checkpoint.load('floorplan', 'hash') == {'SlotToVertices': {}}
+  assert checkpoint.load('floorplan', 'other_hash') is None
+
+
+def test_disabled_checkpoint(tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  checkpoint = StageCheckpoint(None)
+  checkpoint.save('floorplan', 'hash', {'SlotToVertices': {}})
+
+  assert checkpoint.load('floorplan', 'hash') is None
+  assert not os.listdir(tmp_path)
+
+
+@pytest.mark.parametrize('stage', [s for s in FE_STAGES if s not in FROM_STAGES])
+def test_reject_stage_without_saved_inputs(tmp_path, stage):
+  with pytest.raises(AssertionError):
+    StageCheckpoint(str(tmp_path), from_stage=stage)
+
+
+def test_from_stage_needs_checkpoint():
+  with pytest.raises(AssertionError):
+    StageCheckpoint(None, from_stage='global_routing')
@@ -0,0 +1,264 @@
+"""The fast path must extract the same info from the TAPA top as pyverilog
+
+The reference is built by VerilogParser from the text, which does not need
+the iverilog preprocessor used by pyverilog.vparser.parser.parse
+"""
+import re
+
+import pytest
+import pyverilog.vparser.parser as pyverilog_parser
+from pyverilog.vparser.parser import VerilogParser
+
+from rapidstream.parser.tapa_fast_parser import UnsupportedRTLError, extract_flat_rtl
+from rapidstream.parser.tapa_parser import extract_tapa_output_rtl, get_decl_info
+
+DECL_KEYS = (
+  'wire_decl', 'input_decl', 'output_decl',
+  'wire_range', 'input_range', 'output_range',
+)
+
+ANSI_TOP = '''
+`timescale 1 ns / 1 ps
+// the ANSI style header of a TAPA top
+module Top (
+  input wire ap_clk,
+  input wire ap_rst_n,
+  input [63:0] m_axi_mmap_RDATA,
+  input m_axi_mmap_RVALID, m_axi_mmap_RLAST,
+  output reg [7:0] status,
+  output wire interrupt
+);
+  /* the streams between the tasks
+     may span multiple lines */
+  wire [31:0] q_0_din;
+  wire q_0_full_n;
+  wire q_0_write;
+  wire [31:0] q_0_dout;  // trailing comment
+  wire q_0_empty_n;
+  wire q_0_read;
+  wire [63:0] n_slr_0;
+  wire [0:3] reversed_din;
+  wire [07:0] padded_dout;
+  wire ap_start = 1'b1;
+  wire ap_done;
+  reg [7:0] counter;
+
+  always @(posedge ap_clk) begin
+    if (!ap_rst_n) begin
+      counter <= 8'h00;
+    end else begin
+      counter <= counter + 1;
+    end
+  end
+
+  fifo #(.DATA_WIDTH(32), .DEPTH(2)) q_0 (
+    .clk(ap_clk),
+    .reset(~ap_rst_n),
+    .if_din(q_0_din),
+    .if_full_n(q_0_full_n),
+    .if_write(q_0_write),
+    .if_dout(q_0_dout),
+    .if_empty_n(q_0_empty_n),
+    .if_read(q_0_read),
+    .if_read_ce(1'b1),
+    .if_write_ce(1'b1)
+  );
+
+  Task Task_0 (
+    .ap_clk(ap_clk),
+    .ap_rst_n(ap_rst_n),
+    .ap_start(ap_start),
+    .ap_done(ap_done),
+    .q_din(q_0_din),
+    .q_full_n(q_0_full_n),
+    .q_write(q_0_write),
+    .q_peek_read(),
+    .n(n_slr_0),
+    .en(!ap_rst_n)
+  );
+
+  Task Task_1 (
+    .ap_clk(ap_clk),
+    .ap_rst_n(ap_rst_n),
+    .q_dout(q_0_dout),
+    .q_empty_n(q_0_empty_n),
+    .q_read(q_0_read),
+    .q_peek_dout(),
+    .q_peek_empty_n()
+  );
+endmodule
+'''
+
+NON_ANSI_TOP = '''
+`default_nettype none
+module Top (ap_clk, ap_rst_n, s_axi_control_AWADDR, ap_done);
+  input ap_clk;
+  input wire ap_rst_n;
+  input [5:0] s_axi_control_AWADDR;
+  output reg ap_done;
+  inout sda;
+
+  wire [15:0] q_1_din, q_1_dout;
+  wire q_1_full_n, q_1_write, q_1_empty_n, q_1_read;
+  wire [31:0] scalar_slr_0;
+  integer i;
+
+  initial begin
+    ap_done = 1'b0;
+  end
+
+  always @* begin
+    for (i = 0; i < 2; i = i + 1) begin
+    end
+  end
+
+  relay_station q_1 (
+    .clk(ap_clk),
+    .reset(~ap_rst_n),
+    .if_din(q_1_din),
+    .if_full_n(q_1_full_n),
+    .if_write(q_1_write),
+    .if_dout(q_1_dout),
+    .if_empty_n(q_1_empty_n),
+    .if_read(q_1_read)
+  );
+
+  Top_control_s_axi control_s_axi_U_slr_0 (
+    .ACLK(ap_clk),
+    .ARESET(~ap_rst_n),
+    .AWADDR(s_axi_control_AWADDR),
+    .scalar(scalar_slr_0),
+    .interrupt()
+  );
+endmodule
+'''
+
+# each construct is beyond a flat netlist, thus the fast path falls back to pyverilog
+REJECTED_TOPS = {
+  'generate': '''
+module Top (input wire ap_clk);
+  genvar g;
+  generate
+    for (g = 0; g < 2; g = g + 1) begin : gen
+      wire [7:0] q_din;
+    end
+  endgenerate
+endmodule
+''',
+  'positional_ports': '''
+module Top (input wire ap_clk, input wire ap_rst_n);
+  wire q_0_din;
+  Task Task_0 (ap_clk, ap_rst_n, q_0_din);
+endmodule
+''',
+  'macro': '''
+`define WIDTH 8
+module Top (input wire ap_clk);
+  wire [`WIDTH-1:0] q_0_din;
+endmodule
+''',
+  'non_constant_width': '''
+module Top #(parameter W = 8) (input wire ap_clk);
+  wire [W-1:0] q_0_din;
+  wire q_0_write;
+endmodule
+''',
+}
+
+_DEFINE = re.compile(r'^`define\s+(\w+)\s+(.*)$', re.MULTILINE)
+
+
+def _expand_macros(text: str) -> str:
+  """A minimal preprocessor for the tests, only object-like macros are supported"""
+  macros = dict(_DEFINE.findall(text))
+  text = _DEFINE.sub('', text)
+  for name, value in macros.items():
+    text = text.replace(f'`{name}', value)
+  return text
+
+
+@pytest.fixture(scope='module')
+def verilog_parser(tmp_path_factory):
+  """The parser tables are generated into a temp dir instead of the cwd"""
+  return VerilogParser(outputdir=str(tmp_path_factory.mktemp('parsetab')), debug=False)
+
+
+@pytest.fixture
+def pyverilog_parse(monkeypatch, verilog_parser):
+  """Replace the pyverilog parse that needs iverilog, record the files passed to it"""
+  parsed_files = []
+
+  def parse(filelist, *args, **kwargs):
+    parsed_files.extend(filelist)
+    text = _expand_macros(open(filelist[0], 'r').read())
+    return verilog_parser.parse(text), None
+
+  monkeypatch.setattr(pyverilog_parser, 'parse', parse)
+  return parsed_files
+
+
+def _write_rtl(tmp_path, text: str) -> str:
+  path = tmp_path / 'top.v'
+  path.write_text(text)
+  return str(path)
+
+
+def _get_reference(verilog_parser, text: str):
+  decl_info = {}
+  instance_lists = get_decl_info(verilog_parser.parse(_expand_macros(text)), decl_info)
+  return decl_info, instance_lists
+
+
+def _get_port_args(instance_lists):
+  return [
+    (node.module, instance.name, [(str(p.portname), str(p.argname)) for p in instance.portlist])
+      for node in instance_lists
+        for instance in node.instances
+  ]
+
+
+@pytest.mark.parametrize('text', [ANSI_TOP, NON_ANSI_TOP], ids=['ansi', 'non_ansi'])
+def test_fast_path_matches_pyverilog(tmp_path, verilog_parser, pyverilog_parse, text):
+  rtl_path = _write_rtl(tmp_path, text)
+
+  # the fast path must handle the whole top without falling back
+  extract_flat_rtl(rtl_path)
+  decl_info, instance_lists = extract_tapa_output_rtl(rtl_path)
+  assert not pyverilog_parse
+
+  ref_decl_info, ref_instance_lists = _get_reference(verilog_parser, text)
+  for key in DECL_KEYS:
+    assert decl_info[key] == ref_decl_info[key], key
+  assert _get_port_args(instance_lists) == _get_port_args(ref_instance_lists)
+
+
+def test_ranges_of_constant_widths(tmp_path, pyverilog_parse):
+  decl_info, _ = extract_tapa_output_rtl(_write_rtl(tmp_path, ANSI_TOP))
+  assert decl_info['input_range']['m_axi_mmap_RDATA'] == [63, 0]
+  assert decl_info['input_range']['m_axi_mmap_RLAST'] == [0, 0]
+  assert decl_info['wire_range']['reversed_din'] == [0, 3]
+  assert decl_info['wire_decl']['padded_dout'] == '[07:0]'
+  assert decl_info['wire_range']['padded_dout'] == [7, 0]
+
+
+@pytest.mark.parametrize('name', REJECTED_TOPS)
+def test_rejected_construct_falls_back(tmp_path, verilog_parser, pyverilog_parse, name):
+  text = REJECTED_TOPS[name]
+  rtl_path = _write_rtl(tmp_path, text)
+
+  with pytest.raises(UnsupportedRTLError):
+    extract_flat_rtl(rtl_path)
+
+  decl_info, instance_lists = extract_tapa_output_rtl(rtl_path)
+  assert pyverilog_parse == [rtl_path]
+
+  ref_decl_info, ref_instance_lists = _get_reference(verilog_parser, text)
+  for key in DECL_KEYS:
+    assert decl_info[key] == ref_decl_info[key], key
+  assert _get_port_args(instance_lists) == _get_port_args(ref_instance_lists)
+
+
+def test_non_constant_width_has_no_range(tmp_path, pyverilog_parse):
+  decl_info, _ = extract_tapa_output_rtl(_write_rtl(tmp_path, REJECTED_TOPS['non_constant_width']))
+  assert decl_info['wire_range']['q_0_din'] is None
+  assert decl_info['wire_range']['q_0_write'] == [0, 0]
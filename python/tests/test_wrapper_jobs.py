@@ -0,0 +1,202 @@
+"""the wrappers created by the worker processes must be the same as the ones created serially"""
+import os
+import random
+
+import pytest
+from autobridge.Device.DeviceManager import DeviceManager
+from autobridge.Opt.SlotManager import SlotManager
+
+from rapidstream.FE.CreateCtrlSlotWrapper import CreateCtrlSlotWrapper
+from rapidstream.FE.CreateRoutingSlotWrapper import CreateRoutingSlotWrapper
+from rapidstream.FE.CreateSlotWrapper import CreateSlotWrapper
+from rapidstream.FE.GlobalRouting import GlobalRouting
+from rapidstream.FE.RTLEmitter import RTLWriter
+
+FIFO_PORTS = ('din', 'full_n', 'write', 'dout', 'empty_n', 'read')
+TOP_IO = {
+  'ap_clk': ('input', ''),
+  'ap_rst_n': ('input', ''),
+  'm_axi_gmem_AWADDR': ('output', '[63:0]'),
+  'm_axi_gmem_AWVALID': ('output', ''),
+  's_axi_control_AWADDR': ('input', '[5:0]'),
+  'interrupt': ('output', ''),
+}
+
+
+class _Vertex:
+  def __init__(self, name):
+    self.name = name
+    self.type = f'{name}_type'
+    self.edges = []
+
+  def getEdges(self):
+    return self.edges
+
+
+class _Edge:
+  def __init__(self, name, src, dst, width):
+    self.name, self.src, self.dst, self.width = name, src, dst, width
+    self.depth, self.pipeline_level, self.added_depth_for_rebalance, self.fifo_type = 2, 1, 0, 'SRL'
+    src.edges.append(self)
+    dst.edges.append(self)
+
+
+class _Floorplan:
+  """a fixed floorplan on a 4x4 grid of 2x2 clock regions, the top right slot is left for routing"""
+
+  def __init__(self, slot_manager, seed):
+    rng = random.Random(seed)
+    self.s2v = {}
+    for x in (0, 2, 4, 6):
+      for y in (0, 2, 4, 6):
+        if (x, y) == (6, 6):
+          continue
+        slot = slot_manager.createSlot(f'CLOCKREGION_X{x}Y{y}:CLOCKREGION_X{x+1}Y{y+1}')
+        name = 's_axi_control' if (x, y) == (0, 0) else f'v{x}{y}'
+        self.s2v[slot] = [_Vertex(name), _Vertex(f'{name}_k0')]
+    self.s2v[next(iter(self.s2v))].append(_Vertex('gmem_m_axi'))
+    self.v2s = {v: slot for slot, v_list in self.s2v.items() for v in v_list}
+
+    slots = list(self.s2v)
+    self.edges = []
+    for i in range(24):
+      src_slot, dst_slot = rng.sample(slots, 2)
+      src, dst = rng.choice(self.s2v[src_slot]), rng.choice(self.s2v[dst_slot])
+      self.edges.append(_Edge(f'fifo_{i}', src, dst, rng.choice([1, 8, 32, 64])))
+    self.edges.append(_Edge('fifo_intra', self.s2v[slots[5]][0], self.s2v[slots[5]][1], 16))
+
+  def getSlotToVertices(self):
+    return self.s2v
+
+  def getVertexToSlot(self):
+    return self.v2s
+
+  def getSlotToEdges(self):
+    s2e = {slot: [] for slot in self.s2v}
+    for e in self.edges:
+      s2e[self.v2s[e.dst]].append(e)
+    return s2e
+
+  def getIntraAndInterEdges(self, v_group):
+    edges = [e for v in v_group for e in v.edges]
+    intra_edges = sorted({e for e in edges if edges.count(e) == 2}, key=lambda e: e.name)
+    inter_edges = sorted({e for e in edges if edges.count(e) == 1}, key=lambda e: e.name)
+    return intra_edges, inter_edges
+
+  def getUtilization(self):
+    return {slot: {'DSP': 0.1, 'BRAM': 0.1, 'LUT': 0.1 * len(v_list)} for slot, v_list in self.s2v.items()}
+
+
+class _TopRTLParser:
+  """the parts of TopRTLParser used by the wrapper creaters"""
+
+  def __init__(self, floorplan):
+    self.vertices = {v.name: v for v in floorplan.v2s}
+    self.wire_width = {}
+    for e in floorplan.edges:
+      for port in FIFO_PORTS:
+        self.wire_width[f'{e.name}_{port}'] = f'[{e.width-1}:0]' if port in ('din', 'dout') and e.width > 1 else ''
+    for v_name in self.vertices:
+      self.wire_width[f'{v_name}_ap_done'] = ''
+
+  def getApDoneVNameToWire(self):
+    return {v_name: f'{v_name}_ap_done' for v_name in self.vertices if not v_name.endswith('_k0')}
+
+  def getApReadyVNameToWire(self):
+    return {}
+
+  def getAllDeclExceptIO(self):
+    decl = ['// comment', 'parameter P = 1;']
+    decl += [f'wire {width} {name};' if width else f'wire {name};' for name, width in self.wire_width.items()]
+    return decl + ['reg ap_start_reg;', 'wire ap_done;']
+
+  def getRTLOfInst(self, v_name):
+    v = self.vertices[v_name]
+    lines = [f'{v.type} {v_name} (', '  .ap_clk(ap_clk),', '  .ap_rst_n(ap_rst_n),', '  .ap_start(ap_start),',
+             f'  .ap_done({v_name}_ap_done),', "  .ap_continue(1'b1),"]
+    for e in v.edges:
+      ports = FIFO_PORTS[:3] if e.src is v else FIFO_PORTS[3:]
+      lines += [f'  .{e.name}_{port}({e.name}_{port}),' for port in ports]
+    if v_name == 'gmem_m_axi':
+      lines += [f'  .{io}({io}),' for io in TOP_IO if io not in ('ap_clk', 'ap_rst_n')]
+    lines[-1] = lines[-1][:-1]
+    return '\n'.join(lines + [');'])
+
+  def getFIFOInstOfNewTemplate(self, e_name, width, depth, grace_period, *args):
+    ports = ',\n'.join(f'  .if_{port}({e_name}_{port})' for port in FIFO_PORTS)
+    return f'fifo_almost_full #(.DATA_WIDTH({width}), .DEPTH({depth}), .GRACE_PERIOD({grace_period})) {e_name} (\n{ports}\n);'
+
+  def getWiresOfFIFOName(self, e_name):
+    return [(f'if_{port}', f'{e_name}_{port}') for port in FIFO_PORTS]
+
+  def getInboundSideWiresOfFIFOName(self, e_name):
+    return [f'{e_name}_{port}' for port in FIFO_PORTS[:3]]
+
+  def getWidthOfRegOrWire(self, name):
+    return self.wire_width[name]
+
+  def getIntegerWidthOfRegOrWire(self, name):
+    width = self.wire_width[name]
+    return int(width[1:].split(':')[0]) + 1 if width else 1
+
+  def getWiresOfVertexName(self, v_name):
+    return list(TOP_IO) if v_name == 'gmem_m_axi' else []
+
+  def isIO(self, name):
+    return name in TOP_IO
+
+  def getDirOfIO(self, name):
+    return TOP_IO[name][0]
+
+  def getWidthOfIO(self, name):
+    return TOP_IO[name][1]
+
+
+def _create_wrappers(rtl_dir, jobs):
+  """
+  return the digests of the compute, routing and ctrl wrappers and the content of all files
+  """
+  slot_manager = SlotManager(DeviceManager('U250').getBoard())
+  floorplan = _Floorplan(slot_manager, seed=0)
+  top_rtl_parser = _TopRTLParser(floorplan)
+  global_router = GlobalRouting(floorplan, top_rtl_parser, slot_manager, 'REG', 3,
+                                {'Method': 'PathFinder', 'ResultCache': ''})
+
+  compute_wrapper_creater = CreateSlotWrapper(None, top_rtl_parser, floorplan, global_router, None, 'hw', jobs)
+  compute_wrapper_creater.getSlotWrapperForAll(dir=rtl_dir)
+  routing_wrapper_creater = CreateRoutingSlotWrapper(compute_wrapper_creater, floorplan, global_router,
+                                                     top_rtl_parser, 'REG', 3)
+  routing_wrapper_creater.createRoutingInclusiveWrapperForAll(dir=rtl_dir, jobs=jobs)
+  ctrl_wrapper_creater = CreateCtrlSlotWrapper(routing_wrapper_creater, floorplan, slot_manager)
+  ctrl_wrapper_creater.createCtrlInclusiveWrapperForAll(dir=rtl_dir, jobs=jobs)
+
+  digests = {}
+  for kind, creater in (('compute', compute_wrapper_creater), ('routing', routing_wrapper_creater), ('ctrl', ctrl_wrapper_creater)):
+    for slot, digest in creater.slot_to_digest.items():
+      digests[kind, slot.getRTLModuleName()] = digest
+
+  files = {name: open(os.path.join(rtl_dir, name), 'r').read() for name in sorted(os.listdir(rtl_dir))}
+  return digests, files
+
+
+@pytest.mark.parametrize('jobs', [2, 4])
+def test_parallel_wrappers_are_the_same(tmp_path, monkeypatch, jobs):
+  monkeypatch.chdir(tmp_path)
+  serial_digests, serial_files = _create_wrappers(str(tmp_path / 'serial'), 1)
+  parallel_digests, parallel_files = _create_wrappers(str(tmp_path / 'parallel'), jobs)
+
+  assert parallel_digests == serial_digests
+  assert parallel_files == serial_files
+
+
+def test_digests_match_the_files(tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  rtl_dir = str(tmp_path / 'rtl')
+  digests, files = _create_wrappers(rtl_dir, 2)
+
+  suffix = {'compute': '.v', 'routing': '_routing.v', 'ctrl': '_ctrl.v'}
+  assert len(digests) == len(files)
+  for (kind, slot_name), digest in digests.items():
+    with RTLWriter(str(tmp_path / 'copy.v')) as writer:
+      writer.appendFile(os.path.join(rtl_dir, slot_name + suffix[kind]))
+    assert writer.getDigest() == digest